@@ -1,6 +1,13 @@
 import pandas as pd
+import numpy as np
 from datetime import timedelta
 
+# MAD * 1.4826 estimates the std of normal data; 0.6745 = 1 / 1.4826
+MAD_TO_Z = 0.6745
+# Tax ratios are mostly one GST slab, so their MAD is ~0 and paise-level
+# rounding would score huge z values; never scale by less than half a point
+MIN_TAX_RATIO_MAD = 0.005
+
 def detect_subscriptions(df):
     """
     Identifies potential subscriptions based on recurring payments.
@@ -17,7 +24,7 @@ def detect_subscriptions(df):
     subscriptions = []
 
     from typing import cast, Any
-    for vendor, group in df.groupby("vendor"):
+    for vendor, group in df.groupby("vendor", observed=True):
         # Explicitly cast group to DataFrame to satisfy Pyright/Pylance
         group = cast(pd.DataFrame, group)
         if len(group) < 2:
@@ -83,4 +90,110 @@ def calculate_burn_rate(current_spend, monthly_budget, days_passed, total_days_i
         "percent_used": min(100, (current_spend / monthly_budget) * 100),
         "status": status,
         "projected": projected_spend
-    }
\ No newline at end of file
+    }
+
+
+def _robust_z(values, groups):
+    """
+    Robust z-score (0.6745 * (x - median) / MAD) computed per group in one pass.
+    Returns (z, q1, q3, group_size) aligned with `values`.
+    """
+    grouped = values.groupby(groups, observed=True)
+    median = grouped.transform("median")
+    mad = (values - median).abs().groupby(groups, observed=True).transform("median")
+    z = MAD_TO_Z * (values - median) / mad.replace(0, np.nan)
+    q1 = grouped.transform("quantile", 0.25)
+    q3 = grouped.transform("quantile", 0.75)
+    size = grouped.transform("size")
+    return z, q1, q3, size
+
+
+def detect_anomalies(df, z_threshold=3.5, iqr_k=1.5, min_group_size=4):
+    """
+    Flags unusual receipts locally, without any API call.
+    Checks:
+    - Amount unusually high for its vendor / category (robust z-score, or IQR
+      fence when the group's amounts are too uniform for a MAD)
+    - Tax ratio (tax / pre-tax amount) far from the rest of the vault
+    - Several receipts with the same amount on the same day
+    Returns one row per (receipt, reason).
+    """
+    columns = ["bill_id", "date", "vendor", "category", "amount", "tax", "Check", "Reason", "Score"]
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    df = df.reset_index(drop=True)
+    amount = df["amount"].astype(float)
+    flags = []
+
+    # ---------- Amount outliers per vendor / category ----------
+    for col, label in [("vendor", "Vendor"), ("category", "Category")]:
+        z, q1, q3, size = _robust_z(amount, df[col])
+        fence = q3 + iqr_k * (q3 - q1)
+        enough = size >= min_group_size
+        by_z = enough & (z > z_threshold)
+        by_iqr = enough & z.isna() & (q3 > q1) & (amount > fence)
+        hit = by_z | by_iqr
+        if hit.any():
+            flags.append(pd.DataFrame({
+                "row": df.index[hit],
+                "Check": f"High for {label.lower()}",
+                "Reason": [
+                    f"{amount[i]:,.2f} vs typical {q1[i]:,.2f}-{q3[i]:,.2f} at this {label.lower()}"
+                    for i in df.index[hit]
+                ],
+                "Score": z[hit].fillna((amount[hit] - fence[hit]) / (q3[hit] - q1[hit])).round(2).to_numpy(),
+            }))
+
+    # ---------- Tax ratio outliers ----------
+    tax = df["tax"].astype(float)
+    pre_tax = amount - tax
+    has_tax = (tax > 0) & (pre_tax > 0)
+    if has_tax.sum() >= min_group_size:
+        ratio = (tax / pre_tax).where(has_tax)
+        median = ratio.median()
+        mad = max((ratio - median).abs().median(), MIN_TAX_RATIO_MAD)
+        tax_z = MAD_TO_Z * (ratio - median) / mad
+        hit = has_tax & (tax_z.abs() > z_threshold)
+        if hit.any():
+            flags.append(pd.DataFrame({
+                "row": df.index[hit],
+                "Check": "Tax ratio",
+                "Reason": [f"tax is {ratio[i] * 100:.1f}% vs typical {median * 100:.1f}%" for i in df.index[hit]],
+                "Score": tax_z[hit].round(2).to_numpy(),
+            }))
+
+    # ---------- Same amount on the same day ----------
+    day = pd.to_datetime(df["date"]).dt.normalize()
+    dup_count = amount.groupby([day, amount]).transform("size")
+    hit = (amount > 0) & (dup_count > 1)
+    if hit.any():
+        flags.append(pd.DataFrame({
+            "row": df.index[hit],
+            "Check": "Possible duplicate",
+            "Reason": [f"{int(dup_count[i])} receipts of {amount[i]:,.2f} on {day[i]:%Y-%m-%d}" for i in df.index[hit]],
+            "Score": dup_count[hit].astype(float).to_numpy(),
+        }))
+
+    if not flags:
+        return pd.DataFrame(columns=columns)
+
+    found = pd.concat(flags, ignore_index=True)
+    result = df.loc[found["row"], ["bill_id", "date", "vendor", "category", "amount", "tax"]].reset_index(drop=True)
+    result[["Check", "Reason", "Score"]] = found[["Check", "Reason", "Score"]]
+    return result.sort_values("Score", ascending=False, key=lambda s: s.abs()).reset_index(drop=True)
+
+
+def summarize_anomalies(anomalies, limit=8):
+    """
+    Compact one-line-per-finding summary, used as precomputed facts in AI prompts.
+    """
+    if anomalies is None or anomalies.empty:
+        return "None detected."
+
+    lines = []
+    for _, row in anomalies.head(limit).iterrows():
+        lines.append(f"- {row['Check']}: {row['vendor']} on {pd.Timestamp(row['date']):%Y-%m-%d} ({row['Reason']})")
+    if len(anomalies) > limit:
+        lines.append(f"- ...and {len(anomalies) - limit} more")
+    return "\n".join(lines)
@@ -1,14 +1,39 @@
+import os
 import re
 import json
+import copy
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from time import monotonic
 import requests
-import spacy
-from typing import Dict, List
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional
+
+from metrics import timed
 
 # ---------------- CONFIG ----------------
-OLLAMA_URL = "http://localhost:11434/api/generate"
-MODEL = "phi3:mini"
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434/api/generate")
+MODEL = os.environ.get("OLLAMA_MODEL", "phi3:mini")
+
+CONNECT_TIMEOUT = 2        # a local server either answers fast or is down
+READ_TIMEOUT = 15
+CACHE_SIZE = 256
+
+_nlp = None
 
-nlp = spacy.load("en_core_web_sm")
+
+def get_nlp():
+    """
+    spaCy pipeline, loaded on first use: the model is an optional install
+    (python -m spacy download en_core_web_sm) and importing this module
+    must not require it.
+    """
+    global _nlp
+    if _nlp is None:
+        import spacy
+        _nlp = spacy.load("en_core_web_sm")
+    return _nlp
 
 # ---------------- REGEX ----------------
 
@@ -144,20 +169,82 @@ def extract_store_date_payment(text: str):
 
     return store, date, time, payment
 
-# ---------------- AI CLEANUP ONLY ----------------
+# ---------------- OLLAMA TRANSPORT ----------------
+
+class CircuitBreaker:
+    """
+    Skips calls to the local LLM after repeated failures.
+    After `failure_threshold` consecutive failures the breaker opens for
+    `reset_timeout` seconds; then a single probe call is let through and
+    its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._probing and monotonic() - self.opened_at >= self.reset_timeout:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = monotonic()
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+
+BREAKER = CircuitBreaker()
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """
+    Shared keep-alive session so receipts reuse one pooled connection.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=0)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+@timed("ai", provider="ollama")
+def _ollama_generate(prompt: str) -> str:
+    """
+    Sends one prompt to Ollama and returns the raw response text.
+    Raises RuntimeError without a network call while the breaker is open.
+    """
+    if not BREAKER.allow():
+        raise RuntimeError("Local LLM unavailable (circuit open)")
 
-def normalize_with_ai(data: Dict) -> Dict:
     try:
-        prompt = f"""
-Fix spelling only.
-Do NOT invent or add new values.
-Return VALID JSON ONLY.
-
-DATA:
-{json.dumps(data, indent=2)}
-"""
-
-        r = requests.post(
+        r = _get_session().post(
             OLLAMA_URL,
             json={
                 "model": MODEL,
@@ -165,18 +252,151 @@ DATA:
                 "temperature": 0.0,
                 "stream": False
             },
-            timeout=15
+            timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
         )
+        r.raise_for_status()
+        text = r.json().get("response", "")
+    except Exception:
+        BREAKER.record_failure()
+        raise
+
+    BREAKER.record_success()
+    return text
+
+
+# ---------------- NORMALIZATION CACHE ----------------
+
+_cache: "OrderedDict[str, Dict]" = OrderedDict()
+_inflight: Dict[str, Future] = {}
+_cache_lock = threading.Lock()
+
+
+def _cache_key(data) -> str:
+    return json.dumps(data, sort_keys=True, ensure_ascii=False)
 
-        match = re.search(r"\{[\s\S]*\}", r.json().get("response", ""))
-        return json.loads(match.group()) if match else data
 
+def _cache_get(key: str):
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return copy.deepcopy(_cache[key])
+    return None
+
+
+def _cache_put(key: str, value: Dict):
+    with _cache_lock:
+        _cache[key] = copy.deepcopy(value)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+# ---------------- AI CLEANUP ONLY ----------------
+
+def _normalize_uncached(data: Dict) -> Dict:
+    prompt = f"""
+Fix spelling only.
+Do NOT invent or add new values.
+Return VALID JSON ONLY.
+
+DATA:
+{json.dumps(data, indent=2)}
+"""
+
+    match = re.search(r"\{[\s\S]*\}", _ollama_generate(prompt))
+    return json.loads(match.group()) if match else data
+
+
+def normalize_with_ai(data: Dict, raise_on_error: bool = False) -> Dict:
+    """
+    Spelling cleanup through the local LLM.
+    Results are cached on the input JSON, concurrent calls with the same
+    input share one request, and the original data is returned unchanged
+    when the server is down or the circuit breaker is open (or the error
+    is re-raised with `raise_on_error`).
+    """
+    key = _cache_key(data)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    with _cache_lock:
+        future = _inflight.get(key)
+        leader = future is None
+        if leader:
+            future = Future()
+            _inflight[key] = future
+
+    if leader:
+        try:
+            result = _normalize_uncached(data)
+            _cache_put(key, result)
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with _cache_lock:
+                _inflight.pop(key, None)
+
+    try:
+        return copy.deepcopy(future.result())
     except Exception:
-        return data
+        if raise_on_error:
+            raise
+        return copy.deepcopy(data)
+
+
+def normalize_batch_with_ai(records: List[Dict]) -> List[Dict]:
+    """
+    Normalizes several receipts with one LLM prompt.
+    Cached records are not re-sent; if the model returns a list of the
+    wrong length, the affected records are returned unchanged.
+    """
+    results: List[Optional[Dict]] = [None] * len(records)
+    pending = []
+    for i, data in enumerate(records):
+        cached = _cache_get(_cache_key(data))
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    if pending:
+        batch = [records[i] for i in pending]
+        prompt = f"""
+Fix spelling only in each object of the JSON array below.
+Do NOT invent or add new values.
+Return a VALID JSON ARRAY ONLY, with exactly {len(batch)} objects in the same order.
+
+DATA:
+{json.dumps(batch, indent=2)}
+"""
+        fixed = None
+        try:
+            match = re.search(r"\[[\s\S]*\]", _ollama_generate(prompt))
+            parsed = json.loads(match.group()) if match else None
+            if isinstance(parsed, list) and len(parsed) == len(batch) and all(isinstance(p, dict) for p in parsed):
+                fixed = parsed
+        except Exception:
+            fixed = None
+
+        for pos, i in enumerate(pending):
+            if fixed is not None:
+                _cache_put(_cache_key(records[i]), fixed[pos])
+                results[i] = fixed[pos]
+            else:
+                results[i] = records[i]
+
+    return results
 
 # ---------------- MAIN PIPELINE ----------------
 
-def extract_and_map(ocr_text: str) -> Dict:
+def extract_and_map(ocr_text: str, require_llm: bool = False) -> Dict:
+    """
+    Rule-based mapping of OCR text, spell-fixed by the local LLM.
+    With `require_llm` an unreachable LLM raises instead of silently
+    returning the un-normalized mapping.
+    """
     if len(ocr_text.strip()) < 40:
         raise ValueError("OCR text too weak")
 
@@ -201,4 +421,4 @@ def extract_and_map(ocr_text: str) -> Dict:
         "items": items
     }
 
-    return normalize_with_ai(base)
\ No newline at end of file
+    return normalize_with_ai(base, raise_on_error=require_llm)
\ No newline at end of file
@@ -3,17 +3,22 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
-from queries import fetch_all_receipts
+from receipt_frame import CENTS_COLUMNS, load_receipts_frame
 from config import CURRENCY_SYMBOL
-from insights import generate_ai_insights
+from money import from_cents
+from insights import stream_ai_insights
 from forecasting import (
-    calculate_moving_averages,
+    calculate_moving_averages_incremental,
     predict_next_month_spending,
-    predict_spending_polynomial
+    predict_spending_polynomial,
+    forecast_by_group
 )
+from rolling_stats import get_rolling_stats
+from logger import log_error
 from advanced_analytics import (
     detect_subscriptions,
-    calculate_burn_rate
+    calculate_burn_rate,
+    detect_anomalies
 )
 
 # ================= PLOTLY THEME DEFAULTS =================
@@ -120,15 +125,13 @@ def render_analytics():
     )
 
     # ---------- Fetch Data ----------
-    receipts = fetch_all_receipts()
+    receipts_df = load_receipts_frame()
 
-    if not receipts:
+    if receipts_df.empty:
         st.info("No receipts found. Upload some receipts to see analytics!")
         return
 
-    df = pd.DataFrame(receipts)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values(by="date")
+    df = receipts_df.sort_values(by="date")
 
     # ================================================================
     #  CONTROLS BAR  (replaces sidebar filters, budget, export)
@@ -165,7 +168,7 @@ def render_analytics():
 
             current_month = datetime.now().strftime("%Y-%m")
             current_month_df = df[df["date"].dt.strftime("%Y-%m") == current_month]
-            current_spend = current_month_df["amount"].sum()
+            current_spend = from_cents(current_month_df["amount_cents"].sum())
             days_passed = datetime.now().day
 
             budget_stats = calculate_burn_rate(current_spend, budget_input, days_passed)
@@ -195,7 +198,7 @@ def render_analytics():
             else:
                 df_filtered = df.copy()
 
-            csv = df_filtered.to_csv(index=False).encode("utf-8")
+            csv = df_filtered.drop(columns=CENTS_COLUMNS).to_csv(index=False).encode("utf-8")
             st.download_button(
                 "Download CSV",
                 csv,
@@ -221,14 +224,15 @@ def render_analytics():
 
     col1, col2, col3, col4 = st.columns(4)
 
-    total_spending = df_filtered["amount"].sum()
-    avg_transaction = df_filtered["amount"].mean() if not df_filtered.empty else 0
+    total_cents = int(df_filtered["amount_cents"].sum())
+    total_spending = from_cents(total_cents)
+    avg_transaction = from_cents(round(total_cents / len(df_filtered))) if not df_filtered.empty else 0
     transaction_count = len(df_filtered)
 
     if not df_filtered.empty:
-        cat_group = df_filtered.groupby("category")["amount"].sum().sort_values(ascending=False)
+        cat_group = df_filtered.groupby("category", observed=True)["amount_cents"].sum().sort_values(ascending=False)
         top_cat = cat_group.index[0]
-        top_cat_amt = cat_group.iloc[0]
+        top_cat_amt = from_cents(cat_group.iloc[0])
     else:
         top_cat, top_cat_amt = "N/A", 0
 
@@ -254,8 +258,10 @@ def render_analytics():
     with tab_trends:
         monthly_df = (
             df_filtered.set_index("date")
-            .resample("M")["amount"]
+            .resample("M")["amount_cents"]
             .sum()
+            .div(100)
+            .rename("amount")
             .reset_index()
         )
 
@@ -284,7 +290,11 @@ def render_analytics():
         st.markdown("<div style='height:0.25rem'></div>", unsafe_allow_html=True)
         _section_header("Moving Averages", "Daily spending vs 7-day rolling average")
 
-        daily_spend, ma_7 = calculate_moving_averages(df_filtered, 7)
+        if len(date_range) == 2:
+            ma_start, ma_end = date_range
+        else:
+            ma_start, ma_end = None, None
+        daily_spend, ma_7 = calculate_moving_averages_incremental(7, ma_start, ma_end)
 
         fig_ma = go.Figure()
         fig_ma.add_trace(go.Scatter(
@@ -299,6 +309,19 @@ def render_analytics():
         fig_ma.update_layout(title="Daily Spend & Moving Average", **PLOTLY_LAYOUT)
         st.plotly_chart(fig_ma, use_container_width=True)
 
+        # Trailing windows ending on the last day of the selected range, clipped to its start
+        rolling = get_rolling_stats()
+        w_cols = st.columns(len(rolling.windows))
+        for w_col, window in zip(w_cols, rolling.windows):
+            w_stats = rolling.window_stats(window, ma_start, ma_end)
+            w_col.metric(
+                f"{window}-Day Avg / Day" if w_stats["days"] >= window else f"{w_stats['days']}-Day Avg / Day",
+                f"{CURRENCY_SYMBOL}{w_stats['mean']:,.2f}",
+                f"\u00b1{CURRENCY_SYMBOL}{w_stats['std']:,.2f}",
+                delta_color="off",
+                help=f"Trailing {window} days ending {ma_end or rolling.last_day}, within the selected range",
+            )
+
         predicted, avg = predict_next_month_spending(df)
         st.info(
             f"Predicted next month spend: "
@@ -306,9 +329,50 @@ def render_analytics():
             f"(Daily Avg: {CURRENCY_SYMBOL}{avg:,.2f})"
         )
 
+        st.markdown("<div style='height:0.25rem'></div>", unsafe_allow_html=True)
+        _section_header("Forecast by Group", "Last 30 days vs projected next 30 days, per category or top vendor")
+
+        group_choice = st.radio(
+            "Forecast by",
+            ["Category", "Top 10 Vendors"],
+            horizontal=True,
+            label_visibility="collapsed",
+            key="analytics_group_forecast_by",
+        )
+        if group_choice == "Category":
+            group_daily, group_forecast = forecast_by_group(df, by="category")
+        else:
+            group_daily, group_forecast = forecast_by_group(df, by="vendor", top_n=10)
+
+        if group_forecast is not None:
+            group_summary = pd.DataFrame({
+                "Last 30 Days": group_daily.tail(30).sum(),
+                "Projected Next 30 Days": group_forecast.sum(),
+            }).sort_values("Projected Next 30 Days", ascending=False)
+
+            fig_group = go.Figure()
+            fig_group.add_trace(go.Bar(
+                x=group_summary.index, y=group_summary["Last 30 Days"], name="Last 30 Days",
+                marker_color=CHART_COLORS[0],
+            ))
+            fig_group.add_trace(go.Bar(
+                x=group_summary.index, y=group_summary["Projected Next 30 Days"], name="Projected Next 30 Days",
+                marker_color=CHART_COLORS[3],
+            ))
+            fig_group.update_layout(barmode="group", title=f"Forecast by {group_choice}", **PLOTLY_LAYOUT)
+            st.plotly_chart(fig_group, use_container_width=True)
+        else:
+            st.caption("Not enough history to forecast per group yet.")
+
     # ================== Categories ==================
     with tab_cats:
-        cat_df = df_filtered.groupby("category")["amount"].sum().reset_index()
+        cat_df = (
+            df_filtered.groupby("category", observed=True)["amount_cents"]
+            .sum()
+            .div(100)
+            .rename("amount")
+            .reset_index()
+        )
 
         col_a, col_b = st.columns(2)
 
@@ -336,8 +400,10 @@ def render_analytics():
     # ================== Vendors ==================
     with tab_vendors:
         vendor_df = (
-            df_filtered.groupby("vendor")["amount"]
+            df_filtered.groupby("vendor", observed=True)["amount_cents"]
             .sum()
+            .div(100)
+            .rename("amount")
             .reset_index()
             .sort_values("amount")
         )
@@ -372,6 +438,14 @@ def render_analytics():
         fig_box.update_layout(**PLOTLY_LAYOUT, title=None)
         st.plotly_chart(fig_box, use_container_width=True)
 
+        st.markdown("<div style='height:0.5rem'></div>", unsafe_allow_html=True)
+        _section_header("Detected Anomalies", "Vendor / category outliers, unusual tax ratios and same-day duplicates")
+        anomalies = detect_anomalies(df_filtered)
+        if not anomalies.empty:
+            st.dataframe(anomalies, use_container_width=True, hide_index=True)
+        else:
+            st.success("No anomalies detected in the selected period.")
+
         st.markdown("<div style='height:0.5rem'></div>", unsafe_allow_html=True)
         _section_header("Recurring Subscriptions", "Auto-detected from transaction patterns")
         subs = detect_subscriptions(df)
@@ -386,6 +460,13 @@ def render_analytics():
         st.markdown("<div style='height:0.25rem'></div>", unsafe_allow_html=True)
 
         if st.button("Generate AI Report", type="primary", use_container_width=False):
-            with st.spinner("Analyzing your spending data..."):
-                insight = generate_ai_insights(df_filtered)
-                st.markdown(insight)
+            # Rendered progressively as Gemini streams the report
+            try:
+                st.write_stream(stream_ai_insights(df_filtered))
+            except Exception as e:
+                log_error(f"insights: report failed: {e}")
+                st.error(f"Error generating insights: {e}")
+            else:
+                ttft = st.session_state.get("LAST_INSIGHTS_TTFT")
+                if ttft is not None:
+                    st.caption(f"First output after {ttft:.2f}s")
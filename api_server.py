@@ -0,0 +1,320 @@
+"""
+Local HTTP API for other tools that need receipt data.
+
+    python api_server.py --port 8600
+
+    POST /extract?filename=scan.jpg[&save=1]   body = image / PDF bytes
+    GET  /receipts?vendor=&category=&start=&end=&min_amount=&max_amount=&limit=&offset=
+    GET  /receipts/<bill_id>
+    GET  /aggregates/summary | by-category | by-vendor | monthly   (same filters)
+    GET  /aggregates/subscriptions | anomalies
+    GET  /health
+    GET  /metrics                                  Prometheus text format
+
+HTTP/1.1 with keep-alive; /receipts pages are streamed as chunked JSON.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+from config import MAX_FILE_SIZE_MB
+from database.db import init_db
+from queries import (
+    count_receipts, iter_receipts, fetch_receipt, receipt_summary, aggregate_receipts,
+)
+from metrics import observe, render_prometheus
+from logger import setup_logging, log_context, new_request_id, log_info, log_error
+
+MAX_CONCURRENT_REQUESTS = 16   # requests being handled at once
+MAX_CONCURRENT_EXTRACTIONS = 2 # OCR / AI extraction is CPU and quota heavy
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 10000
+KEEP_ALIVE_TIMEOUT = 15        # seconds an idle keep-alive connection is kept
+
+_REQUEST_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT_REQUESTS)
+_EXTRACT_SLOTS = threading.BoundedSemaphore(MAX_CONCURRENT_EXTRACTIONS)
+
+FILTER_PARAMS = ["vendor", "category", "start", "end", "min_amount", "max_amount"]
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _filters(query):
+    filters = {}
+    for name in FILTER_PARAMS:
+        value = query.get(name, [None])[0]
+        if value in (None, ""):
+            continue
+        if name in ("min_amount", "max_amount"):
+            try:
+                value = float(value)
+            except ValueError:
+                raise ApiError(400, f"{name} must be a number")
+        filters[name] = value
+    return filters
+
+
+def _int_param(query, name, default, low, high):
+    raw = query.get(name, [None])[0]
+    if raw in (None, ""):
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+    if not low <= value <= high:
+        raise ApiError(400, f"{name} must be between {low} and {high}")
+    return value
+
+
+def _frame_records(frame):
+    """
+    DataFrame -> JSON-safe records (dates / numpy scalars as strings / numbers).
+    """
+    return json.loads(frame.to_json(orient="records", date_format="iso"))
+
+
+class ReceiptApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # keep-alive
+    timeout = KEEP_ALIVE_TIMEOUT
+    server_version = "ReceiptVaultAPI/1.0"
+
+    # ---------- plumbing ----------
+
+    def log_message(self, format, *args):
+        log_info("api: " + format % args, client=self.client_address[0])
+
+    def send_response(self, code, message=None):
+        super().send_response(code, message)
+        self.send_header("X-Request-ID", self._request_id)
+
+    def log_request(self, code="-", size="-"):
+        # One structured line per request is written by _dispatch instead
+        self._status = code
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 503:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data: bytes):
+        if data:
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+
+    def _stream_json(self, head: dict, key, records):
+        """
+        Streams {...head, key: [records...]} with chunked transfer encoding,
+        so large result sets never sit in memory as one document.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self._streaming = True
+
+        opening = json.dumps(head, default=str)[:-1]
+        self._send_chunk(f'{opening}{", " if head else ""}"{key}": ['.encode("utf-8"))
+        buffer, first = [], True
+        for record in records:
+            buffer.append(("" if first else ",") + json.dumps(record, default=str))
+            first = False
+            if len(buffer) >= 200:
+                self._send_chunk("".join(buffer).encode("utf-8"))
+                buffer = []
+        buffer.append("]}")
+        self._send_chunk("".join(buffer).encode("utf-8"))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _dispatch(self, method):
+        self._request_id = self.headers.get("X-Request-ID") or new_request_id()
+        with log_context(request_id=self._request_id):
+            self._handle(method)
+
+    def _handle(self, method):
+        self._streaming = False
+        self._status = None
+        if not _REQUEST_SLOTS.acquire(blocking=False):
+            # The request body is not read, so the connection cannot be reused
+            self.close_connection = True
+            self._send_json(503, {"error": "server busy, retry shortly"})
+            return
+        started = time.perf_counter()
+        route_name, failed = "unmatched", True
+        try:
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            route = getattr(self, f"_{method}_routes")()
+            for prefix, handler in route:
+                if url.path == prefix or (prefix.endswith("/") and url.path.startswith(prefix)):
+                    route_name = prefix
+                    handler(url.path[len(prefix):] if prefix.endswith("/") else None, query)
+                    failed = False
+                    return
+            raise ApiError(404, f"no route for {method.upper()} {url.path}")
+        except ApiError as e:
+            # An unread request body would corrupt the next keep-alive request
+            if method == "post":
+                self.close_connection = True
+            self._send_json(e.status, {"error": e.message})
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except Exception as e:
+            log_error(f"api: {method.upper()} {self.path} failed: {e}")
+            self.close_connection = True
+            if not self._streaming:
+                self._send_json(500, {"error": "internal error"})
+        finally:
+            _REQUEST_SLOTS.release()
+            elapsed = time.perf_counter() - started
+            # Label by route prefix, not full path, to keep the series count bounded
+            observe("api", elapsed, failed, method=method.upper(), route=route_name)
+            log_info(f"api: {method.upper()} {self.path}", status=self._status, route=route_name,
+                     duration_ms=round(elapsed * 1000, 1), client=self.client_address[0])
+
+    def do_GET(self):
+        self._dispatch("get")
+
+    def do_POST(self):
+        self._dispatch("post")
+
+    def _get_routes(self):
+        return [
+            ("/health", self.get_health),
+            ("/metrics", self.get_metrics),
+            ("/receipts", self.get_receipts),
+            ("/receipts/", self.get_receipt),
+            ("/aggregates/summary", self.get_summary),
+            ("/aggregates/by-category", lambda _, q: self.get_grouped("category", q)),
+            ("/aggregates/by-vendor", lambda _, q: self.get_grouped("vendor", q)),
+            ("/aggregates/monthly", lambda _, q: self.get_grouped("month", q)),
+            ("/aggregates/subscriptions", self.get_subscriptions),
+            ("/aggregates/anomalies", self.get_anomalies),
+        ]
+
+    def _post_routes(self):
+        return [("/extract", self.post_extract)]
+
+    # ---------- endpoints ----------
+
+    def get_health(self, _, query):
+        self._send_json(200, {"status": "ok"})
+
+    def get_metrics(self, _, query):
+        body = render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def get_receipts(self, _, query):
+        filters = _filters(query)
+        limit = _int_param(query, "limit", DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        offset = _int_param(query, "offset", 0, 0, 2 ** 62)
+        total = count_receipts(**filters)
+        head = {
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "next_offset": offset + limit if offset + limit < total else None,
+        }
+        self._stream_json(head, "receipts", iter_receipts(limit, offset, **filters))
+
+    def get_receipt(self, bill_id, query):
+        receipt = fetch_receipt(unquote(bill_id))
+        if receipt is None:
+            raise ApiError(404, "receipt not found")
+        self._send_json(200, receipt)
+
+    def get_summary(self, _, query):
+        self._send_json(200, receipt_summary(**_filters(query)))
+
+    def get_grouped(self, group_by, query):
+        # One row per group, summed in SQL: small enough to send in one piece
+        limit = _int_param(query, "limit", None, 1, MAX_PAGE_SIZE)
+        rows = aggregate_receipts(group_by, limit, **_filters(query))
+        self._send_json(200, {"group_by": group_by, "groups": rows})
+
+    def get_subscriptions(self, _, query):
+        from receipt_frame import load_receipts_frame
+        from advanced_analytics import detect_subscriptions
+        self._send_json(200, {"subscriptions": _frame_records(detect_subscriptions(load_receipts_frame()))})
+
+    def get_anomalies(self, _, query):
+        from receipt_frame import load_receipts_frame
+        from advanced_analytics import detect_anomalies
+        self._send_json(200, {"anomalies": _frame_records(detect_anomalies(load_receipts_frame()))})
+
+    def post_extract(self, _, query):
+        from pipeline import is_supported, extract_document, save_extraction, content_hash
+        from queries import source_exists
+
+        filename = query.get("filename", [None])[0] or self.headers.get("X-Filename") or "upload.jpg"
+        if not is_supported(filename):
+            raise ApiError(415, "filename must end in .png, .jpg, .jpeg or .pdf")
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0:
+            raise ApiError(411, "Content-Length required")
+        if length > MAX_FILE_SIZE_MB * 1024 * 1024:
+            raise ApiError(413, f"file larger than {MAX_FILE_SIZE_MB} MB")
+        content = self.rfile.read(length)
+
+        save = query.get("save", ["0"])[0] in ("1", "true", "yes")
+        if save and source_exists(content_hash(content)):
+            self._send_json(200, {"name": filename, "status": "duplicate"})
+            return
+
+        # Extraction gets its own, smaller limit so it cannot starve queries
+        if not _EXTRACT_SLOTS.acquire(timeout=30):
+            raise ApiError(503, "extraction capacity exhausted, retry shortly")
+        try:
+            result = extract_document(filename, content, api_key=os.environ.get("GEMINI_API_KEY"))
+            if save:
+                result = save_extraction(result, content)
+        finally:
+            _EXTRACT_SLOTS.release()
+
+        result.pop("validation", None)
+        self._send_json(200 if result["status"] != "failed" else 422, result)
+
+
+class ReceiptApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="api_server.py", description="Receipt Vault local HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args(argv)
+
+    init_db()
+    setup_logging("api.log")
+    server = ReceiptApiServer((args.host, args.port), ReceiptApiHandler)
+    print(f"Receipt API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ from upload_ui import render_upload_ui
 from dashboard_ui import render_dashboard
 from validation_ui import validation_ui
 from analytics_ui import render_analytics
+from diagnostics_ui import render_diagnostics
+from profiling import profile_section, profiling_enabled
 
 # ================= CONFIG =================
 st.set_page_config(
@@ -363,6 +365,19 @@ def main():
         else:
             st.caption("⚠️ No API key configured. Some features may be unavailable.")
 
+        st.toggle(
+            "Profile each tab",
+            key="profiling",
+            help="Runs every tab under cProfile and a stack sampler on each rerun and saves "
+                 "flamegraph files to logs/profiles. Slows the app down; leave off normally.",
+        )
+
+    profiling = profiling_enabled(st.session_state.get("profiling"))
+
+    # Timing histograms for this app process
+    with st.expander("Diagnostics", expanded=False, icon="🩺"):
+        render_diagnostics()
+
     # ===== HORIZONTAL TAB NAVIGATION (replaces sidebar) =====
     tab_upload, tab_validation, tab_dashboard, tab_analytics, tab_chat = st.tabs([
         "Upload Receipt",
@@ -372,23 +387,24 @@ def main():
         "Chat with Data",
     ])
 
-    with tab_upload:
+    # Streamlit renders every tab on each rerun, so each one is profiled separately
+    with tab_upload, profile_section("tab-upload", profiling):
         st.markdown("<br>", unsafe_allow_html=True)
         render_upload_ui()
 
-    with tab_validation:
+    with tab_validation, profile_section("tab-validation", profiling):
         st.markdown("<br>", unsafe_allow_html=True)
         validation_ui()
 
-    with tab_dashboard:
+    with tab_dashboard, profile_section("tab-dashboard", profiling):
         st.markdown("<br>", unsafe_allow_html=True)
         render_dashboard()
 
-    with tab_analytics:
+    with tab_analytics, profile_section("tab-analytics", profiling):
         st.markdown("<br>", unsafe_allow_html=True)
         render_analytics()
 
-    with tab_chat:
+    with tab_chat, profile_section("tab-chat", profiling):
         st.markdown("<br>", unsafe_allow_html=True)
         from chat_ui import render_chat
         render_chat()
@@ -0,0 +1,305 @@
+"""
+Analytics benchmark on synthetic ledgers in the real receipts schema.
+
+    python benchmarks/bench_analytics.py --sizes 10000,100000,1000000
+    python benchmarks/bench_analytics.py --sizes 10000 --baseline old.json --max-regression 20
+    python benchmarks/bench_analytics.py --compare HEAD~5 HEAD --sizes 100000
+
+For each ledger size, times the steps behind the Dashboard / Analytics
+tabs and flags those over the interactivity budget. Ledgers are built
+with the benchmarked revision's own schema and cached in --cache-dir by
+(size, seed, schema), since generating 5M rows takes a while.
+"""
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from common import (  # noqa: E402
+    use_repo, summarize_ms, time_call, git_revision, environment, write_report,
+    run_at_revision, compare_reports, print_comparison,
+)
+
+INTERACTIVE_BUDGET_MS = 200    # a step slower than this makes a tab feel sluggish
+CATEGORIES = ["Food", "Grocery", "Medical", "Travel", "Shopping", "Utility", "Entertainment", "Uncategorized"]
+# Order of the values yielded by _ledger_rows; revisions without some of
+# these columns (older schemas) get only the ones they have
+SCHEMA_COLUMNS = ("bill_id", "vendor", "date", "amount", "tax", "subtotal", "category",
+                  "amount_cents", "tax_cents", "subtotal_cents")
+
+
+# ================= LEDGER =================
+
+def _ledger_rows(size, seed, start=date(2021, 1, 1), days=1095):
+    """
+    Yields receipt rows: a long tail of vendors with skewed popularity,
+    plus ~2% monthly subscription payments so detect_subscriptions has
+    real work to do.
+    """
+    rng = random.Random(seed)
+    vendors = [(f"Vendor {i:05d}", rng.choice(CATEGORIES)) for i in range(max(50, min(size // 40, 20000)))]
+    subscriptions = [(f"Subscription {i:03d}", "Utility", rng.randint(19900, 149900)) for i in range(40)]
+
+    for i in range(size):
+        if rng.random() < 0.02:
+            vendor, category, amount_cents = subscriptions[i % len(subscriptions)]
+            day = (i // len(subscriptions)) * 30 % days
+        else:
+            vendor, category = vendors[int(len(vendors) * rng.random() ** 2)]
+            amount_cents = int(rng.lognormvariate(6.5, 1.0) * 100)
+            day = rng.randrange(days)
+        tax_cents = amount_cents * 8 // 108
+        subtotal_cents = amount_cents - tax_cents
+        yield (
+            f"BENCH-{i:08d}", vendor, (start + timedelta(days=day)).isoformat(),
+            amount_cents / 100, tax_cents / 100, subtotal_cents / 100, category,
+            amount_cents, tax_cents, subtotal_cents,
+        )
+
+
+def _schema(conn):
+    """
+    (short hash of the full schema, receipts columns, table names).
+    """
+    ddl = [r[0] for r in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL ORDER BY type, name"
+    )]
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    columns = [r[1] for r in conn.execute("PRAGMA table_info(receipts)")]
+    return hashlib.sha256("\n".join(ddl).encode("utf-8")).hexdigest()[:12], columns, tables
+
+
+def schema_key(init_db, cache_dir):
+    """
+    Hash of the schema init_db creates, so ledgers built for one revision
+    are never reused by a revision with another schema.
+    """
+    probe = os.path.join(cache_dir, f"schema_probe_{os.getpid()}.db")
+    if os.path.exists(probe):
+        os.remove(probe)
+    init_db(probe)
+    conn = sqlite3.connect(probe)
+    try:
+        return _schema(conn)[0]
+    finally:
+        conn.close()
+        os.remove(probe)
+
+
+def build_ledger(path, size, seed, init_db):
+    """
+    Creates (or reuses) a SQLite vault with `size` synthetic receipts,
+    using the app's own init_db for the schema. Only the receipts columns
+    that schema has are filled.
+    """
+    if os.path.exists(path):
+        return False
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    init_db(tmp)
+
+    conn = sqlite3.connect(tmp)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    _, existing, tables = _schema(conn)
+    keep = [i for i, col in enumerate(SCHEMA_COLUMNS) if col in existing]
+    insert = (f"INSERT INTO receipts ({', '.join(SCHEMA_COLUMNS[i] for i in keep)}) "
+              f"VALUES ({', '.join('?' * len(keep))})")
+    rows = _ledger_rows(size, seed)
+    while True:
+        chunk = [tuple(r[i] for i in keep) for _, r in zip(range(50000), rows)]
+        if not chunk:
+            break
+        conn.executemany(insert, chunk)
+    if "vault_meta" in tables:
+        conn.execute("UPDATE vault_meta SET value = value + 1 WHERE key = 'data_version'")
+    conn.commit()
+    conn.close()
+    os.replace(tmp, path)
+    return True
+
+
+# ================= STEPS =================
+
+def run_size(size, args, modules):
+    db, queries, pd = modules["db"], modules["queries"], modules["pd"]
+
+    def init_at(p):
+        db.DB_PATH = p
+        db.init_db()
+
+    path = os.path.join(args.cache_dir, f"ledger_{size}_{args.seed}_{schema_key(init_at, args.cache_dir)}.db")
+    started = time.perf_counter()
+    built = build_ledger(path, size, args.seed, init_at)
+    build_seconds = time.perf_counter() - started
+    db.DB_PATH = path
+
+    samples, skipped = {}, {}
+
+    def bench(name, fn, *fargs, **fkwargs):
+        result = None
+        for _ in range(args.repeat):
+            try:
+                seconds, result = time_call(fn, *fargs, **fkwargs)
+            except Exception as e:
+                skipped[name] = f"{type(e).__name__}: {e}"
+                return None
+            samples.setdefault(name, []).append(seconds)
+        return result
+
+    rows = bench("fetch_all_receipts", queries.fetch_all_receipts)
+    df = bench("DataFrame(rows)", lambda: _legacy_frame(pd, rows)) if rows is not None else None
+
+    receipt_frame = modules.get("receipt_frame")
+    if receipt_frame is not None:
+        # Bypass the per-version cache so each repeat measures a real load
+        def load_uncached():
+            receipt_frame._CACHE["frame"] = None
+            return receipt_frame.load_receipts_frame()
+        frame = bench("load_receipts_frame", load_uncached)
+        if frame is not None:
+            df = frame
+    else:
+        skipped["load_receipts_frame"] = "receipt_frame not in this revision"
+
+    if df is None:
+        return {"rows": size, "stages": {}, "skipped": skipped}
+
+    advanced, forecasting, search = modules["advanced_analytics"], modules["forecasting"], modules["search"]
+    bench("detect_subscriptions", advanced.detect_subscriptions, df)
+    bench("predict_spending_polynomial", forecasting.predict_spending_polynomial, df)
+    bench("calculate_moving_averages", forecasting.calculate_moving_averages, df, 7)
+    bench("search_receipts", search.search_receipts, df, "vendor 001")
+    observed = {"observed": True} if isinstance(df["category"].dtype, pd.CategoricalDtype) else {}
+    bench("groupby_category", lambda: df.groupby("category", **observed)["amount"].sum().sort_values(ascending=False))
+    bench("groupby_vendor_top10", lambda: df.groupby("vendor", **observed)["amount"].sum().nlargest(10))
+
+    stages = {name: summarize_ms(values) for name, values in samples.items()}
+    slow = [name for name, s in stages.items() if s["p50_ms"] is not None and s["p50_ms"] > INTERACTIVE_BUDGET_MS]
+    return {
+        "rows": size,
+        "ledger_built": built,
+        "ledger_build_seconds": round(build_seconds, 2),
+        "ledger_mb": round(os.path.getsize(path) / 1e6, 1),
+        "stages": stages,
+        "over_budget": slow,
+        "skipped": skipped,
+    }
+
+
+def _legacy_frame(pd, rows):
+    """
+    The frame as the UI built it before receipt_frame: plain object columns.
+    """
+    df = pd.DataFrame(rows)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    return df
+
+
+def _try_import(name):
+    try:
+        return importlib.import_module(name)
+    except Exception as e:  # missing dependency or module absent in this revision
+        return e
+
+
+def run(args):
+    repo = use_repo(args.repo)
+    os.makedirs(args.cache_dir, exist_ok=True)
+
+    import pandas as pd
+    db_module = _try_import("database.db")
+    if isinstance(db_module, Exception):
+        db_module = _try_import("db")
+    if isinstance(db_module, Exception):
+        raise SystemExit(f"cannot import the database module: {db_module}")
+    receipt_frame = _try_import("receipt_frame")
+    modules = {
+        "pd": pd,
+        "db": db_module,
+        "queries": __import__("queries"),
+        "receipt_frame": None if isinstance(receipt_frame, Exception) else receipt_frame,
+        "advanced_analytics": __import__("advanced_analytics"),
+        "forecasting": __import__("forecasting"),
+        "search": __import__("search"),
+    }
+
+    sizes = {}
+    for size in args.sizes:
+        print(f"ledger {size:,} rows ...", file=sys.stderr)
+        sizes[str(size)] = run_size(size, args, modules)
+
+    return {
+        "benchmark": "analytics",
+        "revision": git_revision(repo),
+        "environment": environment(),
+        "params": {"sizes": args.sizes, "seed": args.seed, "repeat": args.repeat,
+                   "budget_ms": INTERACTIVE_BUDGET_MS},
+        "sizes": sizes,
+        # Flattened "<size>/<stage>" view so compare_reports works as for ingestion
+        "stages": {f"{size}/{stage}": s for size, r in sizes.items() for stage, s in r["stages"].items()},
+    }
+
+
+def check_regressions(report, baseline, max_regression):
+    """
+    Stages whose p50 grew by more than `max_regression` percent.
+    """
+    return [
+        r for r in compare_reports(baseline, report)
+        if r["change_pct"] is not None and r["change_pct"] > max_regression
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000",
+                        type=lambda s: [int(x) for x in s.split(",") if x],
+                        help="comma-separated ledger sizes (up to 5000000)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per step")
+    parser.add_argument("--cache-dir", default=os.path.join(os.path.expanduser("~"), ".cache", "receipt-bench"))
+    parser.add_argument("--repo", help="code to benchmark (default: this checkout)")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", help="earlier JSON report to check for regressions")
+    parser.add_argument("--max-regression", type=float, default=20.0,
+                        help="allowed p50 increase in percent before exiting non-zero")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"),
+                        help="benchmark two git revisions and print the p50 change per step")
+    args = parser.parse_args(argv)
+    args.cache_dir = os.path.abspath(args.cache_dir)
+
+    if args.compare:
+        passthrough = ["--sizes", ",".join(map(str, args.sizes)), "--seed", str(args.seed),
+                       "--repeat", str(args.repeat), "--cache-dir", args.cache_dir]
+        script = os.path.abspath(__file__)
+        base = run_at_revision(script, args.compare[0], passthrough)
+        head = run_at_revision(script, args.compare[1], passthrough)
+        print_comparison(compare_reports(base, head), args.compare[0], args.compare[1])
+        if args.output:
+            write_report({"base": base, "head": head, "comparison": compare_reports(base, head)}, args.output)
+        return
+
+    report = run(args)
+    write_report(report, args.output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = check_regressions(report, json.load(f), args.max_regression)
+        for r in regressions:
+            print(f"REGRESSION {r['stage']}: {r['base']:.2f} -> {r['head']:.2f} ms ({r['change_pct']:+.1f}%)",
+                  file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
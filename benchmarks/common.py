@@ -0,0 +1,139 @@
+"""
+Shared helpers for the benchmark scripts: timing, percentiles, JSON
+reports and running a benchmark against another git revision.
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_repo(path=None):
+    """
+    Puts the code under test first on sys.path (default: this checkout).
+    Must run before the app modules are imported.
+    """
+    path = os.path.abspath(path or REPO_ROOT)
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
+    return path
+
+
+def percentile(values, q):
+    """
+    Linear-interpolated percentile, q in [0, 100].
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize_ms(samples):
+    """
+    p50 / p95 / mean / max (ms) and throughput for a list of seconds.
+    """
+    ms = [s * 1000 for s in samples]
+    total = sum(samples)
+    return {
+        "n": len(ms),
+        "p50_ms": round(percentile(ms, 50), 3) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 3) if ms else None,
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else None,
+        "max_ms": round(max(ms), 3) if ms else None,
+        "per_second": round(len(ms) / total, 2) if total else None,
+    }
+
+
+def time_call(fn, *args, **kwargs):
+    """
+    Returns (seconds, result).
+    """
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+def git_revision(path=REPO_ROOT):
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=path, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def write_report(report, output=None):
+    text = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def run_at_revision(script, revision, args):
+    """
+    Checks `revision` out into a temporary git worktree and runs this
+    checkout's `script` against that code (--repo <worktree>), so old
+    revisions without the benchmark can still be measured.
+    Returns the parsed JSON report.
+    """
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        tree = os.path.join(tmp, "tree")
+        subprocess.run(["git", "worktree", "add", "--detach", tree, revision],
+                       cwd=REPO_ROOT, check=True, capture_output=True)
+        try:
+            out = os.path.join(tmp, "report.json")
+            subprocess.run(
+                [sys.executable, script, *args, "--repo", tree, "--output", out],
+                cwd=tmp, check=True
+            )
+            with open(out, encoding="utf-8") as f:
+                report = json.load(f)
+            report["revision"] = revision
+            return report
+        finally:
+            subprocess.run(["git", "worktree", "remove", "--force", tree],
+                           cwd=REPO_ROOT, capture_output=True)
+
+
+def compare_reports(base, head, metric="p50_ms"):
+    """
+    Per-stage `metric` for two reports with the relative change.
+    """
+    rows = []
+    for stage, stats in head.get("stages", {}).items():
+        old = (base.get("stages", {}).get(stage) or {}).get(metric)
+        new = (stats or {}).get(metric)
+        change = None
+        if old and new is not None:
+            change = round((new - old) / old * 100, 1)
+        rows.append({"stage": stage, "base": old, "head": new, "change_pct": change})
+    return rows
+
+
+def print_comparison(rows, base_label, head_label, metric="p50_ms"):
+    print(f"{'stage':<28}{base_label:>14}{head_label:>14}{'change':>10}   ({metric})")
+    for r in rows:
+        fmt = lambda v: "-" if v is None else f"{v:.2f}"
+        change = "-" if r["change_pct"] is None else f"{r['change_pct']:+.1f}%"
+        print(f"{r['stage']:<28}{fmt(r['base']):>14}{fmt(r['head']):>14}{change:>10}")
@@ -0,0 +1,156 @@
+"""
+Synthetic receipts with known ground truth for the benchmarks.
+Each receipt is rendered as an image (and optionally a raster PDF) with
+PIL, in the layout text_parser expects: vendor, bill number, date, item
+lines, subtotal, tax and total.
+"""
+import io
+import random
+from datetime import date, timedelta
+
+VENDORS = {
+    "Food": ["Cafe Mocha", "Spice Kitchen", "Burger Point", "Green Bistro"],
+    "Grocery": ["Fresh Mart", "Daily Basket", "City Super Market"],
+    "Medical": ["Apollo Pharmacy", "MedPlus Health"],
+    "Travel": ["Indian Oil Petrol Pump", "City Fuel Station"],
+    "Shopping": ["Zudio Fashion", "Trends Apparel"],
+}
+
+ITEMS = [
+    "Masala Dosa", "Cold Coffee", "Paneer Wrap", "Veg Burger", "Green Tea",
+    "Basmati Rice", "Toor Dal", "Sunflower Oil", "Milk Packet", "Bread Loaf",
+    "Paracetamol", "Cough Syrup", "Cotton Shirt", "Denim Jeans", "Petrol",
+]
+
+TAX_RATE_BP = 800              # matches validator.EXPECTED_TAX_RATE_BP
+
+
+def make_truth(rng, index, start=date(2024, 1, 1)):
+    """
+    Ground-truth receipt dict (amounts as exact 2-decimal floats).
+    """
+    category = rng.choice(sorted(VENDORS))
+    vendor = rng.choice(VENDORS[category])
+    items = []
+    for name in rng.sample(ITEMS, rng.randint(1, 6)):
+        items.append({"Item": name, "Price": rng.randint(2000, 90000) / 100})
+    subtotal_cents = sum(round(i["Price"] * 100) for i in items)
+    tax_cents = (subtotal_cents * TAX_RATE_BP + 5000) // 10000
+    return {
+        "bill_id": f"INV{100000 + index}",
+        "vendor": vendor,
+        "category": category,
+        "date": (start + timedelta(days=rng.randint(0, 540))).isoformat(),
+        "items": items,
+        "subtotal": subtotal_cents / 100,
+        "tax": tax_cents / 100,
+        "amount": (subtotal_cents + tax_cents) / 100,
+    }
+
+
+def receipt_lines(truth):
+    d = date.fromisoformat(truth["date"])
+    lines = [
+        truth["vendor"],
+        "TAX INVOICE",
+        f"Bill No: {truth['bill_id']}",
+        f"Date: {d:%d/%m/%Y}",
+        "-" * 32,
+    ]
+    lines += [f"{i['Item']:<22}{i['Price']:>10.2f}" for i in truth["items"]]
+    lines += [
+        "-" * 32,
+        f"{'Sub Total':<22}{truth['subtotal']:>10.2f}",
+        f"{'GST 8%':<22}{truth['tax']:>10.2f}",
+        f"{'Total':<22}{truth['amount']:>10.2f}",
+        "",
+        "Thank you, visit again",
+    ]
+    return lines
+
+
+def render_image(lines, rng=None, noise=0.0):
+    """
+    Renders receipt lines onto a white 'thermal paper' image.
+    `noise` (0-1) adds speckles and a slight rotation like a phone photo.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    try:
+        font = ImageFont.truetype("DejaVuSansMono.ttf", 22)
+    except OSError:
+        font = ImageFont.load_default()
+
+    line_height = 30
+    width = 560
+    img = Image.new("L", (width, 60 + line_height * len(lines)), 255)
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(lines):
+        draw.text((24, 30 + i * line_height), line, fill=0, font=font)
+
+    if noise and rng is not None:
+        px = img.load()
+        for _ in range(int(img.width * img.height * 0.002 * noise)):
+            px[rng.randrange(img.width), rng.randrange(img.height)] = rng.randint(0, 120)
+        img = img.rotate(rng.uniform(-2, 2) * noise, expand=True, fillcolor=255)
+
+    return img.convert("RGB")
+
+
+def to_png_bytes(img):
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def to_pdf_bytes(img):
+    """
+    Raster (scanned-style) single-page PDF.
+    """
+    buf = io.BytesIO()
+    img.save(buf, format="PDF", resolution=150)
+    return buf.getvalue()
+
+
+def generate(count, seed=42, noise=0.3, pdf_share=0.0):
+    """
+    Yields {"name", "truth", "text", "image", "bytes"} for `count`
+    reproducible receipts; about `pdf_share` of them as PDFs.
+    """
+    rng = random.Random(seed)
+    for i in range(count):
+        truth = make_truth(rng, i)
+        lines = receipt_lines(truth)
+        image = render_image(lines, rng, noise)
+        as_pdf = rng.random() < pdf_share
+        yield {
+            "name": f"synthetic_{i:05d}.{'pdf' if as_pdf else 'png'}",
+            "truth": truth,
+            "text": "\n".join(lines),
+            "image": image,
+            "bytes": to_pdf_bytes(image) if as_pdf else to_png_bytes(image),
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import os
+
+    parser = argparse.ArgumentParser(description="Write synthetic receipts + ground truth to a folder")
+    parser.add_argument("folder")
+    parser.add_argument("--count", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--noise", type=float, default=0.3)
+    parser.add_argument("--pdf-share", type=float, default=0.2)
+    args = parser.parse_args()
+
+    os.makedirs(args.folder, exist_ok=True)
+    truths = {}
+    for doc in generate(args.count, args.seed, args.noise, args.pdf_share):
+        with open(os.path.join(args.folder, doc["name"]), "wb") as f:
+            f.write(doc["bytes"])
+        truths[doc["name"]] = doc["truth"]
+    with open(os.path.join(args.folder, "ground_truth.json"), "w", encoding="utf-8") as f:
+        json.dump(truths, f, indent=2)
+    print(f"Wrote {args.count} receipts to {args.folder}")
@@ -0,0 +1,257 @@
+import re
+from datetime import date, timedelta
+
+import pandas as pd
+
+from money import format_cents
+
+# Rough prompt sizing: ~4 characters per token for English / tabular text
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 2000
+
+MONTHS = {
+    "jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3,
+    "apr": 4, "april": 4, "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7,
+    "aug": 8, "august": 8, "sep": 9, "sept": 9, "september": 9, "oct": 10, "october": 10,
+    "nov": 11, "november": 11, "dec": 12, "december": 12,
+}
+
+# Checked in order; keywords match whole words only ("top" is not in "stop")
+INTENT_KEYWORDS = [
+    ("count", ["how many", "number of", "count"]),
+    ("top", ["top", "most", "highest", "biggest", "largest", "favourite", "favorite"]),
+    ("average", ["average", "avg", "mean", "typical"]),
+    ("trend", ["trend", "trends", "over time", "per month", "monthly", "compare", "increase", "decrease"]),
+    ("total", ["how much", "total", "spend", "spends", "spending", "spent", "sum", "cost", "costs"]),
+    ("list", ["show", "list", "which", "what receipts", "transaction", "transactions"]),
+]
+
+
+def keyword_pattern(keywords):
+    """
+    One regex matching any of the keywords as whole words / phrases.
+    """
+    alternatives = (re.escape(k).replace(r"\ ", r"\s+") for k in keywords)
+    return re.compile(r"\b(?:" + "|".join(alternatives) + r")\b")
+
+
+INTENT_PATTERNS = [(intent, keyword_pattern(keywords)) for intent, keywords in INTENT_KEYWORDS]
+
+ROW_COLUMNS = ["date", "vendor", "category", "amount", "tax", "bill_id"]
+
+
+# ---------- QUESTION ANALYSIS ----------
+
+def _month_range(year, month):
+    start = date(year, month, 1)
+    end = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return start, end
+
+
+def parse_period(question, today=None):
+    """
+    Extracts a date range from phrases like 'last month', 'this year',
+    'last 30 days', 'in March', 'March 2024' or '2023'.
+    Returns (start, end, label) or (None, None, None).
+    """
+    q = question.lower()
+    today = today or date.today()
+
+    if "today" in q:
+        return today, today, "today"
+    if "yesterday" in q:
+        y = today - timedelta(days=1)
+        return y, y, "yesterday"
+
+    m = re.search(r"\b(?:last|past|previous)\s+(\d+)\s+(day|week|month|year)s?\b", q)
+    if m:
+        n, unit = int(m.group(1)), m.group(2)
+        days = {"day": 1, "week": 7, "month": 30, "year": 365}[unit] * n
+        return today - timedelta(days=days - 1), today, f"last {n} {unit}s"
+
+    if re.search(r"\bthis week\b", q):
+        return today - timedelta(days=today.weekday()), today, "this week"
+    if re.search(r"\blast week\b", q):
+        start = today - timedelta(days=today.weekday() + 7)
+        return start, start + timedelta(days=6), "last week"
+    if re.search(r"\bthis month\b", q):
+        return today.replace(day=1), today, "this month"
+    if re.search(r"\blast month\b", q):
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end, "last month"
+    if re.search(r"\bthis year\b", q):
+        return date(today.year, 1, 1), today, "this year"
+    if re.search(r"\blast year\b", q):
+        return date(today.year - 1, 1, 1), date(today.year - 1, 12, 31), "last year"
+
+    m = re.search(r"\b(" + "|".join(MONTHS) + r")\b(?:\s+(\d{4}))?", q)
+    if m and not (m.group(1) == "may" and m.group(2) is None and not re.search(r"\bin may\b", q)):
+        month = MONTHS[m.group(1)]
+        year = int(m.group(2)) if m.group(2) else (today.year if month <= today.month else today.year - 1)
+        start, end = _month_range(year, month)
+        return start, end, f"{start:%B %Y}"
+
+    m = re.search(r"\b(20\d{2})\b", q)
+    if m:
+        year = int(m.group(1))
+        return date(year, 1, 1), date(year, 12, 31), str(year)
+
+    return None, None, None
+
+
+def match_values(question, values):
+    """
+    Returns the known vendor / category names mentioned in the question,
+    longest first. A name matches on its full text or on its first word
+    (at least 4 letters), so 'amazon' finds 'Amazon Retail India'.
+    """
+    q = question.lower()
+    words = set(re.findall(r"[a-z0-9&']+", q))
+    found = []
+    for value in sorted({str(v) for v in values if v}, key=len, reverse=True):
+        name = value.lower()
+        first = re.split(r"\s+", name)[0]
+        if name in q or (len(first) >= 4 and first in words):
+            found.append(value)
+    return found
+
+
+def intent_matches(question):
+    """
+    Every intent whose keywords appear in the question, in priority order.
+    """
+    q = question.lower()
+    return [intent for intent, pattern in INTENT_PATTERNS if pattern.search(q)]
+
+
+def classify_question(question):
+    """
+    Coarse intent used to pick which aggregates go into the context.
+    """
+    matches = intent_matches(question)
+    return matches[0] if matches else "general"
+
+
+def analyze_question(df, question, today=None):
+    """
+    Intent, date range and vendor / category filters for a chat question.
+    """
+    start, end, period = parse_period(question, today)
+    return {
+        "intent": classify_question(question),
+        "start": start,
+        "end": end,
+        "period": period,
+        "vendors": match_values(question, df["vendor"].unique()) if not df.empty else [],
+        "categories": match_values(question, df["category"].unique()) if not df.empty else [],
+    }
+
+
+def filter_receipts(df, analysis):
+    """
+    Applies the analysis' date range / vendor / category filters to the frame.
+    """
+    mask = pd.Series(True, index=df.index)
+    if analysis["start"] is not None:
+        mask &= df["date"] >= pd.Timestamp(analysis["start"])
+        mask &= df["date"] < pd.Timestamp(analysis["end"]) + pd.Timedelta(days=1)
+    if analysis["vendors"]:
+        mask &= df["vendor"].astype(str).isin(analysis["vendors"])
+    if analysis["categories"]:
+        mask &= df["category"].astype(str).isin(analysis["categories"])
+    return df[mask]
+
+
+# ---------- CONTEXT BUILDING ----------
+
+def _breakdown(df, col, limit=10):
+    totals = df.groupby(col, observed=True)["amount_cents"].sum().nlargest(limit)
+    return "\n".join(f"- {name}: {format_cents(cents)}" for name, cents in totals.items())
+
+
+def estimate_full_table_bytes(df, sample_rows=200):
+    """
+    Estimated size of df.to_string() (the old chat context) without
+    rendering the whole table.
+    """
+    if df.empty:
+        return 0
+    sample = df.head(sample_rows).to_string(index=False)
+    return int(len(sample.encode("utf-8")) / min(len(df), sample_rows) * len(df))
+
+
+def build_chat_context(df, question, token_budget=DEFAULT_TOKEN_BUDGET, today=None):
+    """
+    Builds a compact context for a chat question: a short summary of the
+    whole vault, aggregates of the receipts the question is about, and as
+    many of those receipts as fit in the token budget (newest first).
+    Returns (context_str, stats) where stats records the prompt bytes
+    sent versus the estimated size of the full-table context.
+    """
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    analysis = analyze_question(df, question, today)
+    matched = filter_receipts(df, analysis)
+
+    filters = []
+    if analysis["period"]:
+        filters.append(f"period={analysis['period']} ({analysis['start']} to {analysis['end']})")
+    if analysis["vendors"]:
+        filters.append(f"vendor={', '.join(analysis['vendors'])}")
+    if analysis["categories"]:
+        filters.append(f"category={', '.join(analysis['categories'])}")
+
+    parts = [
+        "Vault overview:",
+        f"- Receipts: {len(df)}",
+        f"- Date range: {df['date'].min():%Y-%m-%d} to {df['date'].max():%Y-%m-%d}" if not df.empty else "- Date range: n/a",
+        f"- Total spend: {format_cents(df['amount_cents'].sum())}",
+        "",
+        f"Filters applied: {'; '.join(filters) if filters else 'none (whole vault)'}",
+        f"- Matching receipts: {len(matched)}",
+        f"- Matching spend: {format_cents(matched['amount_cents'].sum())}",
+        f"- Matching tax: {format_cents(matched['tax_cents'].sum())}",
+    ]
+    if len(matched):
+        parts.append(f"- Average per receipt: {format_cents(matched['amount_cents'].sum() // len(matched))}")
+
+    if not matched.empty:
+        if analysis["intent"] in ("top", "total", "general", "average") or not analysis["categories"]:
+            parts += ["", "Spend by category:", _breakdown(matched, "category")]
+        if analysis["intent"] in ("top", "total", "general", "average") or not analysis["vendors"]:
+            parts += ["", "Top vendors:", _breakdown(matched, "vendor")]
+        if analysis["intent"] == "trend":
+            monthly = matched.set_index("date")["amount_cents"].resample("MS").sum().tail(12)
+            parts += ["", "Monthly spend:"] + [
+                f"- {month:%Y-%m}: {format_cents(cents)}" for month, cents in monthly.items()
+            ]
+
+    context = "\n".join(parts)
+
+    # Matching rows, newest first, until the budget is used up
+    rows_sent = 0
+    remaining = budget_chars - len(context)
+    if not matched.empty and remaining > 200:
+        rows = matched[matched["date"].notna()].sort_values("date", ascending=False)[ROW_COLUMNS]
+        lines = []
+        used = 0
+        for r in rows.itertuples(index=False):
+            line = f"{r.date:%Y-%m-%d},{r.vendor},{r.category},{r.amount:.2f},{r.tax:.2f},{r.bill_id}"
+            if used + len(line) + 1 > remaining - 120:
+                break
+            lines.append(line)
+            used += len(line) + 1
+        rows_sent = len(lines)
+        header = f"\n\nMatching receipts ({rows_sent} of {len(matched)} shown, newest first):\n{','.join(ROW_COLUMNS)}\n"
+        context += header + "\n".join(lines)
+
+    stats = {
+        "intent": analysis["intent"],
+        "period": analysis["period"],
+        "vendors": analysis["vendors"],
+        "categories": analysis["categories"],
+        "matched_rows": len(matched),
+        "rows_sent": rows_sent,
+        "prompt_bytes": len(context.encode("utf-8")),
+        "full_table_bytes": estimate_full_table_bytes(df),
+    }
+    return context, stats
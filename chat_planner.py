@@ -0,0 +1,208 @@
+import re
+import threading
+import time
+
+from database.db import get_db
+from chat_context import parse_period, match_values, intent_matches, keyword_pattern
+from money import format_cents
+
+# Questions that need judgement / explanation always go to the LLM
+OPEN_ENDED_WORDS = [
+    "why", "where", "should", "advice", "advise", "suggest", "recommend", "save money",
+    "trend", "compare", "predict", "forecast", "explain", "habit", "habits", "insight", "insights",
+    "too much", "too many", "worth", "unusual",
+]
+OPEN_ENDED_RE = keyword_pattern(OPEN_ENDED_WORDS)
+
+# Intents the planner can answer with one SQL query. Spend words ("spend",
+# "spent") also match "total", so they may accompany one of these; two of
+# these in one question is ambiguous and goes to the LLM.
+PRIMARY_INTENTS = ["top", "count", "average"]
+# A bare total needs an explicit amount question, not just the word "spend"
+TOTAL_RE = keyword_pattern(["how much", "total", "sum", "spent"])
+
+PLANNER_STATS = {"questions": 0, "answered_locally": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def _record(hit):
+    with _STATS_LOCK:
+        PLANNER_STATS["questions"] += 1
+        if hit:
+            PLANNER_STATS["answered_locally"] += 1
+
+
+def planner_hit_rate():
+    """
+    Share of chat questions answered from SQL without calling the LLM.
+    """
+    with _STATS_LOCK:
+        asked = PLANNER_STATS["questions"]
+        return (PLANNER_STATS["answered_locally"] / asked) if asked else 0.0
+
+
+def _known_values(db, col):
+    return [r[0] for r in db.execute(f"SELECT DISTINCT {col} FROM receipts WHERE {col} IS NOT NULL")]
+
+
+def _local_intent(q):
+    """
+    The single intent a question can be answered with locally, or None
+    when no intent or several competing ones match.
+    """
+    matches = set(intent_matches(q)) - {"list"}
+    if "trend" in matches:
+        return None
+    primary = [i for i in PRIMARY_INTENTS if i in matches]
+    if len(primary) > 1:
+        return None
+    if primary:
+        return primary[0]
+    if matches == {"total"} and TOTAL_RE.search(q):
+        return "total"
+    return None
+
+
+def plan_question(question, vendors, categories, today=None):
+    """
+    Maps a chat question onto a structured query, or returns None when the
+    question is open-ended or mentions something we cannot resolve.
+    Plan = {metric, group_by, limit, vendors, categories, start, end, period}
+    """
+    q = question.lower().strip()
+    if OPEN_ENDED_RE.search(q):
+        return None
+    intent = _local_intent(q)
+    if intent is None:
+        return None
+
+    start, end, period = parse_period(question, today)
+    plan = {
+        "metric": None,
+        "group_by": None,
+        "limit": 1,
+        "vendors": match_values(question, vendors),
+        "categories": match_values(question, categories),
+        "start": start,
+        "end": end,
+        "period": period,
+    }
+
+    if intent == "top":
+        if re.search(r"\bcategor(y|ies)\b", q):
+            plan["group_by"] = "category"
+        elif re.search(r"\b(vendor|store|shop|merchant|place)s?\b", q):
+            plan["group_by"] = "vendor"
+        else:
+            return None
+        m = re.search(r"\btop\s+(\d+)\b", q)
+        plan["limit"] = min(int(m.group(1)), 20) if m else 1
+        plan["metric"] = "tax" if re.search(r"\btax(es)?\b", q) else "spend"
+    elif intent == "count":
+        plan["metric"] = "count"
+    elif intent == "average":
+        plan["metric"] = "average"
+    else:
+        plan["metric"] = "tax" if re.search(r"\btax(es)?\b", q) else "spend"
+
+    # "at X" / "on X" / "from X" naming something we don't know -> let the LLM handle it
+    if not (plan["vendors"] or plan["categories"]):
+        m = re.search(r"\b(?:at|from|with|on)\s+(?:the\s+|a\s+)?([a-z0-9&'][\w&'-]*)", q)
+        if m and parse_period(m.group(1), today)[0] is None and m.group(1) not in {
+            "all", "everything", "average", "total", "receipts", "my", "this", "last", "each",
+        }:
+            return None
+
+    return plan
+
+
+def run_plan(plan):
+    """
+    Executes a plan as a single SQL query and returns the rows.
+    """
+    where, params = ["1 = 1"], []
+    if plan["start"] is not None:
+        where.append("date BETWEEN ? AND ?")
+        params += [plan["start"].isoformat(), plan["end"].isoformat()]
+    if plan["vendors"]:
+        where.append(f"vendor IN ({', '.join('?' * len(plan['vendors']))})")
+        params += plan["vendors"]
+    if plan["categories"]:
+        where.append(f"category IN ({', '.join('?' * len(plan['categories']))})")
+        params += plan["categories"]
+    where_sql = " AND ".join(where)
+
+    db = get_db()
+    value_col = "tax_cents" if plan["metric"] == "tax" else "amount_cents"
+    if plan["group_by"]:
+        sql = (
+            f"SELECT {plan['group_by']} AS name, SUM({value_col}) AS total, COUNT(*) AS n "
+            f"FROM receipts WHERE {where_sql} GROUP BY {plan['group_by']} "
+            f"ORDER BY total DESC LIMIT ?"
+        )
+        return db.execute(sql, params + [plan["limit"]]).fetchall()
+
+    sql = (
+        f"SELECT COALESCE(SUM({value_col}), 0) AS total, COUNT(*) AS n "
+        f"FROM receipts WHERE {where_sql}"
+    )
+    return db.execute(sql, params).fetchall()
+
+
+def _scope(plan):
+    scope = []
+    if plan["vendors"]:
+        scope.append(f"at **{', '.join(plan['vendors'])}**")
+    if plan["categories"]:
+        scope.append(f"on **{', '.join(plan['categories'])}**")
+    scope.append(f"in **{plan['period']}** ({plan['start']} to {plan['end']})" if plan["period"] else "across all receipts")
+    return " ".join(scope)
+
+
+def format_answer(plan, rows):
+    scope = _scope(plan)
+    if plan["group_by"]:
+        if not rows:
+            return f"No receipts found {scope}."
+        label = "tax" if plan["metric"] == "tax" else "spend"
+        if len(rows) == 1:
+            r = rows[0]
+            return (
+                f"Your top {plan['group_by']} by {label} {scope} is **{r['name']}** "
+                f"with {format_cents(r['total'])} across {r['n']} receipt(s)."
+            )
+        lines = [f"Top {len(rows)} {plan['group_by']}s by {label} {scope}:"]
+        lines += [f"{i}. **{r['name']}**: {format_cents(r['total'])} ({r['n']} receipts)" for i, r in enumerate(rows, 1)]
+        return "\n".join(lines)
+
+    total, n = rows[0]["total"], rows[0]["n"]
+    if plan["metric"] == "count":
+        return f"You have **{n}** receipt(s) {scope}."
+    if n == 0:
+        return f"No receipts found {scope}."
+    if plan["metric"] == "average":
+        return f"Your average receipt {scope} is **{format_cents(total // n)}** over {n} receipt(s)."
+    if plan["metric"] == "tax":
+        return f"You paid **{format_cents(total)}** in tax {scope} ({n} receipts)."
+    return f"You spent **{format_cents(total)}** {scope} ({n} receipts)."
+
+
+def answer_locally(question, today=None):
+    """
+    Answers simple aggregate questions straight from SQLite.
+    Returns {"answer", "plan", "elapsed_ms"} or None to fall through to the LLM.
+    """
+    started = time.perf_counter()
+    db = get_db()
+    plan = plan_question(question, _known_values(db, "vendor"), _known_values(db, "category"), today)
+    if plan is None:
+        _record(False)
+        return None
+
+    answer = format_answer(plan, run_plan(plan))
+    _record(True)
+    return {
+        "answer": answer,
+        "plan": plan,
+        "elapsed_ms": (time.perf_counter() - started) * 1000,
+    }
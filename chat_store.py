@@ -0,0 +1,183 @@
+import re
+import time
+import uuid
+
+from database.db import get_db
+
+# ================= HISTORY LIMITS =================
+MAX_RENDERED_MESSAGES = 20     # messages re-rendered on each rerun
+KEEP_RECENT_MESSAGES = 6       # recent messages sent verbatim as context
+SUMMARY_MAX_CHARS = 1500       # rolling summary of older turns
+
+# ================= RETENTION =================
+SESSION_RETENTION_DAYS = 30    # conversations idle longer than this are deleted
+MAX_SESSIONS = 50              # most recent conversations kept
+
+
+def _trim(text, limit):
+    text = re.sub(r"\s+", " ", str(text)).strip()
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + "..."
+
+
+def _first_sentence(text, limit):
+    """
+    First sentence / line of a message, trimmed to `limit` characters.
+    """
+    text = re.sub(r"[*_`#>]", "", str(text)).strip()
+    first = re.split(r"(?<=[.!?])\s|\n", text, maxsplit=1)[0].strip()
+    return first if len(first) <= limit else first[:limit - 3].rstrip() + "..."
+
+
+def summarize_turns(summary, messages, max_chars=SUMMARY_MAX_CHARS):
+    """
+    Folds older messages into the rolling summary as one short line each
+    (question + first sentence of the answer). The oldest lines are dropped
+    once the summary exceeds max_chars.
+    """
+    lines = [l for l in (summary or "").splitlines() if l.strip()]
+    for m in messages:
+        prefix = "Q" if m["role"] == "user" else "A"
+        lines.append(f"{prefix}: {_first_sentence(m['content'], 120 if prefix == 'Q' else 160)}")
+
+    while lines and sum(len(l) + 1 for l in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ChatSession:
+    """
+    A chat conversation persisted in SQLite.
+    Only the last MAX_RENDERED_MESSAGES are loaded for rendering; messages
+    older than the last KEEP_RECENT_MESSAGES are compacted into a rolling
+    summary that is passed to the model instead of the full transcript.
+    """
+
+    def __init__(self, session_id=None):
+        # No write here: Streamlit builds the session on every rerun; the
+        # row is created with the first message
+        self.db = get_db()
+        self.session_id = session_id or uuid.uuid4().hex
+
+    @property
+    def summary(self):
+        row = self.db.execute("SELECT summary FROM chat_sessions WHERE id = ?", (self.session_id,)).fetchone()
+        return row["summary"] if row else ""
+
+    def add_message(self, role, content):
+        now = time.time()
+        created = self.db.execute(
+            "INSERT OR IGNORE INTO chat_sessions (id, summary, created_at, updated_at) VALUES (?, '', ?, ?)",
+            (self.session_id, now, now)
+        ).rowcount
+        self.db.execute(
+            "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+            (self.session_id, role, content, now)
+        )
+        self.db.execute("UPDATE chat_sessions SET updated_at = ? WHERE id = ?", (now, self.session_id))
+        self.db.commit()
+        if created:
+            prune_sessions(keep=self.session_id)
+        self.compact()
+
+    def message_count(self):
+        return self.db.execute(
+            "SELECT COUNT(*) FROM chat_messages WHERE session_id = ?", (self.session_id,)
+        ).fetchone()[0]
+
+    def recent_messages(self, limit=MAX_RENDERED_MESSAGES):
+        """
+        Last `limit` messages, oldest first.
+        """
+        rows = self.db.execute(
+            "SELECT role, content FROM chat_messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (self.session_id, limit)
+        ).fetchall()
+        return [{"role": r["role"], "content": r["content"]} for r in reversed(rows)]
+
+    def compact(self, keep_recent=KEEP_RECENT_MESSAGES):
+        """
+        Moves messages older than the last `keep_recent` into the rolling summary.
+        """
+        rows = self.db.execute(
+            """
+            SELECT id, role, content FROM chat_messages
+            WHERE session_id = ? AND compacted = 0
+            ORDER BY id
+            """,
+            (self.session_id,)
+        ).fetchall()
+        to_compact = rows[:max(0, len(rows) - keep_recent)]
+        if not to_compact:
+            return
+
+        summary = summarize_turns(self.summary, to_compact)
+        self.db.execute("UPDATE chat_sessions SET summary = ? WHERE id = ?", (summary, self.session_id))
+        self.db.executemany(
+            "UPDATE chat_messages SET compacted = 1 WHERE id = ?",
+            [(r["id"],) for r in to_compact]
+        )
+        self.db.commit()
+
+    def history_context(self, exclude_last=0):
+        """
+        Rolling summary plus the recent uncompacted turns, formatted for the prompt.
+        `exclude_last` skips the newest messages (e.g. the question being asked).
+        """
+        rows = self.db.execute(
+            """
+            SELECT role, content FROM chat_messages
+            WHERE session_id = ? AND compacted = 0
+            ORDER BY id
+            """,
+            (self.session_id,)
+        ).fetchall()
+        if exclude_last:
+            rows = rows[:-exclude_last]
+
+        parts = []
+        summary = self.summary
+        if summary:
+            parts.append("Earlier in this conversation (summary):\n" + summary)
+        if rows:
+            parts.append("Recent messages:\n" + "\n".join(
+                f"{'User' if r['role'] == 'user' else 'Assistant'}: {_trim(r['content'], 600)}"
+                for r in rows
+            ))
+        return "\n\n".join(parts)
+
+    def clear(self):
+        """
+        Deletes this conversation (messages and session row).
+        """
+        self.db.execute("DELETE FROM chat_messages WHERE session_id = ?", (self.session_id,))
+        self.db.execute("DELETE FROM chat_sessions WHERE id = ?", (self.session_id,))
+        self.db.commit()
+
+
+def prune_sessions(max_age_days=SESSION_RETENTION_DAYS, max_sessions=MAX_SESSIONS, keep=None):
+    """
+    Deletes conversations idle for more than `max_age_days` and all but the
+    `max_sessions` most recently used ones. `keep` is never deleted.
+    Returns the number of sessions removed.
+    """
+    db = get_db()
+    cutoff = time.time() - max_age_days * 86400
+    stale = [
+        r["id"] for r in db.execute(
+            """
+            SELECT id FROM chat_sessions WHERE updated_at < ?
+            UNION
+            SELECT id FROM chat_sessions WHERE id NOT IN (
+                SELECT id FROM chat_sessions ORDER BY updated_at DESC LIMIT ?
+            )
+            """,
+            (cutoff, max_sessions)
+        ).fetchall()
+        if r["id"] != keep
+    ]
+    if not stale:
+        return 0
+    db.executemany("DELETE FROM chat_messages WHERE session_id = ?", [(s,) for s in stale])
+    db.executemany("DELETE FROM chat_sessions WHERE id = ?", [(s,) for s in stale])
+    db.commit()
+    return len(stale)
@@ -1,27 +1,44 @@
 # Receipt Vault - Chat with Data
 import streamlit as st
 import pandas as pd
-from queries import fetch_all_receipts
+from receipt_frame import load_receipts_frame
 from gemini_client import GeminiClient
+from chat_context import build_chat_context
+from chat_planner import answer_locally, planner_hit_rate
+from queries import get_data_version
+from chat_store import ChatSession, MAX_RENDERED_MESSAGES
+from logger import log_error
 
 def render_chat():
     st.header("💬 Chat with your Receipts")
     st.info("Ask questions about your spending, vendors, or trends using natural language.")
 
     # 1. Fetch Data for Context
-    receipts = fetch_all_receipts()
-    if not receipts:
+    df = load_receipts_frame()
+    if df.empty:
         st.warning("No data found. Please upload receipts first to enable chat.")
         return
 
-    df = pd.DataFrame(receipts)
-    
-    # 2. Chat history initialization
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    # 2. Chat history: persisted in SQLite, only the latest messages are rendered
+    if "chat_session_id" not in st.session_state:
+        st.session_state["chat_session_id"] = ChatSession().session_id
+    session = ChatSession(st.session_state["chat_session_id"])
+
+    total_messages = session.message_count()
+    if total_messages:
+        hist_col, new_col, clear_col = st.columns([3, 1, 1])
+        if total_messages > MAX_RENDERED_MESSAGES:
+            hist_col.caption(f"Showing the last {MAX_RENDERED_MESSAGES} of {total_messages} messages")
+        if new_col.button("New conversation", use_container_width=True):
+            st.session_state["chat_session_id"] = ChatSession().session_id
+            st.rerun()
+        if clear_col.button("Delete conversation", use_container_width=True):
+            session.clear()
+            st.session_state["chat_session_id"] = ChatSession().session_id
+            st.rerun()
 
     # Display chat history
-    for message in st.session_state.messages:
+    for message in session.recent_messages():
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
 
@@ -30,7 +47,19 @@ def render_chat():
         # Display user message
         with st.chat_message("user"):
             st.markdown(prompt)
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        session.add_message("user", prompt)
+
+        # Simple aggregates are answered from SQL without calling the LLM
+        local = answer_locally(prompt)
+        if local:
+            with st.chat_message("assistant"):
+                st.markdown(local["answer"])
+                st.caption(
+                    f"Answered locally in {local['elapsed_ms']:.0f} ms "
+                    f"({planner_hit_rate() * 100:.0f}% of questions answered without AI)"
+                )
+            session.add_message("assistant", local["answer"])
+            return
 
         # 4. Generate AI response
         api_key = st.session_state.get("GEMINI_API_KEY")
@@ -40,13 +69,27 @@ def render_chat():
             return
 
         with st.chat_message("assistant"):
-            with st.spinner("Analyzing your data..."):
-                try:
+            try:
+                with st.spinner("Analyzing your data..."):
                     client = GeminiClient(api_key)
-                    # Prepare data summary for context
-                    summary = df.to_string(index=False)
-                    response = client.chat_with_data(prompt, summary)
-                    st.markdown(response)
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                except Exception as e:
-                    st.error(f"Chat failed: {e}")
\ No newline at end of file
+                    # Only the receipts relevant to the question, within a token budget
+                    summary, context_stats = build_chat_context(df, prompt)
+                    st.session_state["LAST_CHAT_CONTEXT_STATS"] = context_stats
+                    history = session.history_context(exclude_last=1)
+
+                # Render the answer as it streams in
+                response = st.write_stream(
+                    client.stream_chat_with_data(prompt, summary, data_version=get_data_version(), history=history)
+                )
+                st.session_state["LAST_CHAT_TTFT"] = client.last_ttft
+                st.caption(
+                    f"Context: {context_stats['rows_sent']} of {context_stats['matched_rows']} matching receipts, "
+                    f"{context_stats['prompt_bytes'] / 1024:.1f} KB "
+                    f"(full table would be ~{context_stats['full_table_bytes'] / 1024:.1f} KB)"
+                    + (f" · first token after {client.last_ttft:.2f}s" if client.last_ttft is not None else "")
+                )
+                session.add_message("assistant", response)
+            except Exception as e:
+                # A failed (possibly half-streamed) answer is not saved to the history
+                log_error(f"chat: answer failed: {e}")
+                st.error("Sorry, I encountered an error analyzing the data. Please try again.")
\ No newline at end of file
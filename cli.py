@@ -0,0 +1,300 @@
+"""
+Headless entry point for bulk jobs.
+
+    python cli.py ingest ./scans --workers 4 --batch-size 32
+    python cli.py ingest receipts.zip
+    python cli.py reprocess --workers 4
+    python cli.py export --format csv --output receipts.csv
+    python cli.py ingest ./scans --workers 1 --profile   # flamegraph in logs/profiles
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from database.db import init_db
+from pipeline import is_supported, content_hash, extract_document, save_extraction
+from extractors import EXTRACTOR_VERSION
+from profiling import profile_section, profiling_enabled, last_profiles
+from money import to_cents, from_cents
+from queries import (
+    fetch_all_receipts, fetch_receipt, fetch_receipt_sources, receipt_edited, replace_receipt,
+    save_receipt_source, source_exists,
+)
+
+
+# ================= INPUT =================
+
+def iter_documents(path):
+    """
+    Yields (name, bytes-loader) for supported files in a directory tree
+    or a .zip archive. Files are read lazily, one batch at a time.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            names = [i.filename for i in zf.infolist() if not i.is_dir() and is_supported(i.filename)]
+        for name in sorted(names):
+            yield name, (lambda n=name: _read_zip_member(path, n))
+    elif os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for f in sorted(files):
+                if is_supported(f):
+                    full = os.path.join(root, f)
+                    yield os.path.relpath(full, path), (lambda p=full: _read_file(p))
+    elif os.path.isfile(path) and is_supported(path):
+        yield os.path.basename(path), (lambda: _read_file(path))
+    else:
+        raise SystemExit(f"Not a directory, zip archive or supported file: {path}")
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _read_zip_member(path, name):
+    with zipfile.ZipFile(path) as zf:
+        return zf.read(name)
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ================= PROGRESS =================
+
+class Progress:
+    """
+    Per-batch progress and throughput on stderr.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.perf_counter()
+        self.counts = {}
+        self.total_ms = 0.0
+        self.done = 0
+
+    def add(self, result):
+        self.done += 1
+        self.counts[result["status"]] = self.counts.get(result["status"], 0) + 1
+        self.total_ms += result.get("elapsed_ms") or 0.0
+        if result["status"] == "failed":
+            print(f"  failed: {result['name']}: {result.get('error')}", file=sys.stderr)
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        counts = ", ".join(f"{k}={v}" for k, v in sorted(self.counts.items()))
+        prefix = "Done" if final else self.label
+        print(f"{prefix}: {self.done} files in {elapsed:.1f}s ({rate:.2f} files/s) [{counts}]", file=sys.stderr)
+        if final and self.done:
+            print(f"  mean extraction latency: {self.total_ms / self.done:.0f} ms/file", file=sys.stderr)
+
+
+def _run_batch(pool, jobs, api_key):
+    """
+    Extracts [(name, content)] in the worker pool (or inline) and returns
+    results in input order.
+    """
+    if pool is None:
+        return [extract_document(name, content, api_key) for name, content in jobs]
+    futures = [pool.submit(extract_document, name, content, api_key) for name, content in jobs]
+    return [f.result() for f in futures]
+
+
+# ================= COMMANDS =================
+
+def cmd_ingest(args):
+    progress = Progress("Ingest")
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    seen = set()    # hashes of this run: copies of a file within a batch are not in the vault yet
+    try:
+        for batch in _batches(iter_documents(args.path), args.batch_size):
+            jobs = []
+            for name, load in batch:
+                content = load()
+                sha = content_hash(content)
+                if sha in seen or source_exists(sha):
+                    progress.add({"name": name, "status": "duplicate"})
+                    continue
+                seen.add(sha)
+                jobs.append((name, content))
+
+            # Extraction runs in the workers; saving stays in this process
+            # so SQLite has a single writer
+            for (name, content), result in zip(jobs, _run_batch(pool, jobs, args.api_key)):
+                if not args.dry_run:
+                    save_extraction(result, content)
+                progress.add(result)
+            progress.report()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    progress.report(final=True)
+
+
+def _as_stored(data):
+    """
+    Extracted data in the shape fetch_receipt returns, for comparison.
+    """
+    return {
+        "bill_id": data.get("bill_id"),
+        "vendor": data.get("vendor"),
+        "date": data.get("date"),
+        "amount": from_cents(to_cents(data.get("amount") or 0)),
+        "tax": from_cents(to_cents(data.get("tax") or 0)),
+        "subtotal": from_cents(to_cents(data.get("subtotal") or 0)),
+        "category": data.get("category") or "Uncategorized",
+    }
+
+
+def cmd_reprocess(args):
+    sources = fetch_receipt_sources(None if args.all else EXTRACTOR_VERSION)
+    print(f"{len(sources)} stored receipt(s) to reprocess with extractor v{EXTRACTOR_VERSION}", file=sys.stderr)
+
+    progress = Progress("Reprocess")
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        for batch in _batches(sources, args.batch_size):
+            jobs, kept = [], []
+            for src in batch:
+                if not os.path.exists(src["path"]):
+                    progress.add({"name": src["filename"], "status": "failed", "error": "source file missing"})
+                    continue
+                jobs.append((src["filename"], _read_file(src["path"])))
+                kept.append(src)
+
+            for src, (name, content), result in zip(kept, jobs, _run_batch(pool, jobs, args.api_key)):
+                if result["status"] == "extracted":
+                    old = fetch_receipt(src["bill_id"]) if src["bill_id"] else None
+                    if old is None:
+                        # The receipt was deleted after ingestion; reprocessing
+                        # must not bring it back, so the source row is left as is
+                        result["status"] = "missing"
+                        progress.add(result)
+                        continue
+                    # Receipts without a printed bill id get a random one on
+                    # every extraction; the stored id is the receipt's identity
+                    result["data"]["bill_id"] = old["bill_id"]
+                    if not args.force and receipt_edited(src):
+                        result["status"] = "edited"
+                    else:
+                        result["status"] = "unchanged" if old == _as_stored(result["data"]) else "updated"
+                    if not args.dry_run and result["status"] != "edited":
+                        try:
+                            if result["status"] == "updated":
+                                replace_receipt(old["bill_id"], result["data"])
+                            save_receipt_source(
+                                src["sha256"], old["bill_id"], src["filename"], src["path"],
+                                result["backend"], EXTRACTOR_VERSION, result["confidence"]
+                            )
+                        except Exception as e:
+                            result.update(status="failed", error=f"save failed: {e}")
+                progress.add(result)
+            progress.report()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    progress.report(final=True)
+    if progress.counts.get("edited"):
+        print(f"  {progress.counts['edited']} receipt(s) edited since extraction were kept; "
+              f"use --force to overwrite them", file=sys.stderr)
+    if progress.counts.get("missing"):
+        print(f"  {progress.counts['missing']} source file(s) belong to deleted receipts and were skipped",
+              file=sys.stderr)
+
+
+EXPORT_FIELDS = ["bill_id", "vendor", "date", "amount", "tax", "subtotal", "category"]
+
+
+def cmd_export(args):
+    rows = fetch_all_receipts()
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(rows, out, indent=2)
+            out.write("\n")
+        else:
+            writer = csv.DictWriter(out, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Exported {len(rows)} receipt(s)", file=sys.stderr)
+
+
+# ================= ARGUMENTS =================
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Receipt Vault bulk tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_profile_arg(p):
+        p.add_argument("--profile", action="store_true",
+                       help="profile the run and save .prof / .folded files to logs/profiles "
+                            "(use --workers 1 to include extraction)")
+
+    def add_worker_args(p):
+        p.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                       help="extraction processes (1 = run inline)")
+        p.add_argument("--batch-size", type=int, default=16,
+                       help="files per batch between progress reports")
+        p.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"),
+                       help="Gemini key for escalation (default: $GEMINI_API_KEY)")
+        p.add_argument("--dry-run", action="store_true", help="extract only, do not write to the vault")
+        add_profile_arg(p)
+
+    p = sub.add_parser("ingest", help="extract and save receipts from a directory, zip or file")
+    p.add_argument("path")
+    add_worker_args(p)
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("reprocess", help="re-extract stored receipts with the current extractor")
+    p.add_argument("--all", action="store_true",
+                   help="reprocess every stored source, not only older extractor versions")
+    p.add_argument("--force", action="store_true",
+                   help="also overwrite receipts that were edited after extraction")
+    add_worker_args(p)
+    p.set_defaults(func=cmd_reprocess)
+
+    p = sub.add_parser("export", help="export the vault as CSV or JSON")
+    p.add_argument("--format", choices=["csv", "json"], default="csv")
+    p.add_argument("--output", help="file to write (default: stdout)")
+    add_profile_arg(p)
+    p.set_defaults(func=cmd_export)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "batch_size", 1) < 1 or getattr(args, "workers", 1) < 1:
+        raise SystemExit("--workers and --batch-size must be at least 1")
+    init_db()
+
+    profiling = profiling_enabled(args.profile)
+    if profiling and getattr(args, "workers", 1) > 1:
+        print("Profiling covers this process only; extraction runs in worker processes "
+              "unless --workers 1 is given", file=sys.stderr)
+    with profile_section(f"cli-{args.command}", profiling):
+        args.func(args)
+    result = last_profiles().get(f"cli-{args.command}") if profiling else None
+    if result is not None:      # None when another profiler was already active
+        print(f"Profile: {result['files'][0]} and {result['files'][1]}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -17,6 +17,11 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 DB_PATH = os.path.join(DATA_DIR, "receipts.db")
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# =========================================================
+# SOURCE FILE STORAGE (originals kept for reprocessing)
+# =========================================================
+SOURCE_DIR = os.path.join(DATA_DIR, "sources")
+
 # =========================================================
 # OCR CONFIGURATION
 # =========================================================
@@ -1,8 +1,10 @@
 # Receipt Vault Analyzer - Dashboard UI (Professional Theme)
 import streamlit as st
 import pandas as pd
-from queries import fetch_all_receipts, delete_receipt
+from queries import delete_receipt
+from receipt_frame import CENTS_COLUMNS, load_receipts_frame
 from config import CURRENCY_SYMBOL
+from money import from_cents
 
 
 # ================= STYLED SECTION HEADER =================
@@ -172,22 +174,20 @@ def render_dashboard():
     _section_header("Spending Dashboard", "Overview of your receipts and spending activity")
 
     # 1. Fetch Data
-    receipts = fetch_all_receipts()
+    receipts_df = load_receipts_frame()
 
-    if not receipts:
+    if receipts_df.empty:
         _empty_state(
             "No receipts found",
             "Go to the Upload Receipt tab to add your first receipt."
         )
         return
 
-    df = pd.DataFrame(receipts)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values(by="date", ascending=False)
+    df = receipts_df.sort_values(by="date", ascending=False)
 
     # 2. Key Metrics — custom cards
-    total_spend = df["amount"].sum()
-    total_tax = df["tax"].sum()
+    total_spend = from_cents(df["amount_cents"].sum())
+    total_tax = from_cents(df["tax_cents"].sum())
     total_receipts = len(df)
 
     c1, c2, c3 = st.columns(3)
@@ -297,7 +297,7 @@ def render_dashboard():
         """, unsafe_allow_html=True)
 
         # Add selection column for deletion
-        df_display = df.copy()
+        df_display = df.drop(columns=CENTS_COLUMNS)
         df_display.insert(0, "Select", False)
 
         edited_df = st.data_editor(
@@ -0,0 +1,27 @@
+import sqlite3
+
+from database.db import get_db
+
+# Vault data version: a counter in vault_meta bumped inside every write
+# transaction. Caches (receipt_frame, rolling_stats, AI responses) compare
+# it to know when to reload. Kept apart from queries so those caches can
+# import it without importing the query layer back.
+
+
+def bump_data_version(db):
+    """
+    Increments the vault data version inside the caller's transaction.
+    """
+    db.execute("UPDATE vault_meta SET value = value + 1 WHERE key = 'data_version'")
+
+
+def get_data_version():
+    """
+    Returns a counter that changes whenever receipts are added or removed.
+    """
+    db = get_db()
+    try:
+        row = db.execute("SELECT value FROM vault_meta WHERE key = 'data_version'").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row["value"] if row else 0
@@ -33,7 +33,10 @@ def init_db():
             amount REAL NOT NULL,
             tax REAL NOT NULL,
             subtotal REAL DEFAULT 0.0,
-            category TEXT DEFAULT 'Uncategorized'
+            category TEXT DEFAULT 'Uncategorized',
+            amount_cents INTEGER,
+            tax_cents INTEGER,
+            subtotal_cents INTEGER
         )
         """
     )
@@ -50,4 +53,139 @@ def init_db():
     except sqlite3.OperationalError:
         pass
 
+    # Migration: integer minor-unit (paise) columns, the source of truth for amounts.
+    # The REAL columns are kept in sync for older readers.
+    for col in ["amount", "tax", "subtotal"]:
+        try:
+            db.execute(f"ALTER TABLE receipts ADD COLUMN {col}_cents INTEGER")
+        except sqlite3.OperationalError:
+            pass
+        db.execute(
+            f"UPDATE receipts SET {col}_cents = CAST(ROUND(COALESCE({col}, 0) * 100) AS INTEGER) "
+            f"WHERE {col}_cents IS NULL"
+        )
+
+    # Data version: bumped on every write so caches can tell when the vault changed
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS vault_meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """
+    )
+    db.execute("INSERT OR IGNORE INTO vault_meta (key, value) VALUES ('data_version', 0)")
+
+    # Persisted chat conversations (older turns compacted into `summary`)
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chat_sessions (
+            id TEXT PRIMARY KEY,
+            summary TEXT DEFAULT '',
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """
+    )
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            compacted INTEGER DEFAULT 0,
+            FOREIGN KEY (session_id) REFERENCES chat_sessions(id)
+        )
+        """
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_session ON chat_messages (session_id, id)")
+
+    # Cache of AI responses keyed on (data version, prompt, model)
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ai_response_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            data_version INTEGER NOT NULL,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        )
+        """
+    )
+
+    # Original uploaded files (stored on disk by content hash) so receipts
+    # can be re-extracted when the extraction pipeline improves
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS receipt_sources (
+            sha256 TEXT PRIMARY KEY,
+            bill_id TEXT,
+            filename TEXT NOT NULL,
+            path TEXT NOT NULL,
+            backend TEXT,
+            extractor_version INTEGER DEFAULT 0,
+            confidence REAL,
+            created_at REAL NOT NULL,
+            fingerprint TEXT
+        )
+        """
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS idx_receipt_sources_bill ON receipt_sources (bill_id)")
+
+    # Migration: fingerprint of the receipt as saved, so reprocessing can
+    # tell when it was edited by hand afterwards
+    try:
+        db.execute("ALTER TABLE receipt_sources ADD COLUMN fingerprint TEXT")
+    except sqlite3.OperationalError:
+        pass
+
+    # Background extraction queue (job_queue.py / worker.py)
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER DEFAULT 0,
+            worker TEXT,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            heartbeat REAL,
+            finished_at REAL
+        )
+        """
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id)")
+
+    # At most one active job per file, so concurrent enqueues cannot both
+    # insert it. Active duplicates left by older versions are retired first.
+    db.execute(
+        """
+        UPDATE jobs SET status = 'duplicate'
+        WHERE status IN ('queued', 'running')
+          AND id NOT IN (SELECT MIN(id) FROM jobs WHERE status IN ('queued', 'running') GROUP BY sha256)
+        """
+    )
+    db.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_active_sha ON jobs (sha256) "
+        "WHERE status IN ('queued', 'running')"
+    )
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS job_workers (
+            id TEXT PRIMARY KEY,
+            pid INTEGER,
+            last_seen REAL NOT NULL
+        )
+        """
+    )
+
     db.commit()
\ No newline at end of file
@@ -0,0 +1,84 @@
+import streamlit as st
+import pandas as pd
+
+from metrics import summary, render_prometheus, reset
+from profiling import last_profiles
+
+
+# ===== DIAGNOSTICS PANEL =====
+def render_diagnostics():
+    """
+    Where time goes in this app process: per-stage timing histograms
+    recorded by metrics.timer (upload, OCR, AI, parsing, validation, DB).
+    Background workers are separate processes and keep their own numbers.
+    """
+    _render_profiles()
+
+    rows = summary()
+    if not rows:
+        st.caption("No timings recorded yet. Upload a receipt or open a tab to collect some.")
+        return
+
+    total = sum(r["total_s"] for r in rows)
+    c1, c2, c3 = st.columns(3, gap="small")
+    c1.metric("Timed calls", f"{sum(r['count'] for r in rows):,}")
+    c2.metric("Time recorded", f"{total:.1f} s")
+    c3.metric("Errors", sum(r["errors"] for r in rows))
+
+    frame = pd.DataFrame(rows).rename(columns={
+        "stage": "Stage", "labels": "Detail", "count": "Calls", "errors": "Errors",
+        "total_s": "Total (s)", "mean_ms": "Mean (ms)", "p50_ms": "p50 (ms)",
+        "p95_ms": "p95 (ms)", "max_ms": "Max (ms)",
+    })
+    frame["Share"] = frame["Total (s)"] / total * 100 if total else 0.0
+    st.dataframe(
+        frame,
+        use_container_width=True,
+        hide_index=True,
+        column_config={"Share": st.column_config.ProgressColumn("Share", format="%.0f%%", min_value=0, max_value=100)},
+    )
+    st.caption("p50 / p95 are estimated from histogram buckets. Nested stages overlap (e.g. OCR inside extract).")
+
+    col1, col2 = st.columns(2, gap="small")
+    with col1:
+        st.download_button(
+            "Download Prometheus metrics",
+            render_prometheus(),
+            file_name="receipt_vault_metrics.txt",
+            mime="text/plain",
+            use_container_width=True,
+        )
+    with col2:
+        if st.button("Reset timings", use_container_width=True):
+            reset()
+            st.rerun()
+
+
+# ===== PROFILES =====
+def _render_profiles():
+    """Latest profiled run of each tab / section (Settings > Profile each tab)."""
+    profiles = last_profiles()
+    if not profiles:
+        return
+
+    st.markdown("**Profiled sections** (latest run of each)")
+    ordered = sorted(profiles.values(), key=lambda p: p["wall_ms"], reverse=True)
+    st.dataframe(
+        pd.DataFrame([
+            {"Section": p["section"], "Wall (ms)": p["wall_ms"], "Samples": p["samples"], "Flamegraph": p["files"][1]}
+            for p in ordered
+        ]),
+        use_container_width=True,
+        hide_index=True,
+    )
+
+    section = st.selectbox("Function breakdown", [p["section"] for p in ordered], key="profile_section")
+    st.dataframe(
+        pd.DataFrame(profiles[section]["top"]).rename(columns={
+            "function": "Function", "location": "Location", "calls": "Calls",
+            "own_ms": "Own (ms)", "cumulative_ms": "Cumulative (ms)",
+        }),
+        use_container_width=True,
+        hide_index=True,
+    )
+    st.caption("Render the .folded file with flamegraph.pl or speedscope; open the .prof file with snakeviz.")
@@ -0,0 +1,384 @@
+import re
+import threading
+import time
+from datetime import datetime
+
+from money import to_cents
+from metrics import observe
+
+# Extraction backends share one interface:
+#   extract(image, context) -> (data, items)
+# `context` is a per-receipt dict the backends use to share work
+# (e.g. the OCR text, so the local LLM backend does not OCR again).
+# For digital PDFs the caller puts the embedded text in
+# context["pdf_text"]; text backends then read it instead of pixels.
+# The router calls them cheapest first and stops at the first result
+# whose confidence clears the threshold.
+
+DEFAULT_MIN_CONFIDENCE = 0.75
+
+# Bump when extraction changes enough that stored receipts should be
+# re-extracted (`python cli.py reprocess`)
+EXTRACTOR_VERSION = 1
+
+BACKEND_STATS = {}
+_STATS_LOCK = threading.Lock()
+
+
+# ================= CONFIDENCE =================
+
+def check_extraction(data):
+    """
+    Streamlit-free plausibility checks on an extracted receipt.
+    Returns (confidence 0-1, list of failed check names).
+    """
+    failed = []
+    weights = {
+        "amount": 0.3,
+        "date": 0.2,
+        "totals": 0.2,
+        "vendor": 0.15,
+        "bill_id": 0.15,
+    }
+
+    amount = to_cents(data.get("amount"), default=0)
+    tax = to_cents(data.get("tax"), default=0)
+    subtotal = to_cents(data.get("subtotal"), default=0)
+
+    if amount <= 0:
+        failed.append("amount")
+
+    try:
+        datetime.strptime(str(data.get("date")), "%Y-%m-%d")
+    except ValueError:
+        failed.append("date")
+
+    if amount <= 0 or subtotal <= 0 or subtotal + tax != amount or tax > amount:
+        failed.append("totals")
+
+    vendor = str(data.get("vendor") or "").strip()
+    if not vendor or vendor.lower() in ("unknown", "unknown vendor") or not re.search(r"[A-Za-z]{3}", vendor):
+        failed.append("vendor")
+
+    # text_parser invents "BILL-123456" when no id is printed
+    bill_id = str(data.get("bill_id") or "")
+    if not bill_id or bill_id == "UNKNOWN" or re.fullmatch(r"BILL-\d{6}", bill_id):
+        failed.append("bill_id")
+
+    confidence = 1.0 - sum(weights[f] for f in failed)
+    return round(max(confidence, 0.0), 2), failed
+
+
+def is_valid_extraction(failed):
+    """
+    Hard failures that always trigger escalation, whatever the score.
+    """
+    return "amount" not in failed and "totals" not in failed
+
+
+# ================= BACKENDS =================
+
+class Extractor:
+    """
+    Base class for extraction backends.
+    `cost` is a relative price used to order backends (local OCR = 1).
+    """
+    name = "base"
+    label = "Extraction"
+    cost = 0
+
+    def available(self):
+        return True
+
+    def applies(self, context):
+        """
+        Whether this backend makes sense for this particular receipt.
+        """
+        return True
+
+    def extract(self, image, context):
+        raise NotImplementedError
+
+    def adjust_confidence(self, confidence, context):
+        """
+        Hook for backends with their own quality signal.
+        """
+        return confidence
+
+
+def _ocr_text(image, context):
+    """
+    Tesseract text for the receipt, computed once per context.
+    The structured result (lines, confidences, quality) is kept in
+    context["ocr"]. A caller that already OCR'd the page (e.g. the PDF
+    DPI probe) passes it as context["page_ocr"] to skip the full pass;
+    its pending line re-OCR still runs here.
+    The text layer of a digital PDF is used as is.
+    """
+    if "pdf_text" in context:
+        return context["pdf_text"]
+    if "ocr_text" not in context:
+        from ocr_engine import finish_ocr, ocr_receipt, refine_amounts
+        from image_preprocessing import preprocess_image
+        page = preprocess_image(image)
+        page_ocr = context.get("page_ocr")
+        page_ocr = finish_ocr(page, page_ocr) if page_ocr else ocr_receipt(page)
+        context["ocr"] = refine_amounts(page, page_ocr)
+        context["ocr_text"] = context["ocr"]["text"]
+    return context["ocr_text"]
+
+
+class TextLayerExtractor(Extractor):
+    """
+    Rule-based text_parser over the embedded text of a digital PDF.
+    No OCR: the text is exact, so this is both the cheapest and the most
+    accurate path when it applies.
+    """
+    name = "text_layer"
+    label = "PDF Text Extraction"
+    cost = 0
+
+    def applies(self, context):
+        return bool(context.get("pdf_text"))
+
+    def extract(self, image, context):
+        from text_parser import parse_receipt
+        data, items = parse_receipt(context["pdf_text"])
+        context["rule_based"] = data
+        return data, items
+
+
+class TesseractExtractor(Extractor):
+    """
+    Local Tesseract OCR + rule-based text_parser.
+    """
+    name = "tesseract"
+    label = "OCR Extraction"
+    cost = 1
+
+    def applies(self, context):
+        # OCR'ing the render of a digital PDF cannot beat its text layer
+        return not context.get("pdf_text")
+
+    def extract(self, image, context):
+        from text_parser import parse_receipt
+        text = _ocr_text(image, context)
+        if not text.strip():
+            raise ValueError("No readable text detected from the image.")
+        data, items = parse_receipt(text)
+        context["rule_based"] = data
+        return data, items
+
+    def adjust_confidence(self, confidence, context):
+        # Field checks can pass on a badly read scan (e.g. a misread digit
+        # that still sums), so scale by how confidently Tesseract read it.
+        ocr = context.get("ocr")
+        if ocr is None or ocr["early_exit"]:
+            return confidence
+        return round(confidence * min(1.0, 0.5 + ocr["quality"] / 150), 2)
+
+
+class OllamaExtractor(Extractor):
+    """
+    OCR text mapped and spell-fixed by the local LLM (ai_client).
+    Fields the LLM does not produce (bill id, category) come from the
+    rule-based parse.
+    """
+    name = "ollama"
+    label = "Local AI Extraction"
+    cost = 3
+
+    def available(self):
+        try:
+            from ai_client import BREAKER
+        except (ImportError, OSError):
+            # requests / the client module not installed: route around it
+            return False
+        return not BREAKER.is_open
+
+    def extract(self, image, context):
+        from ai_client import extract_and_map
+        from text_parser import parse_receipt
+        from money import round_amount
+
+        text = _ocr_text(image, context)
+        base = context.get("rule_based")
+        if base is None:
+            base, _ = parse_receipt(text)
+
+        # Without the LLM this backend would only repeat the rule-based parse,
+        # so an unreachable server counts as a failed attempt
+        mapped = extract_and_map(text, require_llm=True)
+        data = dict(base)
+        if mapped.get("store") not in (None, "", "Unknown"):
+            data["vendor"] = mapped["store"]
+        for src, dst in (("total", "amount"), ("tax", "tax"), ("subtotal", "subtotal")):
+            value = round_amount(mapped.get(src), default=0.0)
+            if value > 0:
+                data[dst] = value
+
+        items = [
+            {"Item": i.get("name", ""), "Price": round_amount(i.get("price"), default=0.0)}
+            for i in mapped.get("items", []) if isinstance(i, dict)
+        ]
+        return data, items
+
+
+class GeminiExtractor(Extractor):
+    """
+    Gemini extraction. Only available when an API key is set.
+    Digital PDFs are sent as text, everything else as an image.
+    """
+    name = "gemini"
+    label = "AI Extraction"
+    cost = 10
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+
+    def available(self):
+        return bool(self.api_key)
+
+    def extract(self, image, context):
+        from gemini_client import GeminiClient
+        client = GeminiClient(self.api_key)
+        if context.get("pdf_text"):
+            result = client.extract_receipt_text(context["pdf_text"])
+        else:
+            result = client.extract_receipt(image)
+        if not result:
+            raise ValueError("Gemini returned no receipt data")
+        items = result.pop("items", [])
+        return result, items
+
+
+# ================= REGISTRY =================
+
+EXTRACTORS = {}
+
+
+def register_extractor(extractor):
+    EXTRACTORS[extractor.name] = extractor
+    return extractor
+
+
+def get_extractor(name):
+    return EXTRACTORS[name]
+
+
+register_extractor(TextLayerExtractor())
+register_extractor(TesseractExtractor())
+register_extractor(OllamaExtractor())
+
+
+# ================= STATS =================
+
+def _record(name, elapsed_ms, ok, accepted):
+    observe("extract", elapsed_ms / 1000, not ok, backend=name)
+    with _STATS_LOCK:
+        s = BACKEND_STATS.setdefault(name, {"calls": 0, "successes": 0, "accepted": 0, "total_ms": 0.0})
+        s["calls"] += 1
+        s["successes"] += int(ok)
+        s["accepted"] += int(accepted)
+        s["total_ms"] += elapsed_ms
+
+
+def backend_stats():
+    """
+    Per-backend calls, success / acceptance rates and mean latency.
+    """
+    with _STATS_LOCK:
+        return {
+            name: {
+                "calls": s["calls"],
+                "success_rate": s["successes"] / s["calls"] if s["calls"] else 0.0,
+                "accept_rate": s["accepted"] / s["calls"] if s["calls"] else 0.0,
+                "avg_ms": s["total_ms"] / s["calls"] if s["calls"] else 0.0,
+            }
+            for name, s in BACKEND_STATS.items()
+        }
+
+
+# ================= ROUTER =================
+
+class ExtractionRouter:
+    """
+    Tries the available backends cheapest first and escalates only when
+    the result is low-confidence or fails validation.
+    """
+
+    def __init__(self, extractors=None, min_confidence=DEFAULT_MIN_CONFIDENCE):
+        self.extractors = sorted(
+            extractors if extractors is not None else EXTRACTORS.values(),
+            key=lambda e: e.cost
+        )
+        self.min_confidence = min_confidence
+
+    @classmethod
+    def default(cls, api_key=None, min_confidence=DEFAULT_MIN_CONFIDENCE):
+        """
+        Registered backends plus Gemini when an API key is available.
+        """
+        extractors = list(EXTRACTORS.values())
+        if api_key:
+            extractors.append(GeminiExtractor(api_key))
+        return cls(extractors, min_confidence)
+
+    def extract(self, image, context=None):
+        """
+        Returns {"data", "items", "backend", "label", "confidence",
+        "failed", "attempts", "elapsed_ms"}; raises ValueError when no
+        backend produced anything. `context` may be pre-seeded with
+        "pdf_text" (digital PDFs) or "page_ocr" to skip OCR work.
+        """
+        context = dict(context or {})
+        attempts = []
+        best = None
+        started = time.perf_counter()
+
+        for extractor in self.extractors:
+            if not extractor.available() or not extractor.applies(context):
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                data, items = extractor.extract(image, context)
+            except Exception as e:
+                elapsed = (time.perf_counter() - t0) * 1000
+                _record(extractor.name, elapsed, False, False)
+                attempts.append({"backend": extractor.name, "error": str(e), "elapsed_ms": elapsed})
+                continue
+
+            elapsed = (time.perf_counter() - t0) * 1000
+            confidence, failed = check_extraction(data)
+            confidence = extractor.adjust_confidence(confidence, context)
+            accepted = confidence >= self.min_confidence and is_valid_extraction(failed)
+            _record(extractor.name, elapsed, True, accepted)
+            attempts.append({
+                "backend": extractor.name,
+                "confidence": confidence,
+                "failed": failed,
+                "elapsed_ms": elapsed,
+            })
+
+            result = {
+                "data": data,
+                "items": items,
+                "backend": extractor.name,
+                "label": extractor.label,
+                "confidence": confidence,
+                "failed": failed,
+            }
+            if best is None or confidence > best["confidence"]:
+                best = result
+            if accepted:
+                break
+
+        if best is None:
+            errors = "; ".join(a.get("error", "") for a in attempts)
+            raise ValueError(errors or "No extraction backend available")
+
+        best["attempts"] = attempts
+        best["ocr"] = {k: v for k, v in context.get("ocr", {}).items() if k != "lines"}
+        best["elapsed_ms"] = (time.perf_counter() - started) * 1000
+        return best
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from datetime import timedelta
 
+from logger import log_error
+
 def calculate_moving_averages(df, window_days=7):
     """
     Calculates moving average for the given DataFrame.
@@ -16,6 +18,17 @@ def calculate_moving_averages(df, window_days=7):
     ma = daily_spend.rolling(window=window_days).mean()
     return daily_spend, ma
 
+def calculate_moving_averages_incremental(window_days=7, start=None, end=None):
+    """
+    Same output as calculate_moving_averages, but read from the shared
+    incremental daily buckets instead of re-sorting and resampling the
+    receipts DataFrame on every call.
+    """
+    from rolling_stats import get_rolling_stats
+
+    stats = get_rolling_stats()
+    return stats.daily_series(start, end), stats.moving_average(window_days, start, end)
+
 def predict_next_month_spending(df):
     """
     Simple projection based on recent average spending.
@@ -77,5 +90,61 @@ def predict_spending_polynomial(df, degree=2):
             "predicted_amount": predicted_values
         })
     except Exception as e:
-        print(f"Prediction Error: {e}")
-        return None
\ No newline at end of file
+        log_error(f"forecasting: prediction failed: {e}")
+        return None
+
+def pivot_daily_spend(df, by="category", top_n=None):
+    """
+    Builds a date x group matrix of daily spend (one column per `by` value).
+    Missing days are filled with 0 so every column shares the same day index.
+    If top_n is given, only the top_n groups by total spend are kept.
+    """
+    if top_n is not None:
+        top_groups = df.groupby(by)["amount"].sum().nlargest(top_n).index
+        df = df[df[by].isin(top_groups)]
+
+    daily = df.pivot_table(
+        index=df["date"].dt.normalize(),
+        columns=by,
+        values="amount",
+        aggfunc="sum",
+        fill_value=0.0,
+        observed=True,
+    )
+    full_range = pd.date_range(daily.index.min(), daily.index.max(), freq="D")
+    return daily.reindex(full_range, fill_value=0.0)
+
+
+def forecast_by_group(df, by="category", top_n=None, degree=2, horizon=30):
+    """
+    Batch version of predict_spending_polynomial: fits one polynomial per
+    group (category or vendor) in a single vectorized pass.
+    np.polyfit accepts a 2-D y, so all groups are solved together against
+    the shared day axis instead of looping group by group.
+    Returns (daily, forecast) where both are date x group DataFrames,
+    or (None, None) if there is not enough history.
+    """
+    if df.empty:
+        return None, None
+
+    daily = pivot_daily_spend(df, by=by, top_n=top_n)
+    if len(daily) < 5 or daily.shape[1] == 0:
+        return None, None
+
+    X = np.arange(len(daily), dtype=float)
+    Y = daily.to_numpy(dtype=float)
+
+    try:
+        coeffs = np.polyfit(X, Y, degree)                      # (degree + 1, groups)
+        future_days = np.arange(len(daily), len(daily) + horizon, dtype=float)
+        predicted = np.vander(future_days, degree + 1) @ coeffs  # (horizon, groups)
+
+        # Clip negative predictions to 0
+        predicted = np.maximum(predicted, 0)
+
+        future_dates = pd.date_range(daily.index.max() + timedelta(days=1), periods=horizon, freq="D")
+        forecast = pd.DataFrame(predicted, index=future_dates, columns=daily.columns)
+        return daily, forecast
+    except Exception as e:
+        log_error(f"forecasting: group prediction failed: {e}")
+        return None, None
@@ -1,19 +1,34 @@
 import json  # Standard IDE sync complete
+import time
 import google.generativeai as genai
 from prompts import RECEIPT_EXTRACTION_PROMPT, DATA_ANALYSIS_PROMPT, CHAT_WITH_DATA_PROMPT
+from money import round_amount
+from response_cache import get_cached, put_cached, normalize_question
+from metrics import timed
+from logger import log_warning, log_error
 
 class GeminiClient:
     """
     Client for interacting with Google Gemini 1.5 Flash for receipt analysis.
     """
+    # Model picked by the first client in this process; later clients skip list_models()
+    _selected_model_name = None
+
     def __init__(self, api_key):
         if not api_key:
             raise ValueError("API Key is required")
         
         genai.configure(api_key=api_key)
         
+        # Seconds until the first streamed chunk of the last streaming call
+        self.last_ttft = None
+
         # Dynamic Model Selection
         self.model = None
+        if GeminiClient._selected_model_name:
+            self.model = genai.GenerativeModel(GeminiClient._selected_model_name)
+            return
+
         try:
             # List available models to find one that works
             available_models = []
@@ -42,12 +57,19 @@ class GeminiClient:
                  self.model = genai.GenerativeModel(available_models[0])
                  
         except Exception as e:
-            print(f"Error listing models: {e}. Falling back to default.")
+            log_warning(f"gemini: could not list models ({e}), falling back to default")
 
         # Hard fallback if listing failed or no model found
         if not self.model:
              self.model = genai.GenerativeModel("gemini-1.5-flash")
+        else:
+            GeminiClient._selected_model_name = self.model.model_name
 
+    @property
+    def model_name(self):
+        return getattr(self.model, "model_name", "unknown")
+
+    @timed("ai", provider="gemini")
     def _generate_content_safe(self, prompt_parts):
         if not self.model:
             raise RuntimeError("Gemini model not initialized")
@@ -57,10 +79,60 @@ class GeminiClient:
              # Logic for 404 is now mostly handled by init choice, but keep safety
             if "404" in str(e) or "not found" in str(e).lower():
                  # If current failed, try Pro legacy one last time
-                 print("Current model failed, trying gemini-pro")
+                 log_warning("gemini: current model failed, trying gemini-pro", model=self.model_name)
                  return genai.GenerativeModel("gemini-pro").generate_content(prompt_parts)
             raise e
 
+    def _stream_content_safe(self, prompt_parts):
+        """
+        Streaming counterpart of _generate_content_safe: yields text chunks
+        as they arrive and records time-to-first-token in self.last_ttft.
+        """
+        if not self.model:
+            raise RuntimeError("Gemini model not initialized")
+
+        started = time.perf_counter()
+        self.last_ttft = None
+        model = self.model
+        try:
+            response = model.generate_content(prompt_parts, stream=True)
+        except Exception as e:
+            if "404" in str(e) or "not found" in str(e).lower():
+                log_warning("gemini: current model failed, trying gemini-pro", model=self.model_name)
+                response = genai.GenerativeModel("gemini-pro").generate_content(prompt_parts, stream=True)
+            else:
+                raise e
+
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. safety metadata only)
+                continue
+            if text:
+                if self.last_ttft is None:
+                    self.last_ttft = time.perf_counter() - started
+                yield text
+
+    def _stream_cached(self, prompt, cache_prompt, data_version):
+        """
+        Yields a cached answer in one chunk, or streams a fresh one and caches it when complete.
+        """
+        if data_version is not None:
+            cached = get_cached(data_version, cache_prompt, self.model_name)
+            if cached is not None:
+                self.last_ttft = 0.0
+                yield cached
+                return
+
+        parts = []
+        for text in self._stream_content_safe(prompt):
+            parts.append(text)
+            yield text
+
+        if data_version is not None and parts:
+            put_cached(data_version, cache_prompt, self.model_name, "".join(parts))
+
     def extract_receipt(self, image):
         """
         Sends the receipt image to Gemini 1.5 Flash for structured extraction.
@@ -68,73 +140,126 @@ class GeminiClient:
         """
         try:
             response = self._generate_content_safe([RECEIPT_EXTRACTION_PROMPT, image])
-            text = response.text.strip()
-            
-            # Use regex to find the JSON block
-            import re
-            match = re.search(r"\{.*\}", text, re.DOTALL)
-            if match:
-                json_str = match.group()
-                data = json.loads(json_str)
-                
-                # Ensure all required keys exist with defaults
-                defaults = {
-                    "bill_id": "UNKNOWN",
-                    "vendor": "Unknown Vendor",
-                    "category": "Uncategorized",
-                    "date": "2024-01-01",
-                    "amount": 0.0,
-                    "tax": 0.0,
-                    "subtotal": 0.0,
-                    "items": []
-                }
-                
-                for key, default in defaults.items():
-                    if key not in data:
-                        data[key] = default
-                    elif data[key] is None:
-                        data[key] = default
-                        
-                # Type safety for amount/tax
-                try:
-                    data["amount"] = float(data["amount"])
-                except:
-                    data["amount"] = 0.0
-                    
-                try:
-                    data["tax"] = float(data["tax"])
-                except:
-                    data["tax"] = 0.0
-                    
-                try:
-                    data["subtotal"] = float(data["subtotal"])
-                except:
-                    data["subtotal"] = 0.0
-
-                return data
+            return self._parse_receipt_json(response.text)
+        except Exception as e:
+            log_error(f"gemini: receipt extraction failed: {e}")
             return None
+
+    def extract_receipt_text(self, receipt_text):
+        """
+        Same as extract_receipt, but sends the receipt as text (e.g. the
+        text layer of a digital PDF) instead of an image. Text prompts are
+        far smaller and faster than image prompts.
+        """
+        try:
+            prompt = f"{RECEIPT_EXTRACTION_PROMPT}\n\nReceipt text:\n{receipt_text}"
+            response = self._generate_content_safe(prompt)
+            return self._parse_receipt_json(response.text)
         except Exception as e:
-            print(f"Error extracting receipt: {e}")
+            log_error(f"gemini: receipt text extraction failed: {e}")
+            return None
+
+    @staticmethod
+    def _parse_receipt_json(text):
+        """
+        Pulls the JSON object out of a model response and fills defaults.
+        """
+        # Use regex to find the JSON block
+        import re
+        match = re.search(r"\{.*\}", text.strip(), re.DOTALL)
+        if not match:
             return None
 
-    def generate_insights(self, data_summary):
+        data = json.loads(match.group())
+
+        # Ensure all required keys exist with defaults
+        defaults = {
+            "bill_id": "UNKNOWN",
+            "vendor": "Unknown Vendor",
+            "category": "Uncategorized",
+            "date": "2024-01-01",
+            "amount": 0.0,
+            "tax": 0.0,
+            "subtotal": 0.0,
+            "items": []
+        }
+
+        for key, default in defaults.items():
+            if key not in data:
+                data[key] = default
+            elif data[key] is None:
+                data[key] = default
+
+        # Type safety for amount/tax: exact 2-decimal values via integer paise
+        for key in ["amount", "tax", "subtotal"]:
+            data[key] = round_amount(data[key])
+
+        return data
+
+    def generate_insights(self, data_summary, data_version=None):
         """
         Generates spending insights based on the dataframe summary string.
+        If data_version is given, responses are cached per (data version, prompt, model).
         """
         try:
             prompt = f"{DATA_ANALYSIS_PROMPT}\n\nData:\n{data_summary}"
+            if data_version is not None:
+                cached = get_cached(data_version, prompt, self.model_name)
+                if cached is not None:
+                    return cached
+
             response = self._generate_content_safe(prompt)
+            if data_version is not None:
+                put_cached(data_version, prompt, self.model_name, response.text)
             return response.text
         except Exception as e:
             return f"Error generating insights: {e}"
 
-    def chat_with_data(self, query, context_str):
+    def chat_with_data(self, query, context_str, data_version=None, history=""):
         """
         Answers user questions based on the provided data context.
+        `history` is an optional summary of the conversation so far.
+        If data_version is given, answers are cached per (data version,
+        normalized question, context, history, model).
         """
         try:
-            prompt = CHAT_WITH_DATA_PROMPT.format(context=context_str, question=query)
+            prompt = CHAT_WITH_DATA_PROMPT.format(context=context_str, history=history, question=query)
+            cache_prompt = self._chat_cache_prompt(query, context_str, history)
+            if data_version is not None:
+                cached = get_cached(data_version, cache_prompt, self.model_name)
+                if cached is not None:
+                    return cached
+
             response = self._generate_content_safe(prompt)
+            if data_version is not None:
+                put_cached(data_version, cache_prompt, self.model_name, response.text)
             return response.text
         except Exception as e:
-            return "Sorry, I encountered an error analyzing the data."
\ No newline at end of file
+            return "Sorry, I encountered an error analyzing the data."
+
+    def stream_insights(self, data_summary, data_version=None):
+        """
+        Streaming variant of generate_insights; yields Markdown chunks.
+        Errors are raised, not yielded, so they never end up inside the
+        rendered report; a partial answer is not cached.
+        """
+        prompt = f"{DATA_ANALYSIS_PROMPT}\n\nData:\n{data_summary}"
+        yield from self._stream_cached(prompt, prompt, data_version)
+
+    def stream_chat_with_data(self, query, context_str, data_version=None, history=""):
+        """
+        Streaming variant of chat_with_data; yields Markdown chunks.
+        Raises on failure (possibly after some chunks) instead of yielding
+        an error message into the answer.
+        """
+        prompt = CHAT_WITH_DATA_PROMPT.format(context=context_str, history=history, question=query)
+        yield from self._stream_cached(prompt, self._chat_cache_prompt(query, context_str, history), data_version)
+
+    @staticmethod
+    def _chat_cache_prompt(query, context_str, history=""):
+        """
+        Cache identity of a chat turn. The history is part of it: a
+        follow-up like "what about last month?" means something different
+        in every conversation, even with the same question and context.
+        """
+        return CHAT_WITH_DATA_PROMPT.format(context=context_str, history=history, question=normalize_question(query))
\ No newline at end of file
@@ -3,6 +3,9 @@ import numpy as np
 from PIL import Image
 from typing import cast
 
+from metrics import timed
+
+@timed("preprocess")
 def preprocess_image(pil_image: Image.Image) -> Image.Image:
     """
     SAFE preprocessing for receipts.
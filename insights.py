@@ -1,6 +1,40 @@
 from gemini_client import GeminiClient
+from advanced_analytics import detect_anomalies, summarize_anomalies
+from queries import get_data_version
+from money import from_cents
 import streamlit as st
 
+def _build_summary(df) -> str:
+    """
+    Compact dataset summary sent to Gemini instead of the raw receipts.
+    """
+    total_spend = from_cents(df["amount_cents"].sum())
+    transaction_count = len(df)
+    
+    top_vendor = df.groupby("vendor", observed=True)["amount_cents"].sum().idxmax() if not df.empty else "N/A"
+    top_category = df.groupby("category", observed=True)["amount_cents"].sum().idxmax() if "category" in df.columns else "N/A"
+    
+    # Get last 5 transactions for context
+    recent_tx = df.sort_values("date", ascending=False).head(5)[["date", "vendor", "amount", "category"]].to_string(index=False)
+
+    # Outliers are computed locally; the model only has to explain them
+    anomaly_facts = summarize_anomalies(detect_anomalies(df))
+    
+    return f"""
+    Dataset Summary:
+    - Total Spending: ${total_spend:.2f}
+    - Total Transactions: {transaction_count}
+    - Top Vendor: {top_vendor}
+    - Top Category: {top_category}
+    - Date Range: {df["date"].min()} to {df["date"].max()}
+    
+    Recent Transactions:
+    {recent_tx}
+
+    Precomputed Anomalies:
+    {anomaly_facts}
+    """
+
 def generate_ai_insights(df) -> str:
     """
     Generate natural language spending insights using Gemini.
@@ -16,27 +50,26 @@ def generate_ai_insights(df) -> str:
         if df.empty:
             return "No data available for analysis."
 
-        total_spend = df["amount"].sum()
-        transaction_count = len(df)
-        
-        top_vendor = df.groupby("vendor")["amount"].sum().idxmax() if not df.empty else "N/A"
-        top_category = df.groupby("category")["amount"].sum().idxmax() if "category" in df.columns else "N/A"
-        
-        # Get last 5 transactions for context
-        recent_tx = df.sort_values("date", ascending=False).head(5)[["date", "vendor", "amount", "category"]].to_string(index=False)
-        
-        summary_str = f"""
-        Dataset Summary:
-        - Total Spending: ${total_spend:.2f}
-        - Total Transactions: {transaction_count}
-        - Top Vendor: {top_vendor}
-        - Top Category: {top_category}
-        - Date Range: {df["date"].min()} to {df["date"].max()}
-        
-        Recent Transactions:
-        {recent_tx}
-        """
-
-        return client.generate_insights(summary_str)
+        return client.generate_insights(_build_summary(df), data_version=get_data_version())
     except Exception as e:
-        return f"Error generating insights: {str(e)}"
\ No newline at end of file
+        return f"Error generating insights: {str(e)}"
+
+def stream_ai_insights(df):
+    """
+    Streaming variant of generate_ai_insights: yields Markdown chunks as
+    Gemini produces them. Time-to-first-token is stored in
+    st.session_state["LAST_INSIGHTS_TTFT"] (seconds). Gemini errors are
+    raised to the caller rather than streamed into the report.
+    """
+    api_key = st.session_state.get("GEMINI_API_KEY")
+    if not api_key:
+        yield "⚠ Gemini API Key not found. Please add it in the sidebar."
+        return
+
+    if df.empty:
+        yield "No data available for analysis."
+        return
+
+    client = GeminiClient(api_key)
+    yield from client.stream_insights(_build_summary(df), data_version=get_data_version())
+    st.session_state["LAST_INSIGHTS_TTFT"] = client.last_ttft
@@ -0,0 +1,271 @@
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+
+from database.db import get_db
+
+# Durable extraction queue in SQLite. The Upload tab enqueues files and
+# returns; worker.py processes claim jobs one at a time. Jobs and the
+# source files survive reruns and restarts; a job whose worker died is
+# put back in the queue once its claim goes stale.
+
+MAX_ATTEMPTS = 3
+HEARTBEAT_SECONDS = 5          # workers refresh their check-in and job heartbeat this often, even mid-job
+STALE_AFTER_SECONDS = 120      # a running job without a heartbeat for this long is assumed orphaned
+WORKER_ALIVE_SECONDS = 15      # a worker not seen for this long is assumed dead
+SPAWN_GRACE_SECONDS = 60       # reserved slots of a starting worker.py count as live this long
+DEFAULT_WORKERS = 2
+
+JOB_STATUSES = ["queued", "running", "saved", "duplicate", "failed"]
+
+
+def _connect():
+    db = get_db()
+    db.execute("PRAGMA busy_timeout = 5000")
+    return db
+
+
+# ================= ENQUEUE =================
+
+def enqueue(name, content: bytes):
+    """
+    Stores the file and queues it for extraction. Returns the job id, or
+    None if the same content is already queued, running or ingested.
+    """
+    from pipeline import store_source_file, content_hash
+    from queries import source_exists
+
+    sha = content_hash(content)
+    if source_exists(sha):
+        return None
+
+    # The unique index on active jobs makes this atomic across sessions;
+    # storing the file first is harmless (content-addressed, never rewritten)
+    _, path = store_source_file(name, content)
+    db = _connect()
+    cur = db.execute(
+        "INSERT OR IGNORE INTO jobs (filename, sha256, path, status, created_at) VALUES (?, ?, ?, 'queued', ?)",
+        (name, sha, path, time.time())
+    )
+    db.commit()
+    return cur.lastrowid if cur.rowcount else None
+
+
+# ================= CLAIM / FINISH =================
+
+def claim_job(worker_id):
+    """
+    Atomically takes the oldest queued job. Returns the job row as a dict
+    or None when the queue is empty.
+    """
+    db = _connect()
+    db.isolation_level = None
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        row = db.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if row is None:
+            db.execute("COMMIT")
+            return None
+        now = time.time()
+        db.execute(
+            """
+            UPDATE jobs SET status = 'running', worker = ?, started_at = ?, heartbeat = ?,
+                            attempts = attempts + 1
+            WHERE id = ?
+            """,
+            (worker_id, now, now, row["id"])
+        )
+        db.execute("COMMIT")
+    except sqlite3.Error:
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        raise
+    job = dict(row)
+    job["attempts"] += 1
+    return job
+
+
+def finish_job(job_id, status, result=None, error=None):
+    db = _connect()
+    db.execute(
+        "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+        (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+    )
+    db.commit()
+
+
+def fail_job(job, error):
+    """
+    Re-queues the job unless it has used up MAX_ATTEMPTS.
+    """
+    if job["attempts"] < MAX_ATTEMPTS:
+        db = _connect()
+        db.execute("UPDATE jobs SET status = 'queued', error = ? WHERE id = ?", (error, job["id"]))
+        db.commit()
+    else:
+        finish_job(job["id"], "failed", error=error)
+
+
+def heartbeat(worker_id, job_id=None):
+    """
+    Refreshes the worker's check-in and, while it runs one, its job's
+    heartbeat (only if the job is still this worker's).
+    """
+    db = _connect()
+    now = time.time()
+    db.execute(
+        "INSERT OR REPLACE INTO job_workers (id, pid, last_seen) VALUES (?, ?, ?)",
+        (worker_id, os.getpid(), now)
+    )
+    if job_id is not None:
+        db.execute(
+            "UPDATE jobs SET heartbeat = ? WHERE id = ? AND worker = ? AND status = 'running'",
+            (now, job_id, worker_id)
+        )
+    db.commit()
+
+
+def requeue_stale(stale_after=STALE_AFTER_SECONDS):
+    """
+    Puts running jobs whose worker stopped sending heartbeats back in the
+    queue. A job that has used up MAX_ATTEMPTS is failed instead: a file
+    that kills its worker (segfault in Tesseract / poppler, OOM) must not
+    be retried forever.
+    """
+    db = _connect()
+    now = time.time()
+    cur = db.execute(
+        """
+        UPDATE jobs SET
+            status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+            error = CASE WHEN attempts >= ? THEN 'worker died while processing this file'
+                         ELSE error END,
+            finished_at = CASE WHEN attempts >= ? THEN ? ELSE finished_at END
+        WHERE status = 'running' AND heartbeat < ?
+        """,
+        (MAX_ATTEMPTS, MAX_ATTEMPTS, MAX_ATTEMPTS, now, now - stale_after)
+    )
+    db.commit()
+    return cur.rowcount
+
+
+# ================= WORKERS =================
+
+def worker_checkin(worker_id):
+    heartbeat(worker_id)
+
+
+def worker_checkout(worker_id):
+    db = _connect()
+    db.execute("DELETE FROM job_workers WHERE id = ?", (worker_id,))
+    db.commit()
+
+
+def live_worker_count():
+    db = _connect()
+    try:
+        return db.execute(
+            "SELECT COUNT(*) FROM job_workers WHERE last_seen >= ?",
+            (time.time() - WORKER_ALIVE_SECONDS,)
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        return 0
+
+
+def _reserve_workers(count):
+    """
+    Tops the live workers up to `count`: in one write transaction, counts
+    the live workers and inserts job_workers rows for the missing ones,
+    so concurrent sessions cannot both start workers. Returns
+    (id prefix, number reserved).
+    """
+    db = _connect()
+    db.isolation_level = None
+    try:
+        db.execute("BEGIN IMMEDIATE")
+        now = time.time()
+        live = db.execute(
+            "SELECT COUNT(*) FROM job_workers WHERE last_seen >= ?", (now - WORKER_ALIVE_SECONDS,)
+        ).fetchone()[0]
+        needed = max(count - live, 0)
+        prefix = f"{socket.gethostname()}-{os.getpid()}-{int(now * 1000)}"
+        # The started workers check in under these ids, replacing the
+        # reservations; unclaimed ones expire after the grace period
+        db.executemany(
+            "INSERT OR REPLACE INTO job_workers (id, pid, last_seen) VALUES (?, NULL, ?)",
+            [(f"{prefix}-{i}", now + SPAWN_GRACE_SECONDS) for i in range(needed)]
+        )
+        db.execute("COMMIT")
+    except sqlite3.Error:
+        if db.in_transaction:
+            db.execute("ROLLBACK")
+        raise
+    return prefix, needed
+
+
+def ensure_workers(count=DEFAULT_WORKERS, api_key=None):
+    """
+    Starts worker processes until `count` are alive (never more, however
+    many sessions call this). Returns the number started. The Gemini key
+    is passed through the environment, never stored in the queue.
+    """
+    if live_worker_count() >= count:
+        return 0
+    prefix, needed = _reserve_workers(count)
+    if not needed:
+        return 0
+
+    env = dict(os.environ)
+    if api_key:
+        env["GEMINI_API_KEY"] = api_key
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "worker.py")
+    try:
+        subprocess.Popen(
+            [sys.executable, script, "--workers", str(needed), "--id-prefix", prefix],
+            env=env,
+            cwd=os.getcwd(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    except OSError:
+        db = _connect()
+        db.execute("DELETE FROM job_workers WHERE id LIKE ?", (prefix + "-%",))
+        db.commit()
+        raise
+    return needed
+
+
+# ================= STATUS =================
+
+def job_counts():
+    db = _connect()
+    try:
+        rows = db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {r["status"]: r["n"] for r in rows}
+
+
+def recent_jobs(limit=20):
+    db = _connect()
+    try:
+        rows = db.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    jobs = []
+    for r in rows:
+        job = dict(r)
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        jobs.append(job)
+    return jobs
+
+
+def clear_finished():
+    db = _connect()
+    db.execute("DELETE FROM jobs WHERE status IN ('saved', 'duplicate', 'failed')")
+    db.commit()
@@ -1,20 +1,271 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Structured, non-blocking logging.
+#   Callers only put records on an in-memory queue (QueueHandler); a
+#   QueueListener thread formats them as JSON lines and writes them to a
+#   size-rotated file, so disk I/O never runs on the hot path.
+#   request_id / job_id come from context variables set with log_context().
+#   DEBUG records are sampled so per-call events stay affordable under load.
+#
+#   log_info("queued file", job_id=12, duration_ms=3.1)
+#   with log_context(job_id=job["id"]): ...
+#
+# RotatingFileHandler is not safe across processes, so each entry point
+# writes its own file: app.log (Streamlit, cli.py), api.log,
+# watch_folder.log and worker-<n>.log. Forked children that do not pick
+# their own (e.g. cli.py's extraction pool) write <name>-<pid>.log.
 
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 
 LOG_FILE = os.path.join(LOG_DIR, "app.log")
 
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s"
-)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 10 * 1024 * 1024))
+LOG_BACKUPS = int(os.environ.get("LOG_BACKUPS", 5))
+DEBUG_SAMPLE_EVERY = max(1, int(os.environ.get("LOG_DEBUG_SAMPLE_EVERY", 100)))
+QUEUE_SIZE = 10000             # records beyond this are dropped, never waited on
+
+_REQUEST_ID = contextvars.ContextVar("request_id", default=None)
+_JOB_ID = contextvars.ContextVar("job_id", default=None)
+
+# LogRecord attributes that are not user fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_STATE = {"listener": None, "handler": None, "file": None}
+_STATE_LOCK = threading.Lock()
+
+
+# ================= CONTEXT =================
+
+def new_request_id():
+    return uuid.uuid4().hex[:12]
+
+
+@contextmanager
+def log_context(request_id=None, job_id=None):
+    """
+    Tags every record logged inside the block (same thread / task).
+    """
+    tokens = []
+    if request_id is not None:
+        tokens.append((_REQUEST_ID, _REQUEST_ID.set(request_id)))
+    if job_id is not None:
+        tokens.append((_JOB_ID, _JOB_ID.set(job_id)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class _ContextFilter(logging.Filter):
+    """
+    Copies the context IDs onto the record. Runs in the calling thread,
+    before the record is handed to the listener thread.
+    """
+
+    def filter(self, record):
+        record.request_id = _REQUEST_ID.get()
+        record.job_id = _JOB_ID.get()
+        return True
+
+
+class _SamplingFilter(logging.Filter):
+    """
+    Keeps the first and then every Nth DEBUG record per message template.
+    INFO and above always pass.
+    """
+
+    def __init__(self, every=DEBUG_SAMPLE_EVERY):
+        super().__init__()
+        self.every = every
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.every <= 1:
+            return True
+        key = (record.name, record.msg if isinstance(record.msg, str) else repr(record.msg))
+        with self._lock:
+            n = self._seen.get(key, 0)
+            self._seen[key] = n + 1
+        if n % self.every:
+            return False
+        record.sample_every = self.every
+        return True
+
+
+# ================= FORMAT =================
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, message, context IDs and
+    any extra fields passed by the caller.
+    """
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created))
+                  + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and value is not None and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Never blocks the caller: when the listener falls behind and the queue
+    is full, the record is counted and dropped.
+    """
+    dropped = 0
+
+    def prepare(self, record):
+        # The stock prepare() folds the traceback into `msg` and drops
+        # exc_info; keep it as a separate field for JsonFormatter instead
+        exception = record.exc_text
+        if record.exc_info:
+            exception = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        record.exception = exception
+        if record.stack_info:
+            record.stack = record.stack_info
+            record.stack_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+
+# ================= SETUP =================
+
+def setup_logging(filename=None, force=False):
+    """
+    Installs the queue handler on the root logger and starts the writer
+    thread. Idempotent; `force` restarts it (e.g. with another file).
+    """
+    if _STATE["listener"] is not None and not force:
+        return
+    path = os.path.join(LOG_DIR, filename) if filename else LOG_FILE
+    with _STATE_LOCK:
+        if _STATE["listener"] is not None and not force:
+            return
+        _stop_locked()
+
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True
+        )
+        file_handler.setFormatter(JsonFormatter())
+
+        records = queue.Queue(QUEUE_SIZE)
+        handler = _DroppingQueueHandler(records)
+        handler.addFilter(_ContextFilter())
+        handler.addFilter(_SamplingFilter())
+
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(handler)
+
+        listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=True)
+        listener.start()
+        _STATE.update(listener=listener, handler=handler, file=path)
+
+
+def _stop_locked():
+    if _STATE["handler"] is not None:
+        logging.getLogger().removeHandler(_STATE["handler"])
+    if _STATE["listener"] is not None:
+        _STATE["listener"].stop()      # drains what is already queued
+        for h in _STATE["listener"].handlers:
+            h.close()
+    _STATE.update(listener=None, handler=None)
+
+
+def shutdown_logging():
+    with _STATE_LOCK:
+        _stop_locked()
+
+
+def _after_fork():
+    # The writer thread does not survive fork(); give the child its own,
+    # writing to a per-pid file so parent and child never rotate one file
+    global _STATE_LOCK
+    _STATE_LOCK = threading.Lock()
+    was_running = _STATE["listener"] is not None
+    _STATE.update(listener=None, handler=None)
+    for h in list(logging.getLogger().handlers):
+        if isinstance(h, _DroppingQueueHandler):
+            logging.getLogger().removeHandler(h)
+    if was_running:
+        name, ext = os.path.splitext(os.path.basename(_STATE["file"]))
+        setup_logging(f"{name}-{os.getpid()}{ext}")
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+# ================= HELPERS =================
+
+def get_logger(name="receipt_vault"):
+    setup_logging()
+    return logging.getLogger(name)
+
+
+def log_event(level, message, **fields):
+    """
+    Logs `message` with structured fields (e.g. duration_ms, backend).
+    """
+    log = get_logger()
+    if log.isEnabledFor(level):
+        # LogRecord refuses extras that shadow its own attributes (e.g. "filename")
+        extra = {(f"field_{k}" if k in _RESERVED else k): v for k, v in fields.items()}
+        log.log(level, message, extra=extra)
+
+
+def log_debug(message: str, **fields):
+    log_event(logging.DEBUG, message, **fields)
+
+
+def log_info(message: str, **fields):
+    log_event(logging.INFO, message, **fields)
+
+
+def log_warning(message: str, **fields):
+    log_event(logging.WARNING, message, **fields)
+
 
-def log_info(message: str):
-    logging.info(message)
+def log_error(message: str, **fields):
+    log_event(logging.ERROR, message, **fields)
 
 
-def log_error(message: str):
-    logging.error(message)
\ No newline at end of file
+def log_stats():
+    return {"file": _STATE["file"], "dropped": _DroppingQueueHandler.dropped}
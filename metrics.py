@@ -0,0 +1,237 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+
+from logger import log_debug
+
+# In-process timing histograms for the hot path (upload, preprocessing,
+# OCR, AI calls, parsing, validation, DB). Each process keeps its own
+# numbers: the Streamlit app, api_server.py and every worker.py process.
+#
+#   with timer("ocr"):                         ...
+#   @timed("db", op="save_receipt")            def save_receipt(...)
+#
+# Shown in the Diagnostics panel and served as Prometheus text by
+# api_server.py at GET /metrics.
+
+# Upper bounds in seconds, from a DB lookup up to a slow cloud call
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_PREFIX = "receipt_vault"
+
+STAGE_HELP = {
+    "upload": "End-to-end handling of one uploaded file",
+    "preprocess": "Image preprocessing before OCR",
+    "ocr": "Tesseract OCR passes",
+    "pdf": "PDF text layer and rasterization",
+    "extract": "Extraction backends tried by the router",
+    "ai": "LLM calls (Ollama / Gemini)",
+    "parse": "Rule-based receipt parsing",
+    "validate": "Receipt validation",
+    "db": "SQLite operations",
+    "api": "HTTP API requests",
+}
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram of durations in seconds. Thread-safe.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        with self._lock:
+            self.counts[bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            if error:
+                self.errors += 1
+
+    def quantile(self, q):
+        """
+        Estimated quantile (seconds), interpolated within its bucket.
+        """
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                if n and seen + n >= rank:
+                    low = self.buckets[i - 1] if i > 0 else 0.0
+                    high = self.buckets[i] if i < len(self.buckets) else self.max
+                    return min(low + (high - low) * (rank - seen) / n, self.max)
+                seen += n
+            return self.max
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "total": self.total,
+                "max": self.max,
+                "errors": self.errors,
+                "counts": list(self.counts),
+            }
+
+
+_REGISTRY = {}                 # (stage, (label pairs)) -> Histogram
+_REGISTRY_LOCK = threading.Lock()
+_STARTED = time.time()
+
+
+def _key(stage, labels):
+    return stage, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def histogram(stage, **labels):
+    key = _key(stage, labels)
+    hist = _REGISTRY.get(key)
+    if hist is None:
+        with _REGISTRY_LOCK:
+            hist = _REGISTRY.setdefault(key, Histogram())
+    return hist
+
+
+def observe(stage, seconds, error=False, **labels):
+    histogram(stage, **labels).observe(seconds, error)
+    # Sampled by the logger; a no-op unless LOG_LEVEL=DEBUG
+    log_debug(f"timed {stage}", duration_ms=round(seconds * 1000, 3), error=error or None, **labels)
+
+
+# ================= TIMERS =================
+
+class timer:
+    """
+    Times a block (context manager) or every call of a function (decorator).
+    A block that raises is still timed and counted as an error.
+    """
+
+    def __init__(self, stage, **labels):
+        self.stage = stage
+        self.labels = labels
+        self.seconds = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._started
+        observe(self.stage, self.seconds, exc_type is not None, **self.labels)
+        return False
+
+    def __call__(self, fn):
+        stage, labels = self.stage, self.labels
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            error = True
+            try:
+                result = fn(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                observe(stage, time.perf_counter() - started, error, **labels)
+        return wrapper
+
+
+def timed(stage, **labels):
+    """
+    Decorator form: @timed("db", op="save_receipt").
+    """
+    return timer(stage, **labels)
+
+
+# ================= REPORTING =================
+
+def summary():
+    """
+    One row per (stage, labels) with count, errors, mean / p50 / p95 / max in ms.
+    Sorted by total time spent, largest first.
+    """
+    with _REGISTRY_LOCK:
+        items = list(_REGISTRY.items())
+    rows = []
+    for (stage, labels), hist in items:
+        snap = hist.snapshot()
+        if not snap["count"]:
+            continue
+        p50, p95 = hist.quantile(0.5), hist.quantile(0.95)
+        rows.append({
+            "stage": stage,
+            "labels": ", ".join(f"{k}={v}" for k, v in labels),
+            "count": snap["count"],
+            "errors": snap["errors"],
+            "total_s": round(snap["total"], 3),
+            "mean_ms": round(snap["total"] / snap["count"] * 1000, 1),
+            "p50_ms": round(p50 * 1000, 1),
+            "p95_ms": round(p95 * 1000, 1),
+            "max_ms": round(snap["max"] * 1000, 1),
+        })
+    rows.sort(key=lambda r: r["total_s"], reverse=True)
+    return rows
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    escaped = []
+    for k, v in pairs:
+        v = v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{k}="{v}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def render_prometheus():
+    """
+    All histograms in the Prometheus text exposition format (0.0.4).
+    """
+    with _REGISTRY_LOCK:
+        items = sorted(_REGISTRY.items(), key=lambda kv: kv[0])
+
+    lines = [
+        f"# HELP {METRIC_PREFIX}_uptime_seconds Seconds since this process started recording metrics",
+        f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge",
+        f"{METRIC_PREFIX}_uptime_seconds {time.time() - _STARTED:.3f}",
+    ]
+    by_stage = {}
+    for (stage, labels), hist in items:
+        by_stage.setdefault(stage, []).append((labels, hist.snapshot(), hist.buckets))
+
+    for stage, series in by_stage.items():
+        name = f"{METRIC_PREFIX}_{stage}_seconds"
+        lines.append(f"# HELP {name} {STAGE_HELP.get(stage, stage)}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, snap, buckets in series:
+            cumulative = 0
+            for bound, n in zip(list(buckets) + ["+Inf"], snap["counts"]):
+                cumulative += n
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {snap['total']:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {snap['count']}")
+
+        errors = f"{METRIC_PREFIX}_{stage}_errors_total"
+        lines.append(f"# HELP {errors} Timed {stage} calls that raised")
+        lines.append(f"# TYPE {errors} counter")
+        for labels, snap, _ in series:
+            lines.append(f"{errors}{_format_labels(labels)} {snap['errors']}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _REGISTRY_LOCK:
+        _REGISTRY.clear()
@@ -0,0 +1,68 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+import numpy as np
+
+from config import CURRENCY_SYMBOL
+
+# Amounts are handled as integer minor units (paise / cents) so that sums
+# and comparisons are exact. Floats only appear at the UI / chart boundary.
+
+_HUNDREDTH = Decimal("0.01")
+
+
+def to_cents(value, default=0):
+    """
+    Converts an amount (float, int, Decimal or string like '1,234.50')
+    to integer minor units, rounding half-up at the second decimal.
+    Returns `default` when the value cannot be read as a number.
+    """
+    if value is None or isinstance(value, bool):
+        return default
+    if isinstance(value, (int, np.integer)):
+        return int(value) * 100
+
+    try:
+        amount = Decimal(str(value).replace(",", "").strip())
+    except (InvalidOperation, ValueError):
+        return default
+    if not amount.is_finite():
+        return default
+
+    return int(amount.quantize(_HUNDREDTH, rounding=ROUND_HALF_UP) * 100)
+
+
+def from_cents(cents):
+    """
+    Integer minor units -> float for display / charts.
+    """
+    return int(cents) / 100
+
+
+def round_amount(value, default=0.0):
+    """
+    Rounds an amount to 2 decimals through integer cents (exact half-up).
+    """
+    cents = to_cents(value, default=None)
+    return default if cents is None else from_cents(cents)
+
+
+def sum_cents(values):
+    """
+    Exact total of a float amount column / list, in integer minor units.
+    Values are converted to int64 cents once and summed as integers, so
+    the result does not drift with the number of rows. Receipt frames
+    carry int64 *_cents columns; sum those directly instead.
+    """
+    arr = np.asarray(values, dtype="float64")
+    if arr.size == 0:
+        return 0
+    return int(np.rint(arr * 100).astype(np.int64).sum())
+
+
+def format_cents(cents, symbol=CURRENCY_SYMBOL):
+    """
+    Formats integer minor units as e.g. '₹1,234.50'.
+    """
+    sign = "-" if cents < 0 else ""
+    units, minor = divmod(abs(int(cents)), 100)
+    return f"{sign}{symbol}{units:,}.{minor:02d}"
@@ -1,15 +1,300 @@
+import re
+
 import pytesseract
+from pytesseract import Output
 from PIL import Image
 
+from metrics import timed
+
+# Tesseract word confidences are 0-100 (-1 for non-text boxes)
+CLEAN_SCAN_CONFIDENCE = 85     # mean confidence above which we stop early
+LOW_LINE_CONFIDENCE = 60       # lines below this are re-OCR'd on their own
+LINE_PADDING = 4               # pixels around a line crop
+LINE_UPSCALE = 2               # small text reads better enlarged
+AMOUNT_UPSCALE = 3             # amount column crops are read at higher resolution
+
+# Same idea as ocr_utils.extract_text, restricted to what an amount can contain
+NUMERIC_CONFIG = "--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789.,"
+
+# A trailing word counts as an amount only with a 2-digit decimal part
+# ("12.50", "1,250.00", "$4.99", "Rs.45.00"), so quantities, dates, phone
+# numbers and bill numbers do not widen the amount column. Digits may be
+# misread as look-alike letters ('l2.5O', '1,2S0.OO'): those are exactly
+# the rows the numeric re-OCR is for, so they still count (with at least
+# one real digit).
+AMOUNT_CHAR = r"[\dlIOoSB]"
+AMOUNT_TOKEN_RE = re.compile(
+    rf"^(?=.*\d)(?:[Rr][Ss]\.?|INR|[$\u20b9\u20ac\u00a3])?\s*{AMOUNT_CHAR}[\dlIOoSB,]*[.,]{AMOUNT_CHAR}{{2}}$"
+)
+CLEAN_AMOUNT_RE = re.compile(r"^\d[\d,]*[.,]\d{2}$")
+TOTALS_KEYWORD_RE = re.compile(
+    r"(?i)\b(total|tot|due|payable|tax|gst|vat|cgst|sgst|sub\s*total|net\s*amount|taxable)\b"
+)
+
 
 def extract_text(image: Image.Image):
     """
     Always returns List[str]
     """
-    raw_text = pytesseract.image_to_string(image)
+    return [line["text"] for line in ocr_receipt(image)["lines"]]
+
+
+def ocr_words(image: Image.Image, config=""):
+    """
+    Word-level OCR via Tesseract TSV output.
+    Returns [{text, conf, left, top, width, height, key}] where `key`
+    identifies the (block, paragraph, line) the word belongs to.
+    """
+    raw = pytesseract.image_to_data(image, config=config, output_type=Output.DICT)
+    words = []
+    for i, text in enumerate(raw["text"]):
+        text = (text or "").strip()
+        conf = float(raw["conf"][i])
+        if not text or conf < 0:
+            continue
+        words.append({
+            "text": text,
+            "conf": conf,
+            "left": raw["left"][i],
+            "top": raw["top"][i],
+            "width": raw["width"][i],
+            "height": raw["height"][i],
+            "key": (raw["block_num"][i], raw["par_num"][i], raw["line_num"][i]),
+        })
+    return words
+
+
+def group_lines(words):
+    """
+    Groups words into lines with text, mean confidence and bounding box,
+    ordered top to bottom.
+    """
+    by_key = {}
+    for w in words:
+        by_key.setdefault(w["key"], []).append(w)
+
+    lines = []
+    for line_words in by_key.values():
+        line_words.sort(key=lambda w: w["left"])
+        left = min(w["left"] for w in line_words)
+        top = min(w["top"] for w in line_words)
+        right = max(w["left"] + w["width"] for w in line_words)
+        bottom = max(w["top"] + w["height"] for w in line_words)
+        lines.append({
+            "text": " ".join(w["text"] for w in line_words),
+            "conf": sum(w["conf"] for w in line_words) / len(line_words),
+            "bbox": (left, top, right, bottom),
+            "words": line_words,
+        })
+
+    lines.sort(key=lambda l: (l["bbox"][1], l["bbox"][0]))
+    return lines
+
+
+def quality_score(lines):
+    """
+    Receipt-level OCR quality 0-100: mean word confidence weighted by
+    characters, so long well-read lines count more than stray marks.
+    """
+    chars = sum(len(w["text"]) for l in lines for w in l["words"])
+    if not chars:
+        return 0.0
+    return sum(w["conf"] * len(w["text"]) for l in lines for w in l["words"]) / chars
+
+
+@timed("ocr", step="line")
+def _reocr_line(image, line):
+    """
+    Re-reads a single line crop (enlarged, single-line page mode).
+    Returns the better of the old and new readings.
+    """
+    left, top, right, bottom = line["bbox"]
+    box = (
+        max(left - LINE_PADDING, 0),
+        max(top - LINE_PADDING, 0),
+        min(right + LINE_PADDING, image.width),
+        min(bottom + LINE_PADDING, image.height),
+    )
+    crop = image.crop(box)
+    crop = crop.resize((crop.width * LINE_UPSCALE, crop.height * LINE_UPSCALE), Image.LANCZOS)
+
+    words = ocr_words(crop, config="--psm 7")
+    if not words:
+        return line
+
+    conf = sum(w["conf"] for w in words) / len(words)
+    if conf <= line["conf"]:
+        return line
+
+    # Map word boxes back to page coordinates
+    for w in words:
+        w["left"] = box[0] + w["left"] // LINE_UPSCALE
+        w["top"] = box[1] + w["top"] // LINE_UPSCALE
+        w["width"] //= LINE_UPSCALE
+        w["height"] //= LINE_UPSCALE
+        w["key"] = line["words"][0]["key"]
+
+    return {**line, "text": " ".join(w["text"] for w in words), "conf": conf, "words": words}
+
+
+# ================= LAYOUT: TOTALS / ITEM AMOUNT COLUMN =================
 
-    if isinstance(raw_text, str):
-        return [line.strip() for line in raw_text.splitlines() if line.strip()]
+def locate_amount_regions(lines):
+    """
+    Finds the amounts column from the OCR boxes: the x-range of the last
+    word on lines that end in a number. Rows are split into the line-item
+    block and the totals block (from the first total / tax / subtotal line).
+    Returns {"column": (x0, x1), "item_rows": [...], "totals_rows": [...]}
+    with row indices into `lines`, or None if no amount column is found.
+    """
+    amount_rows = [
+        i for i, l in enumerate(lines)
+        if len(l["words"]) >= 2 and AMOUNT_TOKEN_RE.match(l["words"][-1]["text"])
+    ]
+    if not amount_rows:
+        return None
+
+    last_words = [lines[i]["words"][-1] for i in amount_rows]
+    x0 = min(w["left"] for w in last_words)
+    x1 = max(w["left"] + w["width"] for w in last_words)
+
+    first_totals = next(
+        (i for i in amount_rows if TOTALS_KEYWORD_RE.search(lines[i]["text"])),
+        None
+    )
+    if first_totals is None:
+        return {"column": (x0, x1), "item_rows": amount_rows, "totals_rows": []}
+
+    return {
+        "column": (x0, x1),
+        "item_rows": [i for i in amount_rows if i < first_totals],
+        "totals_rows": [i for i in amount_rows if i >= first_totals],
+    }
+
+
+def _reocr_amount_column(image, lines, rows, column):
+    """
+    Re-reads the amount column for `rows` as one numeric-only crop and
+    replaces each row's trailing amount with the new reading.
+    Returns the number of rows updated.
+    """
+    if not rows:
+        return 0
+
+    x0, x1 = column
+    top = min(lines[i]["bbox"][1] for i in rows)
+    bottom = max(lines[i]["bbox"][3] for i in rows)
+    box = (
+        max(x0 - LINE_PADDING * 2, 0),
+        max(top - LINE_PADDING, 0),
+        min(x1 + LINE_PADDING * 2, image.width),
+        min(bottom + LINE_PADDING, image.height),
+    )
+    crop = image.crop(box)
+    crop = crop.resize((crop.width * AMOUNT_UPSCALE, crop.height * AMOUNT_UPSCALE), Image.LANCZOS)
+
+    # Rightmost numeric word per row, matched on its vertical centre
+    readings = {}
+    for w in ocr_words(crop, config=NUMERIC_CONFIG):
+        center = box[1] + (w["top"] + w["height"] / 2) / AMOUNT_UPSCALE
+        row = next((i for i in rows if lines[i]["bbox"][1] <= center <= lines[i]["bbox"][3]), None)
+        if row is None or not re.search(r"\d", w["text"]):
+            continue
+        if row not in readings or w["left"] > readings[row]["left"]:
+            readings[row] = w
+
+    updated = 0
+    for row, w in readings.items():
+        line = lines[row]
+        old = line["words"][-1]
+        if old["text"] == w["text"]:
+            continue
+        # Keep the page reading unless the numeric one is more confident
+        # or the page reading is not a clean amount (e.g. 'l2.5O')
+        if w["conf"] < old["conf"] and not (
+            CLEAN_AMOUNT_RE.match(w["text"]) and not CLEAN_AMOUNT_RE.match(old["text"])
+        ):
+            continue
+        words = line["words"][:-1] + [{**old, "text": w["text"], "conf": w["conf"]}]
+        lines[row] = {**line, "text": " ".join(x["text"] for x in words), "words": words}
+        updated += 1
+
+    return updated
+
+
+@timed("ocr", step="amounts")
+def refine_amounts(image: Image.Image, ocr):
+    """
+    Layout stage after ocr_receipt: re-OCRs only the totals block and the
+    line-item amount column, enlarged and with a numeric whitelist, instead
+    of running the full page again at higher DPI.
+    Returns a new result dict with `text` / `lines` updated and
+    `amount_rows_reocr` set.
+    """
+    lines = list(ocr["lines"])
+    regions = locate_amount_regions(lines)
+    if regions is None:
+        return {**ocr, "amount_rows_reocr": 0}
+
+    updated = _reocr_amount_column(image, lines, regions["totals_rows"], regions["column"])
+    updated += _reocr_amount_column(image, lines, regions["item_rows"], regions["column"])
+
+    return {
+        **ocr,
+        "text": "\n".join(l["text"] for l in lines),
+        "lines": lines,
+        "amount_rows_reocr": updated,
+    }
+
+
+@timed("ocr", step="page")
+def ocr_receipt(image: Image.Image, clean_threshold=CLEAN_SCAN_CONFIDENCE,
+                low_line_threshold=LOW_LINE_CONFIDENCE, reocr=True):
+    """
+    Structured OCR of a receipt.
+    One full-page pass; if the page scores at least `clean_threshold`
+    the result is returned as is (early exit). Otherwise only lines below
+    `low_line_threshold` are re-OCR'd from their crops.
+    With reocr=False (a quick probe) that second stage is skipped and the
+    result is marked "reocr_pending"; finish_ocr() runs it later.
+    Returns {text, lines, quality, early_exit, reocr_lines, reocr_pending}.
+    """
+    lines = group_lines(ocr_words(image))
+    quality = quality_score(lines)
+    early_exit = quality >= clean_threshold
+
+    ocr = {
+        "text": "\n".join(l["text"] for l in lines),
+        "lines": lines,
+        "quality": round(quality, 1),
+        "early_exit": early_exit,
+        "reocr_lines": 0,
+        "reocr_pending": not early_exit,
+    }
+    return finish_ocr(image, ocr, low_line_threshold) if reocr else ocr
+
+
+def finish_ocr(image: Image.Image, ocr, low_line_threshold=LOW_LINE_CONFIDENCE):
+    """
+    Runs the line re-OCR stage skipped by ocr_receipt(..., reocr=False),
+    so a probe result can be reused as if it were a full pass.
+    `image` must be the page the probe read. Other results are returned
+    unchanged.
+    """
+    if not ocr.get("reocr_pending"):
+        return ocr
+    lines = list(ocr["lines"])
+    reocr_count = 0
+    for i, line in enumerate(lines):
+        if line["conf"] < low_line_threshold:
+            lines[i] = _reocr_line(image, line)
+            reocr_count += 1
 
-    # fallback (should never happen)
-    return []
\ No newline at end of file
+    return {
+        **ocr,
+        "text": "\n".join(l["text"] for l in lines),
+        "lines": lines,
+        "quality": round(quality_score(lines), 1),
+        "reocr_lines": reocr_count,
+        "reocr_pending": False,
+    }
@@ -1,16 +1,193 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import xml.etree.ElementTree as ET
+
 from pdf2image import convert_from_bytes
-from typing import List
+from typing import List, Optional
 from PIL import Image
 
-from config import POPPLER_PATH
+from config import POPPLER_PATH, IMAGE_DPI
+from metrics import timed
+
+# Most receipts OCR cleanly at 150 DPI; only faint / small print needs IMAGE_DPI.
+LOW_DPI = 150
+HIGH_DPI = IMAGE_DPI
+MIN_TEXT_LAYER_CHARS = 40      # fewer alphanumerics than this = scanned PDF
+LINE_Y_TOLERANCE = 0.5         # words whose centres differ by < half a line height share a row
+RERENDER_BELOW_QUALITY = 75    # OCR quality (0-100) that triggers a high-DPI render
 
 
-def pdf_to_images(pdf_bytes: bytes) -> List[Image.Image]:
+def pdf_to_images(pdf_bytes: bytes, dpi: int = IMAGE_DPI,
+                  first_page: Optional[int] = None, last_page: Optional[int] = None) -> List[Image.Image]:
     """
     Convert PDF bytes into list of PIL Images using Poppler
     """
     images = convert_from_bytes(
         pdf_bytes,
+        dpi=dpi,
+        first_page=first_page,
+        last_page=last_page,
         poppler_path=POPPLER_PATH
     )
-    return images
\ No newline at end of file
+    return images
+
+
+# ================= TEXT LAYER =================
+
+def _poppler_tool(name):
+    """
+    Path to a Poppler command-line tool: POPPLER_PATH first, then PATH.
+    """
+    for candidate in (name, name + ".exe"):
+        path = os.path.join(POPPLER_PATH, candidate) if POPPLER_PATH else ""
+        if path and os.path.isfile(path):
+            return path
+    return shutil.which(name)
+
+
+def run_pdftotext(pdf_bytes: bytes, args=("-layout",), first_page=None, last_page=None) -> str:
+    """
+    Runs poppler's pdftotext on the PDF and returns its output ("" when
+    the tool is missing or fails).
+    """
+    tool = _poppler_tool("pdftotext")
+    if not tool:
+        return ""
+
+    # pdftotext cannot read the PDF from stdin on every platform
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(pdf_bytes)
+        cmd = [tool, *args]
+        if first_page:
+            cmd += ["-f", str(first_page)]
+        if last_page:
+            cmd += ["-l", str(last_page)]
+        cmd += [path, "-"]
+        proc = subprocess.run(cmd, capture_output=True, timeout=30)
+        if proc.returncode != 0:
+            return ""
+        return proc.stdout.decode("utf-8", errors="replace")
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    finally:
+        os.remove(path)
+
+
+def text_layer_lines(pdf_bytes: bytes, page: int = 1):
+    """
+    Physical lines of the embedded text from `pdftotext -bbox-layout`.
+    pdftotext groups words into flows / blocks, which can put a label and
+    its amount in different blocks; words are re-grouped by vertical
+    position so each receipt row becomes one line, left to right.
+    Returns [{text, conf, bbox, words}] shaped like ocr_engine lines
+    (conf is always 100), or [] when there is no text layer.
+    """
+    xhtml = run_pdftotext(pdf_bytes, ("-bbox-layout",), page, page)
+    if not xhtml:
+        return []
+    try:
+        root = ET.fromstring(xhtml)
+    except ET.ParseError:
+        return []
+
+    words = []
+    for el in root.iter():
+        if el.tag.rsplit("}", 1)[-1] != "word" or not (el.text or "").strip():
+            continue
+        x0, y0 = float(el.get("xMin")), float(el.get("yMin"))
+        x1, y1 = float(el.get("xMax")), float(el.get("yMax"))
+        words.append({
+            "text": el.text.strip(),
+            "conf": 100.0,
+            "left": x0,
+            "top": y0,
+            "width": x1 - x0,
+            "height": y1 - y0,
+        })
+
+    rows = []
+    for w in sorted(words, key=lambda w: w["top"] + w["height"] / 2):
+        center = w["top"] + w["height"] / 2
+        if rows and abs(center - rows[-1]["center"]) < LINE_Y_TOLERANCE * max(w["height"], rows[-1]["height"]):
+            rows[-1]["words"].append(w)
+        else:
+            rows.append({"center": center, "height": w["height"], "words": [w]})
+
+    lines = []
+    for row in rows:
+        row_words = sorted(row["words"], key=lambda w: w["left"])
+        lines.append({
+            "text": " ".join(w["text"] for w in row_words),
+            "conf": 100.0,
+            "bbox": (
+                min(w["left"] for w in row_words),
+                min(w["top"] for w in row_words),
+                max(w["left"] + w["width"] for w in row_words),
+                max(w["top"] + w["height"] for w in row_words),
+            ),
+            "words": row_words,
+        })
+    return lines
+
+
+@timed("pdf", step="text_layer")
+def extract_text_layer(pdf_bytes: bytes, first_page=1, last_page=1) -> str:
+    """
+    Embedded text of the given pages, one receipt row per line, or "" for
+    scanned PDFs. Falls back to `pdftotext -layout` if the bbox output
+    cannot be read.
+    """
+    if first_page == last_page:
+        text = "\n".join(l["text"] for l in text_layer_lines(pdf_bytes, first_page))
+    else:
+        text = ""
+    if not text:
+        text = run_pdftotext(pdf_bytes, ("-layout",), first_page, last_page)
+    if sum(c.isalnum() for c in text) < MIN_TEXT_LAYER_CHARS:
+        return ""
+    return text
+
+
+# ================= ADAPTIVE RASTERIZATION =================
+
+@timed("pdf", step="render")
+def render_page_adaptive(pdf_bytes: bytes, page: int = 1,
+                         min_quality: float = RERENDER_BELOW_QUALITY):
+    """
+    Rasterizes one page at LOW_DPI and checks OCR confidence; re-renders
+    at HIGH_DPI only when the low-resolution page reads poorly.
+    Returns (image, info) where info = {"dpi", "quality", "ocr"}; the OCR
+    result belongs to the returned image and can be reused downstream
+    (it skipped line re-OCR; ocr_engine.finish_ocr completes it).
+    """
+    from ocr_engine import ocr_receipt
+    from image_preprocessing import preprocess_image
+
+    image = pdf_to_images(pdf_bytes, dpi=LOW_DPI, first_page=page, last_page=page)[0]
+    ocr = ocr_receipt(preprocess_image(image), reocr=False)
+    if ocr["quality"] >= min_quality:
+        return image, {"dpi": LOW_DPI, "quality": ocr["quality"], "ocr": ocr}
+
+    image = pdf_to_images(pdf_bytes, dpi=HIGH_DPI, first_page=page, last_page=page)[0]
+    return image, {"dpi": HIGH_DPI, "quality": None, "ocr": None}
+
+
+def prepare_pdf(pdf_bytes: bytes, page: int = 1):
+    """
+    Picks the cheapest way to read a PDF page.
+    Digital PDFs: text layer, plus a LOW_DPI render for preview only.
+    Scanned PDFs: adaptive DPI rasterization.
+    Returns {"image", "text", "dpi", "quality", "ocr"}; text is None for
+    scanned pages.
+    """
+    text = extract_text_layer(pdf_bytes, page, page)
+    if text:
+        image = pdf_to_images(pdf_bytes, dpi=LOW_DPI, first_page=page, last_page=page)[0]
+        return {"image": image, "text": text, "dpi": LOW_DPI, "quality": None, "ocr": None}
+
+    image, info = render_page_adaptive(pdf_bytes, page)
+    return {"image": image, "text": None, **info}
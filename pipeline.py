@@ -0,0 +1,146 @@
+import hashlib
+import io
+import os
+import time
+
+from config import SOURCE_DIR
+from extractors import ExtractionRouter, EXTRACTOR_VERSION, DEFAULT_MIN_CONFIDENCE
+from validator import validate_receipt
+from queries import save_receipt, receipt_exists, save_receipt_source, source_exists
+from metrics import timed
+
+# Shared by the Upload tab, cli.py and the background workers:
+#   extract_document  file bytes -> extracted receipt (no DB access, picklable result)
+#   save_extraction   extracted receipt -> validated, saved, source file recorded
+
+SUPPORTED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".pdf")
+
+
+def is_supported(name):
+    return name.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def content_hash(content: bytes):
+    return hashlib.sha256(content).hexdigest()
+
+
+# ================= LOAD =================
+
+def load_document(name, content: bytes):
+    """
+    Turns file bytes into (image, extraction context, note).
+    PDFs go through pdf_processor.prepare_pdf (text layer or adaptive DPI).
+    """
+    if name.lower().endswith(".pdf"):
+        from pdf_processor import prepare_pdf
+        page = prepare_pdf(content)
+        context = {}
+        if page["text"]:
+            context["pdf_text"] = page["text"]
+            note = "Digital PDF: read from the embedded text layer, OCR skipped"
+        else:
+            if page["ocr"]:
+                context["page_ocr"] = page["ocr"]
+            note = f"Scanned PDF: rasterized at {page['dpi']} DPI"
+        return page["image"], context, note
+
+    from PIL import Image
+    image = Image.open(io.BytesIO(content))
+    image.load()
+    return image, {}, None
+
+
+# ================= EXTRACT =================
+
+@timed("upload", step="extract")
+def extract_document(name, content: bytes, api_key=None, min_confidence=DEFAULT_MIN_CONFIDENCE):
+    """
+    Runs the extraction router on one file.
+    Returns {"name", "status": "extracted" | "failed", "data", "items",
+    "backend", "confidence", "failed", "note", "error", "elapsed_ms"}.
+    The result holds no images, so it can be returned from worker processes.
+    """
+    started = time.perf_counter()
+    result = {"name": name, "status": "failed", "data": None, "items": [], "backend": None,
+              "confidence": None, "failed": [], "note": None, "error": None}
+    try:
+        image, context, note = load_document(name, content)
+        extraction = ExtractionRouter.default(api_key, min_confidence).extract(image, context)
+    except Exception as e:
+        result["error"] = str(e)
+    else:
+        result.update({
+            "status": "extracted",
+            "data": extraction["data"],
+            "items": extraction["items"],
+            "backend": extraction["backend"],
+            "confidence": extraction["confidence"],
+            "failed": extraction["failed"],
+            "note": note,
+        })
+    result["elapsed_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+# ================= STORE =================
+
+def store_source_file(name, content: bytes):
+    """
+    Writes the original file under SOURCE_DIR by content hash.
+    Returns (sha256, path); an existing copy is not rewritten.
+    """
+    sha = content_hash(content)
+    ext = os.path.splitext(name)[1].lower() or ".bin"
+    folder = os.path.join(SOURCE_DIR, sha[:2])
+    path = os.path.join(folder, sha + ext)
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+    return sha, path
+
+
+def record_source(name, content: bytes, bill_id, backend=None, confidence=None):
+    """
+    Keeps the original file of a saved receipt for later reprocessing.
+    """
+    sha, path = store_source_file(name, content)
+    save_receipt_source(sha, bill_id, name, path, backend, EXTRACTOR_VERSION, confidence)
+    return sha
+
+
+@timed("upload", step="save")
+def save_extraction(result, content: bytes):
+    """
+    Validates and saves an extracted receipt (saved even if validation
+    fails, as in the Upload tab) and records its source file.
+    Updates and returns `result` with status "saved" or "duplicate" and
+    the validation report.
+    """
+    if result["status"] != "extracted":
+        return result
+
+    data = result["data"]
+    if receipt_exists(data["bill_id"]):
+        result["status"] = "duplicate"
+        return result
+
+    validation = validate_receipt(data, skip_duplicate=True)
+    save_receipt(data)
+    record_source(result["name"], content, data["bill_id"], result["backend"], result["confidence"])
+
+    result["status"] = "saved"
+    result["validation"] = validation
+    return result
+
+
+def process_document(name, content: bytes, api_key=None):
+    """
+    Extract + save in one call. Files already ingested (same content hash)
+    are reported as duplicates without re-running extraction.
+    """
+    if source_exists(content_hash(content)):
+        return {"name": name, "status": "duplicate", "error": None, "elapsed_ms": 0.0}
+    return save_extraction(extract_document(name, content, api_key), content)
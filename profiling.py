@@ -0,0 +1,197 @@
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from logger import LOG_DIR, log_info, log_warning
+
+# Opt-in profiling of a Streamlit rerun (per tab) or a CLI batch.
+#   RECEIPT_PROFILE=1 streamlit run app.py      (or the Settings toggle)
+#   python cli.py ingest ./scans --workers 1 --profile
+#
+# Each profiled section runs under cProfile (exact per-function times)
+# and a stack sampler (wall-clock stacks, including time spent waiting
+# on OCR / HTTP). Files land in logs/profiles/ (newest MAX_PROFILE_FILES kept):
+#   <stamp>_<pid>-<n>_<section>.prof     pstats / snakeviz
+#   <stamp>_<pid>-<n>_<section>.folded   flamegraph.pl, speedscope, inferno
+
+PROFILE_ENV = "RECEIPT_PROFILE"
+PROFILE_DIR = os.path.join(LOG_DIR, "profiles")
+SAMPLE_INTERVAL = 0.005        # seconds between stack samples
+TOP_FUNCTIONS = 25
+MAX_PROFILE_FILES = 200        # .prof + .folded files kept, oldest removed first
+
+# section -> breakdown of its latest profiled run (shown in Diagnostics)
+LAST_PROFILES = {}
+_LOCK = threading.Lock()
+_ACTIVE = threading.local()    # cProfile cannot nest; inner sections only time themselves
+_SEQ = itertools.count()       # Streamlit sessions share one pid; keeps file stems unique
+
+
+def profiling_enabled(toggle=False):
+    """
+    True when the Settings toggle is on or RECEIPT_PROFILE is set.
+    """
+    return bool(toggle) or os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes", "on")
+
+
+# ================= SAMPLER =================
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack from a background thread and
+    counts identical stacks, i.e. the folded format flamegraphs use.
+    """
+
+    def __init__(self, thread_id, root, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.ident is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                labels.append(self.root)
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# ================= REPORT =================
+
+def top_functions(profile, limit=TOP_FUNCTIONS):
+    """
+    Per-function rows from a cProfile run, by cumulative time.
+    """
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (cc, nc, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": name,
+            "location": f"{os.path.basename(filename)}:{line}",
+            "calls": nc,
+            "own_ms": round(tottime * 1000, 2),
+            "cumulative_ms": round(cumtime * 1000, 2),
+        })
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows[:limit]
+
+
+def _safe_name(section):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "-", section).strip("-") or "section"
+
+
+def _prune():
+    """
+    Removes the oldest profile files beyond MAX_PROFILE_FILES.
+    """
+    try:
+        entries = [e for e in os.scandir(PROFILE_DIR)
+                   if e.is_file() and e.name.endswith((".prof", ".folded"))]
+        entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    except OSError:
+        return
+    for entry in entries[MAX_PROFILE_FILES:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass    # already removed by another process
+
+
+def _save(section, profile, sampler, wall_ms):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+    stem = os.path.join(PROFILE_DIR, f"{stamp}_{os.getpid()}-{next(_SEQ)}_{_safe_name(section)}")
+    profile.dump_stats(stem + ".prof")
+    with open(stem + ".folded", "w", encoding="utf-8") as f:
+        f.write(sampler.folded())
+    _prune()
+
+    result = {
+        "section": section,
+        "wall_ms": round(wall_ms, 1),
+        "samples": sum(sampler.stacks.values()),
+        "top": top_functions(profile),
+        "files": [stem + ".prof", stem + ".folded"],
+        "finished_at": time.time(),
+    }
+    with _LOCK:
+        LAST_PROFILES[section] = result
+    log_info(f"profiling: {section} took {wall_ms:.0f} ms", section=section,
+             duration_ms=round(wall_ms, 1), profile=stem + ".prof")
+    return result
+
+
+# ================= ENTRY POINT =================
+
+@contextmanager
+def profile_section(section, enabled=None):
+    """
+    Profiles the block when `enabled` (default: RECEIPT_PROFILE) and saves
+    .prof and .folded files for it. A no-op when profiling is off.
+    """
+    if enabled is None:
+        enabled = profiling_enabled()
+    if not enabled or getattr(_ACTIVE, "section", None) is not None:
+        yield
+        return
+
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError as e:
+        # Python 3.12+: another profiler or sys.monitoring tool (debugger,
+        # coverage) owns this thread; run the block unprofiled
+        log_warning(f"profiling: {section} not profiled: {e}", section=section)
+        yield
+        return
+
+    sampler = StackSampler(threading.get_ident(), section)
+    _ACTIVE.section = section
+    started = time.perf_counter()
+    try:
+        sampler.start()
+        yield
+    finally:
+        profile.disable()
+        sampler.stop()
+        _ACTIVE.section = None
+        try:
+            _save(section, profile, sampler, (time.perf_counter() - started) * 1000)
+        except OSError as e:
+            log_warning(f"profiling: could not save {section} profile: {e}", section=section)
+
+
+def last_profiles():
+    with _LOCK:
+        return dict(LAST_PROFILES)
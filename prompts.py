@@ -34,8 +34,8 @@ Please format your response in Markdown with the following sections:
 - Highlight the top vendor and category.
 
 ### ⚠️ Anomalies & Alerts
-- Detect any unusually high transactions or outliers.
-- Point out if tax seems disproportionately high for any vendor.
+- Explain the findings listed under "Precomputed Anomalies" (outliers, unusual tax ratios, possible duplicates).
+- Do not search for further outliers yourself; if none are listed, say no anomalies were found.
 
 ### 📉 Savings Recommendations
 - Suggest 1-2 concrete ways to save money based on the data (e.g., "Cutting down on [Category] could save you $X/month").
@@ -57,5 +57,7 @@ If the answer is not in the data, say so.
 Context Data:
 {context}
 
+{history}
+
 User Question: {question}
 """
\ No newline at end of file
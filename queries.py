@@ -1,13 +1,23 @@
+import hashlib
+import json
+import sqlite3
+import time
 from database.db import get_db
+from money import to_cents, from_cents
+from metrics import timed
+from data_version import get_data_version, bump_data_version as _bump_data_version
+from rolling_stats import record_saved_receipt
 
 
 # ================= SAVE RECEIPT =================
+@timed("db", op="save_receipt")
 def save_receipt(data):
     """
     Save receipt to database.
     Assumes data = {
         bill_id, vendor, date, amount, tax, subtotal
     }
+    Amounts are stored as integer paise (*_cents) plus REAL mirrors.
     """
     db = get_db()
     
@@ -19,25 +29,38 @@ def save_receipt(data):
     if "category" not in data:
         data["category"] = "Uncategorized"
 
+    amount_cents = to_cents(data["amount"])
+    tax_cents = to_cents(data["tax"])
+    subtotal_cents = to_cents(data["subtotal"])
+
     db.execute(
         """
-        INSERT INTO receipts (bill_id, vendor, date, amount, tax, subtotal, category)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO receipts (bill_id, vendor, date, amount, tax, subtotal, category,
+                              amount_cents, tax_cents, subtotal_cents)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """,
         (
             data["bill_id"],
             data["vendor"],
             data["date"],
-            float(data["amount"]),
-            float(data["tax"]),
-            float(data["subtotal"]),
+            from_cents(amount_cents),
+            from_cents(tax_cents),
+            from_cents(subtotal_cents),
             data["category"],
+            amount_cents,
+            tax_cents,
+            subtotal_cents,
         ),
     )
+    _bump_data_version(db)
     db.commit()
 
+    # Keep the in-process rolling statistics current without a full reload
+    record_saved_receipt(data, get_data_version())
+
 
 # ================= DUPLICATE CHECK =================
+@timed("db", op="receipt_exists")
 def receipt_exists(bill_id):
     db = get_db()
     cur = db.execute(
@@ -47,7 +70,29 @@ def receipt_exists(bill_id):
     return cur.fetchone() is not None
 
 
+# ================= FETCH ONE RECEIPT =================
+@timed("db", op="fetch_receipt")
+def fetch_receipt(bill_id):
+    db = get_db()
+    r = db.execute(
+        "SELECT bill_id, vendor, date, amount_cents, tax_cents, subtotal_cents, category FROM receipts WHERE bill_id = ?",
+        (bill_id,)
+    ).fetchone()
+    if r is None:
+        return None
+    return {
+        "bill_id": r["bill_id"],
+        "vendor": r["vendor"],
+        "date": r["date"],
+        "amount": from_cents(r["amount_cents"] or 0),
+        "tax": from_cents(r["tax_cents"] or 0),
+        "subtotal": from_cents(r["subtotal_cents"] or 0),
+        "category": r["category"] or "Uncategorized",
+    }
+
+
 # ================= FETCH ALL RECEIPTS =================
+@timed("db", op="fetch_all_receipts")
 def fetch_all_receipts():
     """
     Returns list of dicts:
@@ -58,15 +103,17 @@ def fetch_all_receipts():
     """
     db = get_db()
     
-    # Handle case where subtotal/category might be missing in older schemas (though init_db fixes it)
+    # Handle case where subtotal/category/cents might be missing in older schemas (though init_db fixes it)
     try:
         cur = db.execute(
-            "SELECT bill_id, vendor, date, amount, tax, subtotal, category FROM receipts ORDER BY date DESC"
+            "SELECT bill_id, vendor, date, amount_cents, tax_cents, subtotal_cents, category FROM receipts ORDER BY date DESC"
         )
     except:
         # Fallback for code running before migration (unlikely but safe)
         cur = db.execute(
-            "SELECT bill_id, vendor, date, amount, tax, 0.0 as subtotal, 'Uncategorized' as category FROM receipts ORDER BY date DESC"
+            "SELECT bill_id, vendor, date, CAST(ROUND(amount * 100) AS INTEGER) as amount_cents, "
+            "CAST(ROUND(tax * 100) AS INTEGER) as tax_cents, 0 as subtotal_cents, "
+            "'Uncategorized' as category FROM receipts ORDER BY date DESC"
         )
 
     rows = cur.fetchall()
@@ -76,22 +123,240 @@ def fetch_all_receipts():
             "bill_id": r["bill_id"],
             "vendor": r["vendor"],
             "date": r["date"],
-            "amount": float(r["amount"]),
-            "tax": float(r["tax"]),
-            "subtotal": float(r["subtotal"]) if ("subtotal" in r.keys() and r["subtotal"] is not None) else 0.0,
+            "amount": from_cents(r["amount_cents"] or 0),
+            "tax": from_cents(r["tax_cents"] or 0),
+            "subtotal": from_cents(r["subtotal_cents"] or 0),
             "category": r["category"] if ("category" in r.keys() and r["category"]) else "Uncategorized",
         }
         for r in rows
     ]
 
 
+# ================= FILTERED QUERIES (API) =================
+def _receipt_filters(vendor=None, category=None, start=None, end=None, min_amount=None, max_amount=None):
+    """
+    WHERE clause + params for the common receipt filters.
+    Dates are ISO strings (inclusive); amounts are compared in paise.
+    """
+    where, params = [], []
+    if vendor:
+        where.append("vendor = ?")
+        params.append(vendor)
+    if category:
+        where.append("category = ?")
+        params.append(category)
+    if start:
+        where.append("date >= ?")
+        params.append(start)
+    if end:
+        where.append("date <= ?")
+        params.append(end)
+    if min_amount is not None:
+        where.append("amount_cents >= ?")
+        params.append(to_cents(min_amount))
+    if max_amount is not None:
+        where.append("amount_cents <= ?")
+        params.append(to_cents(max_amount))
+    return (" WHERE " + " AND ".join(where)) if where else "", params
+
+
+@timed("db", op="count_receipts")
+def count_receipts(**filters):
+    where, params = _receipt_filters(**filters)
+    return get_db().execute(f"SELECT COUNT(*) FROM receipts{where}", params).fetchone()[0]
+
+
+def iter_receipts(limit=None, offset=0, chunk_size=500, **filters):
+    """
+    Yields filtered receipts (newest first) without loading the whole
+    result set: rows are fetched from the cursor `chunk_size` at a time.
+    """
+    where, params = _receipt_filters(**filters)
+    sql = (
+        "SELECT bill_id, vendor, date, amount_cents, tax_cents, subtotal_cents, category "
+        f"FROM receipts{where} ORDER BY date DESC, bill_id LIMIT ? OFFSET ?"
+    )
+    cur = get_db().execute(sql, params + [-1 if limit is None else limit, offset])
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        for r in rows:
+            yield {
+                "bill_id": r["bill_id"],
+                "vendor": r["vendor"],
+                "date": r["date"],
+                "amount": from_cents(r["amount_cents"] or 0),
+                "tax": from_cents(r["tax_cents"] or 0),
+                "subtotal": from_cents(r["subtotal_cents"] or 0),
+                "category": r["category"] or "Uncategorized",
+            }
+
+
+@timed("db", op="receipt_summary")
+def receipt_summary(**filters):
+    where, params = _receipt_filters(**filters)
+    r = get_db().execute(
+        "SELECT COUNT(*) AS n, COALESCE(SUM(amount_cents), 0) AS total, COALESCE(SUM(tax_cents), 0) AS tax, "
+        f"MIN(date) AS first_date, MAX(date) AS last_date FROM receipts{where}",
+        params
+    ).fetchone()
+    return {
+        "receipts": r["n"],
+        "total_spend": from_cents(r["total"]),
+        "total_tax": from_cents(r["tax"]),
+        "average": from_cents(r["total"] // r["n"]) if r["n"] else 0.0,
+        "first_date": r["first_date"],
+        "last_date": r["last_date"],
+    }
+
+
+AGGREGATE_KEYS = {
+    "category": "category",
+    "vendor": "vendor",
+    "month": "substr(date, 1, 7)",
+}
+
+
+@timed("db", op="aggregate_receipts")
+def aggregate_receipts(group_by, limit=None, **filters):
+    """
+    Spend / tax / count per category, vendor or month (YYYY-MM), summed
+    in integer paise. Groups are ordered by spend, months chronologically.
+    """
+    key = AGGREGATE_KEYS[group_by]
+    where, params = _receipt_filters(**filters)
+    order = "name" if group_by == "month" else "total DESC"
+    sql = (
+        f"SELECT {key} AS name, COUNT(*) AS n, SUM(amount_cents) AS total, SUM(tax_cents) AS tax "
+        f"FROM receipts{where} GROUP BY name ORDER BY {order}"
+    )
+    if limit:
+        sql += " LIMIT ?"
+        params = params + [limit]
+    return [
+        {group_by: r["name"], "receipts": r["n"], "total_spend": from_cents(r["total"] or 0), "total_tax": from_cents(r["tax"] or 0)}
+        for r in get_db().execute(sql, params).fetchall()
+    ]
+
+
+# ================= REPLACE RECEIPT =================
+@timed("db", op="replace_receipt")
+def replace_receipt(old_bill_id, data):
+    """
+    Replaces a stored receipt with re-extracted data in one transaction
+    (the bill id itself may change). Raises sqlite3.IntegrityError, with
+    nothing changed, if the new bill id belongs to another receipt.
+    """
+    db = get_db()
+    amount_cents = to_cents(data["amount"])
+    tax_cents = to_cents(data["tax"])
+    subtotal_cents = to_cents(data.get("subtotal", 0.0))
+
+    try:
+        db.execute("DELETE FROM receipts WHERE bill_id = ?", (old_bill_id,))
+        db.execute(
+            """
+            INSERT INTO receipts (bill_id, vendor, date, amount, tax, subtotal, category,
+                                  amount_cents, tax_cents, subtotal_cents)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                data["bill_id"],
+                data["vendor"],
+                data["date"],
+                from_cents(amount_cents),
+                from_cents(tax_cents),
+                from_cents(subtotal_cents),
+                data.get("category", "Uncategorized"),
+                amount_cents,
+                tax_cents,
+                subtotal_cents,
+            ),
+        )
+    except sqlite3.IntegrityError:
+        db.rollback()
+        raise
+    db.execute("UPDATE receipt_sources SET bill_id = ? WHERE bill_id = ?", (data["bill_id"], old_bill_id))
+    _bump_data_version(db)
+    db.commit()
+
+
+# ================= SOURCE FILES =================
+def receipt_fingerprint(receipt):
+    """
+    Hash of a stored receipt (as returned by fetch_receipt); changes when
+    any field is edited.
+    """
+    if receipt is None:
+        return None
+    return hashlib.sha256(json.dumps(receipt, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def save_receipt_source(sha256, bill_id, filename, path, backend=None, extractor_version=0, confidence=None):
+    """
+    Records the original file a receipt was extracted from, with the
+    fingerprint of the receipt as it is stored now.
+    """
+    fingerprint = receipt_fingerprint(fetch_receipt(bill_id)) if bill_id else None
+    db = get_db()
+    db.execute(
+        """
+        INSERT OR REPLACE INTO receipt_sources
+            (sha256, bill_id, filename, path, backend, extractor_version, confidence, created_at, fingerprint)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (sha256, bill_id, filename, path, backend, extractor_version, confidence, time.time(), fingerprint),
+    )
+    db.commit()
+
+
+def receipt_edited(source):
+    """
+    True when the receipt of a receipt_sources row no longer matches the
+    fingerprint recorded when it was saved (rows from before fingerprints
+    were recorded count as unedited).
+    """
+    if not source.get("fingerprint") or not source.get("bill_id"):
+        return False
+    return receipt_fingerprint(fetch_receipt(source["bill_id"])) != source["fingerprint"]
+
+
+@timed("db", op="source_exists")
+def source_exists(sha256):
+    db = get_db()
+    try:
+        cur = db.execute("SELECT 1 FROM receipt_sources WHERE sha256 = ?", (sha256,))
+    except sqlite3.OperationalError:
+        return False
+    return cur.fetchone() is not None
+
+
+def fetch_receipt_sources(below_version=None):
+    """
+    Stored source files, optionally only those extracted by an older
+    extractor version.
+    """
+    db = get_db()
+    if below_version is None:
+        cur = db.execute("SELECT * FROM receipt_sources ORDER BY created_at")
+    else:
+        cur = db.execute(
+            "SELECT * FROM receipt_sources WHERE extractor_version < ? ORDER BY created_at",
+            (below_version,)
+        )
+    return [dict(r) for r in cur.fetchall()]
+
+
 # ================= DELETE ONE RECEIPT =================
+@timed("db", op="delete_receipt")
 def delete_receipt(bill_id):
     db = get_db()
     db.execute(
         "DELETE FROM receipts WHERE bill_id = ?",
         (bill_id,)
     )
+    _bump_data_version(db)
     db.commit()
 
 
@@ -99,4 +364,5 @@ def delete_receipt(bill_id):
 def clear_all_receipts():
     db = get_db()
     db.execute("DELETE FROM receipts")
+    _bump_data_version(db)
     db.commit()
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Compact, typed in-memory view of the receipts table.
+
+fetch_all_receipts() returns one dict per row, and every UI turned that into
+a DataFrame of object columns (a full Python str per vendor, category,
+bill_id and date) and re-parsed the dates on each rerun. This loader builds
+the frame once per data version with column types sized for the data:
+
+    column      before (object)          after
+    ---------   ----------------------   --------------------------------
+    vendor      ~60 B/row (str + ptr)    category: 1-2 B/row + one copy
+    category    ~60 B/row                  of each distinct value
+    bill_id     ~60 B/row                string[pyarrow]: ~15 B/row
+    date        ~60 B/row (str)          datetime64[ns]: 8 B/row, no re-parse
+    amounts     8 B/row                  int64 *_cents: 8 B/row, plus a
+                                         float64 display copy: 8 B/row
+
+which is roughly 4-6x less memory per receipt (use frame_memory_report to
+measure it on a real vault). The integer amount_cents / tax_cents /
+subtotal_cents columns are what totals and group sums run on: int64 sums
+are exact at any row count. amount / tax / subtotal are float64 copies in
+rupees for tables and charts only (float32 would already drop paise above
+1,00,000); convert aggregated cents with money.from_cents for display.
+
+The frame is shared by every session in the process and must be treated
+as read-only; filter / sort into new frames instead of mutating it.
+"""
+import threading
+
+import pandas as pd
+
+from database.db import get_db
+from queries import get_data_version
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:
+    STRING_DTYPE = "string"
+
+# Integer paise columns; hidden from tables and CSV exports, which show the
+# rupee columns instead
+CENTS_COLUMNS = ["amount_cents", "tax_cents", "subtotal_cents"]
+
+_CACHE = {"version": None, "frame": None}
+_LOCK = threading.Lock()
+
+
+def _parse_dates(raw):
+    """
+    Parses ISO dates with a fixed format (fast path), falling back to
+    pandas' generic parser only for the rows that did not match.
+    """
+    raw = pd.Series(raw, dtype=object)
+    dates = pd.to_datetime(raw, format="%Y-%m-%d", errors="coerce")
+    bad = dates.isna() & raw.notna()
+    if bad.any():
+        dates[bad] = pd.to_datetime(raw[bad], errors="coerce")
+    return dates
+
+
+def _cents_column(cents):
+    """
+    Integer paise column -> int64 (NULLs become 0).
+    """
+    return pd.Series(cents, dtype="Int64").fillna(0).astype("int64")
+
+
+def build_receipts_frame(rows):
+    """
+    Builds the typed frame from rows of
+    (bill_id, vendor, date, amount_cents, tax_cents, subtotal_cents, category).
+    """
+    if not rows:
+        return pd.DataFrame({
+            "bill_id": pd.Series(dtype=STRING_DTYPE),
+            "vendor": pd.Categorical([]),
+            "date": pd.Series(dtype="datetime64[ns]"),
+            "amount": pd.Series(dtype="float64"),
+            "tax": pd.Series(dtype="float64"),
+            "subtotal": pd.Series(dtype="float64"),
+            "category": pd.Categorical([]),
+            **{col: pd.Series(dtype="int64") for col in CENTS_COLUMNS},
+        })
+
+    bill_id, vendor, date, amount, tax, subtotal, category = zip(*rows)
+    amount, tax, subtotal = _cents_column(amount), _cents_column(tax), _cents_column(subtotal)
+    return pd.DataFrame({
+        "bill_id": pd.array(bill_id, dtype=STRING_DTYPE),
+        "vendor": pd.Categorical(vendor),
+        "date": _parse_dates(date),
+        "amount": amount / 100,
+        "tax": tax / 100,
+        "subtotal": subtotal / 100,
+        "category": pd.Categorical([c or "Uncategorized" for c in category]),
+        "amount_cents": amount,
+        "tax_cents": tax,
+        "subtotal_cents": subtotal,
+    })
+
+
+def load_receipts_frame():
+    """
+    Returns all receipts as a typed DataFrame, newest first.
+    Reloaded from SQLite only when the vault data version changes.
+    """
+    version = get_data_version()
+    with _LOCK:
+        if _CACHE["frame"] is not None and _CACHE["version"] == version:
+            return _CACHE["frame"]
+
+        rows = get_db().execute(
+            "SELECT bill_id, vendor, date, amount_cents, tax_cents, subtotal_cents, category "
+            "FROM receipts ORDER BY date DESC"
+        ).fetchall()
+        frame = build_receipts_frame([tuple(r) for r in rows])
+
+        _CACHE["version"] = version
+        _CACHE["frame"] = frame
+        return frame
+
+
+def frame_memory_report(frame):
+    """
+    Compares the typed frame's memory with the equivalent all-object frame
+    the UIs used to build from fetch_all_receipts().
+    """
+    typed = int(frame.memory_usage(deep=True).sum())
+    as_objects = frame.copy()
+    for col in ["bill_id", "vendor", "category"]:
+        as_objects[col] = frame[col].astype(object)
+    as_objects["date"] = frame["date"].dt.strftime("%Y-%m-%d")
+    untyped = int(as_objects.memory_usage(deep=True).sum())
+    return {
+        "rows": len(frame),
+        "typed_bytes": typed,
+        "object_bytes": untyped,
+        "savings_ratio": (untyped / typed) if typed else 0.0,
+    }
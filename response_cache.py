@@ -0,0 +1,103 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+
+from database.db import get_db
+
+# ================= CACHE SETTINGS =================
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+MAX_ENTRIES = 500
+
+CACHE_STATS = {"hits": 0, "misses": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def normalize_prompt(text):
+    """
+    Collapses whitespace so formatting-only differences share a cache entry.
+    """
+    return re.sub(r"\s+", " ", str(text)).strip()
+
+
+def normalize_question(text):
+    """
+    Stricter normalization for user questions: case, whitespace and
+    trailing punctuation do not change the answer.
+    """
+    return normalize_prompt(text).lower().rstrip("?!. ")
+
+
+def cache_key(data_version, prompt, model):
+    raw = f"{data_version}\x1f{model}\x1f{normalize_prompt(prompt)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _count(hit):
+    with _STATS_LOCK:
+        CACHE_STATS["hits" if hit else "misses"] += 1
+
+
+def get_cached(data_version, prompt, model, ttl=DEFAULT_TTL_SECONDS):
+    """
+    Returns the cached response for (data version, prompt, model), or None
+    if missing or older than `ttl` seconds.
+    """
+    key = cache_key(data_version, prompt, model)
+    db = get_db()
+    try:
+        row = db.execute(
+            "SELECT response, created_at FROM ai_response_cache WHERE key = ?",
+            (key,)
+        ).fetchone()
+    except sqlite3.OperationalError:
+        _count(False)
+        return None
+
+    if row is None or time.time() - row["created_at"] > ttl:
+        _count(False)
+        return None
+
+    db.execute(
+        "UPDATE ai_response_cache SET last_access = ?, hits = hits + 1 WHERE key = ?",
+        (time.time(), key)
+    )
+    db.commit()
+    _count(True)
+    return row["response"]
+
+
+def put_cached(data_version, prompt, model, response, ttl=DEFAULT_TTL_SECONDS, max_entries=MAX_ENTRIES):
+    """
+    Stores a response and evicts expired entries, then the least recently
+    used ones beyond `max_entries`.
+    """
+    now = time.time()
+    db = get_db()
+    try:
+        db.execute(
+            """
+            INSERT OR REPLACE INTO ai_response_cache (key, model, data_version, response, created_at, last_access, hits)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+            """,
+            (cache_key(data_version, prompt, model), model, data_version, response, now, now)
+        )
+        db.execute("DELETE FROM ai_response_cache WHERE created_at < ?", (now - ttl,))
+        db.execute(
+            """
+            DELETE FROM ai_response_cache WHERE key NOT IN (
+                SELECT key FROM ai_response_cache ORDER BY last_access DESC LIMIT ?
+            )
+            """,
+            (max_entries,)
+        )
+        db.commit()
+    except sqlite3.OperationalError:
+        pass
+
+
+def clear_cache():
+    db = get_db()
+    db.execute("DELETE FROM ai_response_cache")
+    db.commit()
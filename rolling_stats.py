@@ -0,0 +1,268 @@
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from database.db import get_db
+from data_version import get_data_version
+
+DEFAULT_WINDOWS = (7, 30, 90)
+
+
+class RollingSpendStats:
+    """
+    Incremental daily spend buckets with ring-buffer trailing windows.
+
+    Receipts are folded into one bucket per day as they arrive. For every
+    window (7/30/90 days by default) a ring buffer holds the last N daily
+    totals together with a running sum and sum of squares, so the current
+    mean / sum / variance of a window is read without touching history.
+    Full moving-average series are derived from a cached cumulative sum,
+    so charts never need to sort or resample the receipts again.
+    """
+
+    def __init__(self, windows=DEFAULT_WINDOWS):
+        self.windows = tuple(sorted(set(windows)))
+        self.start = None              # date of bucket 0
+        self.data_version = None       # vault version these stats reflect
+        self._daily = np.zeros(0)
+        self._len = 0
+        self._cumsum = None
+        self._rings = {}
+        self._reset_rings()
+
+    # ---------- BUILD ----------
+
+    @classmethod
+    def from_daily_totals(cls, dates, amounts, windows=DEFAULT_WINDOWS):
+        """
+        Builds stats from per-day totals (dates may be unsorted / repeated).
+        """
+        stats = cls(windows)
+        dates = pd.to_datetime(pd.Series(dates), errors="coerce")
+        amounts = pd.to_numeric(pd.Series(amounts), errors="coerce").fillna(0.0)
+        valid = dates.notna()
+        if not valid.any():
+            return stats
+
+        days = dates[valid].dt.normalize()
+        stats.start = days.min().date()
+        offsets = (days - days.min()).dt.days.to_numpy()
+        stats._len = int(offsets.max()) + 1
+        stats._daily = np.zeros(max(stats._len, 16))
+        np.add.at(stats._daily, offsets, amounts[valid].to_numpy(dtype=float))
+        stats._rebuild_rings()
+        return stats
+
+    def _reset_rings(self):
+        self._rings = {
+            w: {"buf": np.zeros(w), "sum": 0.0, "sumsq": 0.0}
+            for w in self.windows
+        }
+
+    def _rebuild_rings(self):
+        """
+        Recomputes every ring buffer from the bucket array (O(sum of windows)).
+        """
+        self._reset_rings()
+        for w, ring in self._rings.items():
+            tail = self._daily[max(0, self._len - w):self._len]
+            # Slot of day i is i % w, so the tail lands in the right positions
+            for i, value in enumerate(tail, start=max(0, self._len - w)):
+                ring["buf"][i % w] = value
+            ring["sum"] = float(tail.sum())
+            ring["sumsq"] = float(np.square(tail).sum())
+        self._cumsum = None
+
+    # ---------- INCREMENTAL UPDATES ----------
+
+    def add(self, day, amount):
+        """
+        Adds one receipt amount on `day` (a date, datetime or 'YYYY-MM-DD').
+        """
+        ts = pd.to_datetime(day, errors="coerce")
+        if pd.isna(ts):
+            return
+        day = ts.date()
+        amount = float(amount)
+
+        if self.start is None:
+            self.start = day
+        if day < self.start:
+            self._prepend(day)
+
+        idx = (day - self.start).days
+        if idx >= self._len:
+            self._advance_to(idx)
+
+        self._daily[idx] += amount
+        last = self._len - 1
+        for w, ring in self._rings.items():
+            if last - idx < w:
+                slot = idx % w
+                old = ring["buf"][slot]
+                new = old + amount
+                ring["buf"][slot] = new
+                ring["sum"] += amount
+                ring["sumsq"] += new * new - old * old
+        self._cumsum = None
+
+    def _advance_to(self, idx):
+        """
+        Extends the bucket array to day `idx`, evicting expired ring slots.
+        """
+        if idx >= len(self._daily):
+            grown = np.zeros(max(idx + 1, 2 * len(self._daily), 16))
+            grown[:self._len] = self._daily[:self._len]
+            self._daily = grown
+
+        gap = idx - (self._len - 1)
+        for w, ring in self._rings.items():
+            if gap >= w:
+                ring["buf"][:] = 0.0
+                ring["sum"] = ring["sumsq"] = 0.0
+                continue
+            for day_idx in range(self._len, idx + 1):
+                slot = day_idx % w
+                old = ring["buf"][slot]
+                ring["sum"] -= old
+                ring["sumsq"] -= old * old
+                ring["buf"][slot] = 0.0
+        self._len = idx + 1
+
+    def _prepend(self, day):
+        """
+        Moves the origin back to `day` (rare: receipt older than all history).
+        """
+        shift = (self.start - day).days
+        grown = np.zeros(max(self._len + shift, 16))
+        grown[shift:shift + self._len] = self._daily[:self._len]
+        self._daily = grown
+        self._len += shift
+        self.start = day
+        self._rebuild_rings()
+
+    # ---------- QUERIES ----------
+
+    def window_stats(self, window, start=None, end=None):
+        """
+        Returns sum / mean / variance / std of the trailing `window` days.
+        With `end` the window ends on that day instead of the last one, and
+        with `start` it is clipped so it never reaches before that day;
+        `days` is the number of days actually covered.
+        """
+        ring = self._rings.get(window)
+        if ring is not None and start is None and (end is None or self._after_last(end)):
+            days, total, sumsq = window, ring["sum"], ring["sumsq"]
+        else:
+            hi = self._len if end is None else max(0, min(self._len, self._offset(end) + 1))
+            lo = hi - window           # days before the first receipt count as zero spend
+            if start is not None:
+                lo = max(lo, self._offset(start))
+            days = max(0, hi - lo)
+            tail = self._daily[max(0, lo):hi]
+            total, sumsq = float(tail.sum()), float(np.square(tail).sum())
+
+        mean = total / days if days else 0.0
+        variance = max(0.0, sumsq / days - mean * mean) if days else 0.0
+        return {
+            "window": window,
+            "days": days,
+            "sum": total,
+            "mean": mean,
+            "variance": variance,
+            "std": variance ** 0.5,
+        }
+
+    def _offset(self, day):
+        """
+        Bucket index of `day` (may be negative or past the last bucket).
+        """
+        if self.start is None:
+            return 0
+        return (pd.Timestamp(day).normalize() - pd.Timestamp(self.start)).days
+
+    def _after_last(self, day):
+        return self.start is None or self._offset(day) >= self._len - 1
+
+    def daily_series(self, start=None, end=None):
+        """
+        Daily totals as a Series indexed by date, optionally clipped to [start, end].
+        """
+        if self.start is None:
+            return pd.Series(dtype=float)
+        index = pd.date_range(self.start, periods=self._len, freq="D")
+        series = pd.Series(self._daily[:self._len].copy(), index=index)
+        return _clip(series, start, end)
+
+    def moving_average(self, window, start=None, end=None):
+        """
+        Trailing moving average of daily spend, optionally clipped to [start, end].
+        Days with less than `window` days of history are NaN, matching
+        pandas rolling(window).mean().
+        """
+        if self.start is None:
+            return pd.Series(dtype=float)
+        if self._cumsum is None:
+            self._cumsum = np.concatenate(([0.0], np.cumsum(self._daily[:self._len])))
+
+        ma = np.full(self._len, np.nan)
+        if self._len >= window:
+            ma[window - 1:] = (self._cumsum[window:] - self._cumsum[:-window]) / window
+        index = pd.date_range(self.start, periods=self._len, freq="D")
+        return _clip(pd.Series(ma, index=index), start, end)
+
+    @property
+    def last_day(self):
+        if self.start is None:
+            return None
+        return self.start + timedelta(days=self._len - 1)
+
+
+def _clip(series, start, end):
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    return series.loc[start:end]
+
+
+# ================= SHARED INSTANCE =================
+_STATS = None
+_LOCK = threading.Lock()
+
+
+def _load_from_db():
+    rows = get_db().execute(
+        "SELECT date, SUM(amount_cents) / 100.0 AS amount FROM receipts GROUP BY date"
+    ).fetchall()
+    return RollingSpendStats.from_daily_totals(
+        [r["date"] for r in rows],
+        [r["amount"] for r in rows],
+    )
+
+
+def get_rolling_stats():
+    """
+    Returns the process-wide stats, rebuilding them only when the vault
+    data version moved without going through record_saved_receipt
+    (deletes, clears, writes from another process).
+    """
+    global _STATS
+    version = get_data_version()
+    with _LOCK:
+        if _STATS is None or _STATS.data_version != version:
+            _STATS = _load_from_db()
+            _STATS.data_version = version
+        return _STATS
+
+
+def record_saved_receipt(data, new_version):
+    """
+    Folds a just-saved receipt into the shared stats. Called by save_receipt.
+    If the stats are missing or stale they are left for get_rolling_stats to rebuild.
+    """
+    with _LOCK:
+        if _STATS is None or _STATS.data_version != new_version - 1:
+            return
+        _STATS.add(data["date"], data["amount"])
+        _STATS.data_version = new_version
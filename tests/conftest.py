@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Modules import the connection helper as database.db; in this flat layout
+# it lives in db.py
+import db  # noqa: E402
+
+sys.modules.setdefault("database.db", db)
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """
+    Fresh SQLite vault in a temp dir, schema created by init_db().
+    """
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "receipts.db"))
+    db.init_db()
+    return db
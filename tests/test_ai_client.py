@@ -0,0 +1,228 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+import ai_client  # noqa: E402
+
+
+class StubOllama:
+    """
+    Local stand-in for /api/generate: upper-cases every "store" in the
+    DATA section of the prompt. `fail` answers 500, `delay` stalls each
+    reply and `wrong_length` drops one element from array replies.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.prompts = []
+        self.fail = False
+        self.delay = 0.0
+        self.wrong_length = False
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.calls += 1
+                    stub.prompts.append(body["prompt"])
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if stub.fail:
+                    self.send_response(500)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                payload = json.dumps({"response": json.dumps(stub.answer(body["prompt"]))}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/generate"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def answer(self, prompt):
+        data = json.loads(prompt.split("DATA:", 1)[1])
+        fix = lambda d: {**d, "store": d["store"].upper()}
+        if isinstance(data, list):
+            fixed = [fix(d) for d in data]
+            return fixed[:-1] if self.wrong_length else fixed
+        return fix(data)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    stub = StubOllama()
+    monkeypatch.setattr(ai_client, "OLLAMA_URL", stub.url)
+    monkeypatch.setattr(ai_client, "BREAKER", ai_client.CircuitBreaker(failure_threshold=3, reset_timeout=0.2))
+    monkeypatch.setattr(ai_client, "_session", None)
+    ai_client._cache.clear()
+    ai_client._inflight.clear()
+    yield stub
+    stub.close()
+    ai_client._cache.clear()
+
+
+def receipt(store="walmart", total=12.5):
+    return {"store": store, "total": total, "items": []}
+
+
+# ================= NORMALIZATION =================
+
+def test_normalize_uses_server_and_caches(ollama):
+    assert ai_client.normalize_with_ai(receipt())["store"] == "WALMART"
+    assert ai_client.normalize_with_ai(receipt())["store"] == "WALMART"
+    assert ollama.calls == 1
+
+
+def test_server_error_returns_input_or_raises(ollama):
+    ollama.fail = True
+    assert ai_client.normalize_with_ai(receipt()) == receipt()
+    with pytest.raises(Exception):
+        ai_client.normalize_with_ai(receipt("target"), raise_on_error=True)
+
+
+# ================= CIRCUIT BREAKER =================
+
+def test_breaker_opens_after_threshold(ollama):
+    ollama.fail = True
+    for i in range(3):
+        ai_client.normalize_with_ai(receipt(total=i))
+    assert ai_client.BREAKER.is_open
+    assert ollama.calls == 3
+
+    # Open: answered locally, no request reaches the server
+    assert ai_client.normalize_with_ai(receipt(total=99)) == receipt(total=99)
+    with pytest.raises(RuntimeError, match="circuit open"):
+        ai_client.normalize_with_ai(receipt(total=98), raise_on_error=True)
+    assert ollama.calls == 3
+
+
+def test_breaker_half_open_probe_closes_on_success(ollama):
+    ollama.fail = True
+    for i in range(3):
+        ai_client.normalize_with_ai(receipt(total=i))
+    assert ai_client.BREAKER.is_open
+
+    time.sleep(0.25)
+    ollama.fail = False
+    assert ai_client.normalize_with_ai(receipt(total=50))["store"] == "WALMART"
+    assert not ai_client.BREAKER.is_open
+    assert ollama.calls == 4
+
+
+def test_breaker_half_open_probe_reopens_on_failure(ollama):
+    ollama.fail = True
+    for i in range(3):
+        ai_client.normalize_with_ai(receipt(total=i))
+
+    time.sleep(0.25)
+    ai_client.normalize_with_ai(receipt(total=60))
+    assert ollama.calls == 4
+    assert ai_client.BREAKER.is_open
+
+    # Re-opened with a fresh timeout: the next call is not let through
+    ai_client.normalize_with_ai(receipt(total=61))
+    assert ollama.calls == 4
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = ai_client.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and not breaker.is_open
+
+
+# ================= COALESCING =================
+
+def test_concurrent_identical_inputs_share_one_request(ollama):
+    ollama.delay = 0.3
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(ai_client.normalize_with_ai(receipt())))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert ollama.calls == 1
+    assert len(results) == 5
+    assert all(r["store"] == "WALMART" for r in results)
+    assert not ai_client._inflight
+
+
+def test_coalesced_callers_see_the_failure(ollama):
+    ollama.fail = True
+    ollama.delay = 0.3
+    errors, results = [], []
+
+    def strict():
+        try:
+            ai_client.normalize_with_ai(receipt(), raise_on_error=True)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=strict) for _ in range(3)]
+    threads.append(threading.Thread(target=lambda: results.append(ai_client.normalize_with_ai(receipt()))))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert ollama.calls == 1
+    assert len(errors) == 3
+    assert results == [receipt()]
+
+
+# ================= BATCH =================
+
+def test_batch_sends_only_uncached_records(ollama):
+    ai_client.normalize_with_ai(receipt("costco"))
+    records = [receipt("costco"), receipt("aldi"), receipt("lidl")]
+
+    fixed = ai_client.normalize_batch_with_ai(records)
+
+    assert [r["store"] for r in fixed] == ["COSTCO", "ALDI", "LIDL"]
+    assert ollama.calls == 2
+    sent = json.loads(ollama.prompts[-1].split("DATA:", 1)[1])
+    assert [r["store"] for r in sent] == ["aldi", "lidl"]
+
+    # Batch results are cached per record
+    assert ai_client.normalize_with_ai(receipt("aldi"))["store"] == "ALDI"
+    assert ollama.calls == 2
+
+
+def test_batch_wrong_length_returns_records_unchanged(ollama):
+    ollama.wrong_length = True
+    records = [receipt("aldi"), receipt("lidl")]
+    assert ai_client.normalize_batch_with_ai(records) == records
+    assert not ai_client._cache
+
+
+def test_batch_server_down_returns_records_unchanged(ollama):
+    ollama.fail = True
+    records = [receipt("aldi"), receipt("lidl")]
+    assert ai_client.normalize_batch_with_ai(records) == records
@@ -0,0 +1,65 @@
+from datetime import date
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("pandas")
+
+from chat_context import classify_question  # noqa: E402
+
+TODAY = date(2024, 3, 20)
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("How many receipts do I have?", "count"),
+    ("What are my top vendors?", "top"),
+    ("Which store do I shop at most?", "top"),
+    ("What is my average bill?", "average"),
+    ("Show my spending trend over time", "trend"),
+    ("How much did I spend on groceries?", "total"),
+    ("Show me my transactions", "list"),
+    ("Should I stop buying coffee?", "general"),     # "top" inside "stop"
+    ("Hello there", "general"),
+])
+def test_classify_question(question, intent):
+    assert classify_question(question) == intent
+
+
+@pytest.fixture
+def vault(temp_db):
+    from queries import save_receipt
+    for bill_id, vendor, day, amount, category in [
+        ("A1", "Aldi", "2024-03-02", 10.50, "Groceries"),
+        ("A2", "Aldi", "2024-02-10", 5.25, "Groceries"),
+        ("S1", "Shell", "2024-03-05", 40.00, "Fuel"),
+    ]:
+        save_receipt({"bill_id": bill_id, "vendor": vendor, "date": day, "amount": amount,
+                      "tax": round(amount * 0.1, 2), "subtotal": amount, "category": category})
+    return temp_db
+
+
+def _answer(question):
+    from chat_planner import answer_locally
+    result = answer_locally(question, today=TODAY)
+    return result and result["answer"]
+
+
+def test_answers_simple_aggregates_locally(vault):
+    assert "₹15.75" in _answer("How much did I spend at Aldi?")
+    assert "**3**" in _answer("How many receipts do I have?")
+    assert "**Shell**" in _answer("What is my top vendor?")
+    assert "₹10.50" in _answer("How much did I spend this month at Aldi?")
+
+    top2 = _answer("top 2 vendors")
+    assert top2.index("Shell") < top2.index("Aldi")
+
+
+@pytest.mark.parametrize("question", [
+    "What is my average bill and my top vendor?",    # two competing intents
+    "Where am I spending too much?",                 # open-ended
+    "How much did I spend at Costco?",               # unknown vendor
+    "How is my spending trending per month?",        # trend
+    "Should I stop buying coffee?",                  # no intent
+])
+def test_falls_through_to_the_model(vault, question):
+    assert _answer(question) is None
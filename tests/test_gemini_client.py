@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("google.generativeai")
+
+from gemini_client import GeminiClient  # noqa: E402
+
+
+class FakeModel:
+    """
+    Stands in for genai.GenerativeModel: numbered answers, counted calls.
+    """
+    model_name = "models/fake"
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        text = f"answer {len(self.prompts)}"
+        if stream:
+            return [type("Chunk", (), {"text": text})()]
+        return type("Response", (), {"text": text})()
+
+
+@pytest.fixture
+def client(temp_db):
+    client = GeminiClient.__new__(GeminiClient)    # skip configure / list_models
+    client.model = FakeModel()
+    client.last_ttft = None
+    return client
+
+
+CONTEXT = "Spend by month: Jan 100, Feb 200"
+
+
+def test_same_question_and_history_hits_cache(client):
+    first = client.chat_with_data("What about last month?", CONTEXT, data_version=1, history="User asked about Aldi")
+    again = client.chat_with_data("what about last month", CONTEXT, data_version=1, history="User asked about Aldi")
+    assert first == again
+    assert len(client.model.prompts) == 1
+
+
+def test_different_history_misses_cache(client):
+    a = client.chat_with_data("What about last month?", CONTEXT, data_version=1, history="User asked about Aldi")
+    b = client.chat_with_data("What about last month?", CONTEXT, data_version=1, history="User asked about fuel")
+    c = client.chat_with_data("What about last month?", CONTEXT, data_version=1)
+    assert len({a, b, c}) == 3
+    assert len(client.model.prompts) == 3
+
+
+def test_streamed_answers_are_keyed_on_history_too(client):
+    a = "".join(client.stream_chat_with_data("Break that down by vendor", CONTEXT, 1, history="Talking about Food"))
+    b = "".join(client.stream_chat_with_data("Break that down by vendor", CONTEXT, 1, history="Talking about Travel"))
+    c = "".join(client.stream_chat_with_data("Break that down by vendor", CONTEXT, 1, history="Talking about Food"))
+    assert a != b
+    assert a == c
+    assert len(client.model.prompts) == 2
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+
+import job_queue
+
+
+@pytest.fixture
+def queue(temp_db, tmp_path, monkeypatch):
+    import pipeline
+    monkeypatch.setattr(pipeline, "SOURCE_DIR", str(tmp_path / "sources"))
+    return job_queue
+
+
+def test_enqueue_dedupes_by_content(queue):
+    first = queue.enqueue("a.png", b"receipt-a")
+    assert first is not None
+    assert queue.enqueue("copy-of-a.png", b"receipt-a") is None
+    second = queue.enqueue("b.png", b"receipt-b")
+    assert second is not None and second != first
+    assert queue.job_counts() == {"queued": 2}
+
+
+def test_concurrent_enqueue_inserts_once(queue):
+    ids = []
+    threads = [threading.Thread(target=lambda: ids.append(queue.enqueue("a.png", b"same"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len([i for i in ids if i is not None]) == 1
+    assert queue.job_counts() == {"queued": 1}
+
+
+def test_claim_takes_oldest_and_marks_running(queue):
+    a = queue.enqueue("a.png", b"a")
+    b = queue.enqueue("b.png", b"b")
+
+    job = queue.claim_job("w1")
+    assert job["id"] == a
+    assert job["status"] == "queued"           # row as read before the update
+    assert job["attempts"] == 1
+    assert queue.claim_job("w2")["id"] == b
+    assert queue.claim_job("w3") is None
+    assert queue.job_counts() == {"running": 2}
+
+
+def test_concurrent_claims_take_each_job_once(queue):
+    for i in range(20):
+        queue.enqueue(f"{i}.png", str(i).encode())
+    claimed, lock = [], threading.Lock()
+
+    def drain(worker):
+        while True:
+            job = queue.claim_job(worker)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["id"])
+
+    threads = [threading.Thread(target=drain, args=(f"w{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(claimed) == list(range(1, 21))
+
+
+def test_fail_requeues_until_max_attempts(queue):
+    queue.enqueue("a.png", b"a")
+    for attempt in range(1, queue.MAX_ATTEMPTS + 1):
+        job = queue.claim_job("w1")
+        assert job["attempts"] == attempt
+        queue.fail_job(job, "boom")
+    assert queue.job_counts() == {"failed": 1}
+    assert queue.claim_job("w1") is None
+
+
+def test_requeue_stale_only_takes_silent_jobs(queue, temp_db):
+    queue.enqueue("a.png", b"a")
+    queue.enqueue("b.png", b"b")
+    stale = queue.claim_job("w1")
+    live = queue.claim_job("w2")
+    conn = temp_db.get_db()
+    conn.execute("UPDATE jobs SET heartbeat = ?", (time.time() - queue.STALE_AFTER_SECONDS - 1,))
+    conn.commit()
+
+    queue.heartbeat("w2", live["id"])
+    assert queue.requeue_stale() == 1
+    assert queue.claim_job("w3")["id"] == stale["id"]
+
+
+def test_requeue_stale_fails_jobs_that_keep_killing_workers(queue, temp_db):
+    queue.enqueue("crash.pdf", b"segfaults poppler")
+    conn = temp_db.get_db()
+    for attempt in range(1, queue.MAX_ATTEMPTS + 1):
+        job = queue.claim_job(f"w{attempt}")
+        assert job["attempts"] == attempt
+        # The worker dies without finishing the job or sending heartbeats
+        conn.execute("UPDATE jobs SET heartbeat = 0")
+        conn.commit()
+        assert queue.requeue_stale() == 1
+
+    assert queue.job_counts() == {"failed": 1}
+    assert "worker died" in queue.recent_jobs()[0]["error"]
+    assert queue.claim_job("w9") is None
+
+
+def test_heartbeat_ignores_jobs_of_other_workers(queue, temp_db):
+    queue.enqueue("a.png", b"a")
+    job = queue.claim_job("w1")
+    conn = temp_db.get_db()
+    conn.execute("UPDATE jobs SET heartbeat = 0")
+    conn.commit()
+    queue.heartbeat("w2", job["id"])
+    assert conn.execute("SELECT heartbeat FROM jobs").fetchone()[0] == 0
+    assert queue.live_worker_count() == 1
+
+
+def test_ensure_workers_never_exceeds_count(queue, monkeypatch):
+    spawned = []
+    monkeypatch.setattr(queue.subprocess, "Popen", lambda args, **kw: spawned.append(args))
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(queue.ensure_workers(3))) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert sum(results) == 3
+    assert len(spawned) == 1
+    assert queue.live_worker_count() == 3
+    assert queue.ensure_workers(3) == 0
@@ -0,0 +1,31 @@
+import json
+import logging
+import queue
+import sys
+
+from logger import JsonFormatter, _DroppingQueueHandler
+
+
+def _record(msg, *args, exc_info=None):
+    return logging.LogRecord("receipt_vault", logging.ERROR, __file__, 1, msg, args, exc_info)
+
+
+def test_queued_record_keeps_structured_exception():
+    records = queue.Queue()
+    handler = _DroppingQueueHandler(records)
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        handler.handle(_record("save failed for %s", "B1", exc_info=sys.exc_info()))
+
+    entry = json.loads(JsonFormatter().format(records.get_nowait()))
+    assert entry["message"] == "save failed for B1"
+    assert entry["exception"].splitlines()[-1] == "ZeroDivisionError: division by zero"
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = _DroppingQueueHandler(queue.Queue(1))
+    before = _DroppingQueueHandler.dropped
+    handler.handle(_record("first"))
+    handler.handle(_record("second"))
+    assert _DroppingQueueHandler.dropped == before + 1
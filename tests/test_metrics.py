@@ -0,0 +1,65 @@
+import pytest
+
+from metrics import BUCKETS, Histogram, timer, histogram, reset
+
+
+def test_quantile_empty():
+    assert Histogram().quantile(0.5) is None
+
+
+def test_quantile_interpolates_within_bucket():
+    hist = Histogram()
+    hist.observe(0.001)                 # bucket (0, 0.001]
+    for _ in range(3):
+        hist.observe(0.02)              # bucket (0.01, 0.025]
+
+    assert hist.quantile(0.25) == pytest.approx(0.001)
+    assert hist.quantile(0.5) == pytest.approx(0.01 + 0.015 / 3)
+    # Capped at the largest value seen, not the bucket bound
+    assert hist.quantile(1.0) == pytest.approx(0.02)
+
+
+def test_quantile_overflow_bucket_uses_max():
+    hist = Histogram()
+    for seconds in (90.0, 120.0):
+        hist.observe(seconds)
+    assert BUCKETS[-1] <= hist.quantile(0.5) <= 120.0
+    assert hist.quantile(0.99) <= 120.0
+
+
+def test_quantiles_are_monotonic():
+    hist = Histogram()
+    for i in range(1, 1001):
+        hist.observe(i / 1000)
+    values = [hist.quantile(q) for q in (0.1, 0.5, 0.9, 0.95, 0.99)]
+    assert values == sorted(values)
+    assert hist.quantile(0.5) == pytest.approx(0.5, rel=0.1)
+
+
+def test_snapshot_and_errors():
+    hist = Histogram()
+    hist.observe(0.003)
+    hist.observe(0.2, error=True)
+    snap = hist.snapshot()
+    assert snap["count"] == 2 == sum(snap["counts"])
+    assert snap["errors"] == 1
+    assert snap["max"] == 0.2
+
+
+def test_timer_counts_errors():
+    reset()
+    with timer("test", op="ok"):
+        pass
+    with pytest.raises(ValueError):
+        with timer("test", op="boom"):
+            raise ValueError
+
+    @timer("test", op="decorated")
+    def fn():
+        return 1
+
+    assert fn() == 1
+    assert histogram("test", op="ok").snapshot()["errors"] == 0
+    assert histogram("test", op="boom").snapshot()["errors"] == 1
+    assert histogram("test", op="decorated").count == 1
+    reset()
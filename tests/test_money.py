@@ -0,0 +1,45 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from money import to_cents, from_cents, round_amount, sum_cents, format_cents  # noqa: E402
+
+
+@pytest.mark.parametrize("value, cents", [
+    (0.1 + 0.2, 30),
+    (2.675, 268),          # 2.67499999... as a binary float; rounded on its decimal repr
+    (1.005, 101),
+    (-1.005, -101),        # half-up rounds away from zero
+    ("1,234.50", 123450),
+    (" 99.999 ", 10000),
+    (5, 500),
+    (np.int64(7), 700),
+    ("12", 1200),
+])
+def test_to_cents_rounds_half_up(value, cents):
+    assert to_cents(value) == cents
+
+
+@pytest.mark.parametrize("value", [None, True, "abc", "", float("nan"), float("inf")])
+def test_to_cents_unreadable_uses_default(value):
+    assert to_cents(value) == 0
+    assert to_cents(value, default=None) is None
+
+
+def test_round_amount_goes_through_cents():
+    assert round_amount(2.675) == 2.68
+    assert round_amount(0.1 + 0.2) == 0.3
+    assert round_amount("n/a", default=-1.0) == -1.0
+    assert from_cents(to_cents(19.99)) == 19.99
+
+
+def test_sum_cents_does_not_drift():
+    assert sum_cents([0.1] * 10) == 100
+    assert sum_cents([19.99] * 100000) == 199900000
+    assert sum_cents([]) == 0
+
+
+def test_format_cents():
+    assert format_cents(123450, "₹") == "₹1,234.50"
+    assert format_cents(-5, "$") == "-$0.05"
+    assert format_cents(0, "$") == "$0.00"
@@ -0,0 +1,94 @@
+import pytest
+
+pytest.importorskip("pytesseract")
+Image = pytest.importorskip("PIL.Image")
+
+import ocr_engine  # noqa: E402
+from ocr_engine import AMOUNT_TOKEN_RE, locate_amount_regions, refine_amounts  # noqa: E402
+
+
+@pytest.mark.parametrize("token", ["12.50", "1,250.00", "$4.99", "Rs.45.00", "₹120.00",
+                                   "l2.5O", "1,2S0.OO", "4.9B", "IO.5O"])
+def test_amount_tokens(token):
+    assert AMOUNT_TOKEN_RE.match(token)
+
+
+@pytest.mark.parametrize("token", ["12", "2024", "12/05/24", "9876543210", "x2", "12.5",
+                                   "#1234", "OIL", "SOLO.OO", "Total"])
+def test_non_amount_tokens(token):
+    assert not AMOUNT_TOKEN_RE.match(token)
+
+
+def _line(y, *texts, conf=80.0):
+    """
+    One OCR line: words laid out left to right, the last one at x=300.
+    """
+    words = []
+    for i, text in enumerate(texts):
+        left = 300 if i == len(texts) - 1 else 20 + 90 * i
+        words.append({"text": text, "conf": conf, "left": left, "top": y, "width": 60, "height": 16,
+                      "key": (1, 1, y)})
+    return {"text": " ".join(texts), "conf": conf, "bbox": (20, y, 360, y + 16), "words": words}
+
+
+def test_misread_amount_is_re_read(monkeypatch):
+    lines = [
+        _line(10, "Store", "Name"),
+        _line(40, "Milk", "2", "l2.5O"),         # misread 12.50
+        _line(70, "Bread", "4.00"),
+        _line(100, "TOTAL", "16.50"),
+    ]
+    regions = locate_amount_regions(lines)
+    assert regions["item_rows"] == [1, 2]
+    assert regions["totals_rows"] == [3]
+
+    def numeric_pass(crop, config=""):
+        # The enlarged crop reads every amount cleanly, slightly less confident
+        # than the page pass; rows are matched on their vertical centre
+        top = crop.info.get("top", 0)
+        readings = {40: "12.50", 70: "4.00", 100: "16.50"}
+        return [
+            {"text": text, "conf": 70.0, "left": 10, "top": (y - top) * ocr_engine.AMOUNT_UPSCALE,
+             "width": 60, "height": 16 * ocr_engine.AMOUNT_UPSCALE, "key": (1, 1, y)}
+            for y, text in readings.items()
+        ]
+
+    class Page:
+        """
+        Image stand-in that remembers where each crop started.
+        """
+        width, height = 400, 140
+
+        def crop(self, box):
+            crop = Image.new("L", (box[2] - box[0], box[3] - box[1]))
+            crop.info["top"] = box[1]
+            return crop
+
+    monkeypatch.setattr(ocr_engine, "ocr_words", numeric_pass)
+    result = refine_amounts(Page(), {"text": "", "lines": lines, "quality": 80.0})
+
+    assert result["lines"][1]["text"] == "Milk 2 12.50"
+    assert result["amount_rows_reocr"] == 1      # clean readings are kept
+    assert result["lines"][2]["text"] == "Bread 4.00"
+
+
+def test_probe_result_finishes_line_reocr_when_reused(monkeypatch):
+    lines = [_line(10, "Store", "Name", conf=90.0), _line(40, "Mi1k", "l2.5O", conf=30.0)]
+    monkeypatch.setattr(ocr_engine, "ocr_words", lambda image, config="": [])
+    monkeypatch.setattr(ocr_engine, "group_lines", lambda words: [dict(l) for l in lines])
+    monkeypatch.setattr(ocr_engine, "_reocr_line",
+                        lambda image, line: _line(line["bbox"][1], "Milk", "12.50", conf=50.0))
+
+    probe = ocr_engine.ocr_receipt(Image.new("L", (400, 80)), reocr=False)
+    assert probe["reocr_pending"] and not probe["early_exit"]
+    assert probe["reocr_lines"] == 0
+
+    full = ocr_engine.finish_ocr(Image.new("L", (400, 80)), probe)
+    assert full["reocr_lines"] == 1
+    assert full["text"] == "Store Name\nMilk 12.50"
+    assert not full["reocr_pending"]
+    assert ocr_engine.finish_ocr(None, full) is full
+
+    # A reused probe of a poor scan still lowers the Tesseract confidence
+    from extractors import TesseractExtractor
+    assert TesseractExtractor().adjust_confidence(1.0, {"ocr": full}) < 1.0
@@ -0,0 +1,50 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+import receipt_frame  # noqa: E402
+from receipt_frame import CENTS_COLUMNS, build_receipts_frame, load_receipts_frame  # noqa: E402
+from chat_context import build_chat_context  # noqa: E402
+from money import format_cents  # noqa: E402
+from queries import save_receipt  # noqa: E402
+
+
+def _rows(n, cents=10):
+    return [(f"B{i}", "Cafe", "2024-03-01", cents, 1, None, None) for i in range(n)]
+
+
+def test_frame_keeps_exact_integer_cents():
+    frame = build_receipts_frame(_rows(3) + [("X", "Shop", "2024-03-02", None, None, None, "Food")])
+
+    for col in CENTS_COLUMNS:
+        assert frame[col].dtype == "int64"
+    assert frame["amount_cents"].tolist() == [10, 10, 10, 0]
+    assert frame["subtotal_cents"].tolist() == [0, 0, 0, 0]
+    assert frame["amount"].tolist() == [0.1, 0.1, 0.1, 0.0]      # display copy in rupees
+    assert frame["category"].tolist()[0] == "Uncategorized"
+
+
+def test_empty_frame_has_cents_columns():
+    frame = build_receipts_frame([])
+    assert all(frame[col].dtype == "int64" for col in CENTS_COLUMNS)
+
+
+def test_totals_do_not_drift_over_many_rows():
+    # A million 0.10 receipts: a float sum drifts off 1,00,000.00, the cents sum cannot
+    frame = build_receipts_frame(_rows(1_000_000))
+    assert frame["amount"].sum() != 100_000.0
+    assert frame["amount_cents"].sum() == 10_000_000
+
+    context, _ = build_chat_context(frame, "how much did I spend", today=pd.Timestamp("2024-03-31").date())
+    assert f"Total spend: {format_cents(10_000_000)}" in context
+
+
+def test_load_reads_cents_from_the_vault(temp_db, monkeypatch):
+    monkeypatch.setattr(receipt_frame, "_CACHE", {"version": None, "frame": None})
+    save_receipt({"bill_id": "A", "vendor": "Cafe", "date": "2024-03-01", "amount": 0.1, "tax": 0.02})
+    save_receipt({"bill_id": "B", "vendor": "Cafe", "date": "2024-03-02", "amount": 0.2, "tax": 0.0})
+
+    frame = load_receipts_frame()
+    assert frame["bill_id"].tolist() == ["B", "A"]
+    assert int(frame["amount_cents"].sum()) == 30
+    assert int(frame["tax_cents"].sum()) == 2
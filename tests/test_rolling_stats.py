@@ -0,0 +1,109 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from rolling_stats import RollingSpendStats  # noqa: E402
+
+WINDOWS = (7, 30, 90)
+
+
+def _receipts(n=400, days=200, seed=7):
+    """
+    Receipts on random days (gaps and several per day), in random order.
+    """
+    rng = random.Random(seed)
+    first = date(2024, 1, 1)
+    rows = [(first + timedelta(days=rng.randrange(days)), round(rng.uniform(1, 500), 2)) for _ in range(n)]
+    rng.shuffle(rows)
+    return rows
+
+
+def _pandas_daily(rows):
+    s = pd.Series([a for _, a in rows], index=pd.to_datetime([d for d, _ in rows]))
+    return s.groupby(level=0).sum().asfreq("D", fill_value=0.0)
+
+
+@pytest.fixture(params=["bulk", "incremental"])
+def stats_and_daily(request):
+    rows = _receipts()
+    if request.param == "bulk":
+        stats = RollingSpendStats.from_daily_totals([d for d, _ in rows], [a for _, a in rows], WINDOWS)
+    else:
+        stats = RollingSpendStats(WINDOWS)
+        for d, a in rows:
+            stats.add(d, a)
+    return stats, _pandas_daily(rows)
+
+
+def test_daily_series_matches_pandas(stats_and_daily):
+    stats, daily = stats_and_daily
+    pd.testing.assert_series_equal(stats.daily_series(), daily, check_freq=False, check_names=False)
+    assert stats.last_day == daily.index[-1].date()
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_moving_average_matches_pandas_rolling(stats_and_daily, window):
+    stats, daily = stats_and_daily
+    expected = daily.rolling(window).mean()
+    pd.testing.assert_series_equal(stats.moving_average(window), expected, check_freq=False, check_names=False)
+
+    start, end = daily.index[50], daily.index[120]
+    pd.testing.assert_series_equal(
+        stats.moving_average(window, start, end), expected.loc[start:end],
+        check_freq=False, check_names=False,
+    )
+
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_window_stats_match_pandas(stats_and_daily, window):
+    stats, daily = stats_and_daily
+    tail = daily.iloc[-window:]
+    result = stats.window_stats(window)
+    assert result["days"] == window
+    assert result["sum"] == pytest.approx(tail.sum())
+    assert result["mean"] == pytest.approx(tail.mean())
+    assert result["variance"] == pytest.approx(tail.var(ddof=0))
+
+
+def test_window_stats_follow_date_range(stats_and_daily):
+    stats, daily = stats_and_daily
+    end = daily.index[120]
+    tail = daily.loc[:end].iloc[-30:]
+    result = stats.window_stats(30, end=end)
+    assert result["days"] == 30
+    assert result["mean"] == pytest.approx(tail.mean())
+
+    # Clipped by the range start: fewer days covered
+    start = end - pd.Timedelta(days=9)
+    result = stats.window_stats(30, start=start, end=end)
+    assert result["days"] == 10
+    assert result["sum"] == pytest.approx(daily.loc[start:end].sum())
+
+
+def test_add_after_gap_evicts_old_days():
+    stats = RollingSpendStats((7,))
+    stats.add("2024-01-01", 100)
+    stats.add("2024-01-03", 50)
+    assert stats.window_stats(7)["sum"] == pytest.approx(150)
+
+    stats.add("2024-01-09", 20)        # Jan 1 drops out of the 7-day window
+    assert stats.window_stats(7)["sum"] == pytest.approx(70)
+
+    stats.add("2024-02-01", 5)         # gap longer than the window
+    assert stats.window_stats(7)["sum"] == pytest.approx(5)
+
+    stats.add("2023-12-25", 10)        # older than all history
+    assert stats.daily_series().index[0] == pd.Timestamp("2023-12-25")
+    assert stats.window_stats(7)["sum"] == pytest.approx(5)
+
+
+def test_empty_stats():
+    stats = RollingSpendStats()
+    assert stats.daily_series().empty
+    assert stats.moving_average(7).empty
+    assert stats.window_stats(7)["mean"] == 0.0
+    assert stats.last_day is None
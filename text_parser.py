@@ -2,24 +2,75 @@ import re
 from datetime import datetime
 import random
 
+from money import to_cents, from_cents, round_amount
+from metrics import timed
+
 
 # ---------- HELPERS ----------
 
 def _clean_amount(val):
-    try:
-        # Handle cases where OCR might have read "," as "." or vice versa
-        # but usually we just want to strip commas
-        clean_val = val.replace(",", "")
-        return float(clean_val)
-    except Exception:
-        return 0.0
+    # Handle cases where OCR might have read "," as "." or vice versa
+    # but usually we just want to strip commas (to_cents does that)
+    return round_amount(val)
 
 
 def _round2(val):
     """
-    Round to 2 decimal places using math to satisfy strict linters.
+    Round to 2 decimal places through integer paise (exact half-up).
+    """
+    return round_amount(val)
+
+
+def _line_amount(line):
+    """
+    Last amount on a line; '12 50' (OCR dropped the dot) reads as 12.50.
+    """
+    nums = re.findall(r"\d+[.,]?\d*", line)
+    if not nums:
+        return None
+    dotted = [n for n in nums if "." in n or "," in n]
+    if dotted:
+        return _clean_amount(dotted[-1])
+    if len(nums) >= 2 and len(nums[-1]) == 2:
+        return _clean_amount(f"{nums[-2]}.{nums[-1]}")
+    return _clean_amount(nums[-1])
+
+
+TOTAL_RE = re.compile(r"(?i)\b(total|tot|due|payable)\b")
+TAX_RE = re.compile(r"(?i)\b(tax|gst|vat|cgst|sgst)\b")
+SUBTOTAL_RE = re.compile(r"(?i)\b(sub\s*total|sub\s*ttl|sub\s*tot|stot|net\s*amount|net\s*amt|taxable|sub)\b")
+
+
+@timed("parse", step="totals")
+def parse_totals(lines):
+    """
+    Total, tax (summed over tax lines) and subtotal from receipt lines.
+    Returns (total, tax, subtotal); 0.0 where nothing was found.
     """
-    return int(val * 100 + 0.5) / 100.0
+    total = 0.0
+    tax = 0.0
+    subtotal = 0.0
+
+    for l in lines:
+        # TOTAL
+        if TOTAL_RE.search(l):
+            amount = _line_amount(l)
+            if amount is not None:
+                total = amount
+
+        # TAX
+        if TAX_RE.search(l) and "invoice" not in l.lower():
+            amount = _line_amount(l)
+            if amount is not None:
+                tax = from_cents(to_cents(tax) + to_cents(amount))
+
+        # SUBTOTAL
+        if SUBTOTAL_RE.search(l):
+            amount = _line_amount(l)
+            if amount is not None:
+                subtotal = amount
+
+    return total, tax, subtotal
 
 
 def _default_bill_id():
@@ -54,6 +105,7 @@ def _extract_date(text):
 
 # ---------- MAIN PARSER ----------
 
+@timed("parse", step="receipt")
 def parse_receipt(text: str):
     """
     Returns structured data and item list from raw OCR text.
@@ -102,50 +154,7 @@ def parse_receipt(text: str):
     date = _extract_date(text)
 
     # ---------- FINANCIALS ----------
-    total = 0.0
-    tax = 0.0
-    subtotal = 0.0
-
-    for l in lines:
-        # TOTAL
-        if re.search(r"(?i)\b(total|tot|due|payable)\b", l):
-            nums = re.findall(r"\d+[.,]?\d*", l)
-            if nums:
-                dotted = [n for n in nums if "." in n or "," in n]
-                if dotted:
-                    total = _clean_amount(dotted[-1])
-                else:
-                    if len(nums) >= 2 and len(nums[-1]) == 2:
-                        total = _clean_amount(f"{nums[-2]}.{nums[-1]}")
-                    else:
-                        total = _clean_amount(nums[-1])
-        
-        # TAX
-        if re.search(r"(?i)\b(tax|gst|vat|cgst|sgst)\b", l):
-            if "invoice" not in l.lower():
-                 nums = re.findall(r"\d+[.,]?\d*", l)
-                 if nums:
-                     current_tax = 0.0
-                     dotted = [n for n in nums if "." in n or "," in n]
-                     if dotted:
-                         current_tax = _clean_amount(dotted[-1])
-                     elif len(nums) >= 2 and len(nums[-1]) == 2:
-                         current_tax = _clean_amount(f"{nums[-2]}.{nums[-1]}")
-                     else:
-                         current_tax = _clean_amount(nums[-1])
-                     tax += current_tax
-
-        # SUBTOTAL
-        if re.search(r"(?i)\b(sub\s*total|sub\s*ttl|sub\s*tot|stot|net\s*amount|net\s*amt|taxable|sub)\b", l):
-            nums = re.findall(r"\d+[.,]?\d*", l)
-            if nums:
-                dotted = [n for n in nums if "." in n or "," in n]
-                if dotted:
-                    subtotal = _clean_amount(dotted[-1])
-                elif len(nums) >= 2 and len(nums[-1]) == 2:
-                    subtotal = _clean_amount(f"{nums[-2]}.{nums[-1]}")
-                else:
-                    subtotal = _clean_amount(nums[-1])
+    total, tax, subtotal = parse_totals(lines)
 
     # Validation & Fallbacks
     if tax > total and total > 0:
@@ -161,7 +170,7 @@ def parse_receipt(text: str):
                  total = max(_clean_amount(n) for n in nums)
             
     if subtotal == 0.0 and total > 0:
-        subtotal = total - tax
+        subtotal = from_cents(to_cents(total) - to_cents(tax))
 
     # ---------- ITEMS ----------
     items = []
@@ -1,11 +1,11 @@
 import streamlit as st
-from PIL import Image
-import pytesseract
 import pandas as pd
 
-from text_parser import parse_receipt
-from validation_ui import validate_receipt
-from queries import save_receipt, receipt_exists
+from extractors import ExtractionRouter, backend_stats
+from pipeline import load_document, save_extraction
+from job_queue import enqueue, ensure_workers, job_counts, recent_jobs, clear_finished, live_worker_count
+from queries import receipt_exists
+from metrics import timer
 
 
 # ===== SECTION HEADER HELPER =====
@@ -46,6 +46,51 @@ def _status_badge(text, variant="info"):
     """, unsafe_allow_html=True)
 
 
+# ===== BACKGROUND JOB STATUS =====
+def _job_status_panel():
+    """Recent background jobs; refreshes itself while work is pending."""
+    counts = job_counts()
+    if not counts:
+        return
+
+    _section_header("Background Jobs", "Receipts queued for extraction by the worker processes")
+
+    c1, c2, c3, c4, c5 = st.columns(5, gap="small")
+    c1.metric("Queued", counts.get("queued", 0))
+    c2.metric("Running", counts.get("running", 0))
+    c3.metric("Saved", counts.get("saved", 0))
+    c4.metric("Duplicates", counts.get("duplicate", 0))
+    c5.metric("Failed", counts.get("failed", 0))
+
+    rows = []
+    for job in recent_jobs(20):
+        result = job["result"] or {}
+        rows.append({
+            "Job": job["id"],
+            "File": job["filename"],
+            "Status": job["status"],
+            "Bill ID": result.get("bill_id"),
+            "Vendor": result.get("vendor"),
+            "Amount": result.get("amount"),
+            "Backend": result.get("backend"),
+            "Attempts": job["attempts"],
+            "Error": job["error"],
+        })
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+    pending = counts.get("queued", 0) + counts.get("running", 0)
+    if pending and live_worker_count() == 0:
+        st.warning("Jobs are waiting but no worker is running. Start one with `python worker.py`.")
+    if not pending and st.button("Clear finished jobs"):
+        clear_finished()
+        st.rerun()
+
+
+# Poll job state without rerunning the whole page (Streamlit >= 1.37)
+if hasattr(st, "fragment"):
+    _job_status_panel = st.fragment(run_every=2)(_job_status_panel)
+
+
 def render_upload_ui():
     # ===== PAGE-LEVEL STYLES (scoped to upload section) =====
     st.markdown("""
@@ -183,24 +228,41 @@ def render_upload_ui():
             </div>
         </div>
         """, unsafe_allow_html=True)
+        _job_status_panel()
+        return
+
+    # ================= BACKGROUND MODE =================
+    # Queue the file and return at once; worker.py does extraction + save,
+    # so slow OCR / AI calls neither block this session nor die on rerun.
+    background = st.toggle(
+        "Process in background",
+        value=True,
+        help="Queue the receipt for the background workers instead of extracting it in this page.",
+    )
+    if background:
+        if st.button("Queue Receipt for Extraction", use_container_width=True, type="primary"):
+            job_id = enqueue(uploaded.name, uploaded.getvalue())
+            if job_id is None:
+                _status_badge("Already ingested or queued -- not queued again", "warning")
+            else:
+                ensure_workers(api_key=st.session_state.get("GEMINI_API_KEY"))
+                _status_badge(f"Queued as job #{job_id}", "info")
+        _job_status_panel()
         return
 
     # ================= IMAGE PROCESSING =================
+    # Same loading as the CLI and workers; OCR work already done while
+    # preparing a PDF page is handed to the extractor in the context
     if uploaded.type == "application/pdf":
-        from pdf_processor import pdf_to_images
         with st.spinner("Converting PDF to image..."):
             try:
-                pdf_images = pdf_to_images(uploaded.read())
-                if not pdf_images:
-                    st.error("Could not convert PDF to image")
-                    return
-                img = pdf_images[0]  # Take first page
+                img, extraction_context, pdf_note = load_document(uploaded.name, uploaded.getvalue())
             except Exception as e:
                 st.error(f"PDF Processing Error: {e}")
                 st.info("Ensure Poppler is installed and path is correct in `ocr/pdf_processor.py`.")
                 return
     else:
-        img = Image.open(uploaded)
+        img, extraction_context, pdf_note = load_document(uploaded.name, uploaded.getvalue())
 
     # ===== IMAGE PREVIEW (side by side in cards) =====
     _section_header("Image Preview", "Original and processed views of the uploaded receipt")
@@ -230,47 +292,55 @@ def render_upload_ui():
         return
 
     # ================= OCR + PARSE =================
-    data = None
-    items = []
-
-    api_key = st.session_state.get("GEMINI_API_KEY")
-    use_ai = bool(api_key)
-    extraction_method = None
-
-    with st.spinner("Extracting receipt data..."):
-        if use_ai:
-            from gemini_client import GeminiClient
-            try:
-                client = GeminiClient(api_key)
-                result = client.extract_receipt(img)
-                if result:
-                    items = result.pop("items", [])
-                    data = result
-                    extraction_method = "ai"
-            except Exception as e:
-                st.error(f"AI Extraction failed: {e}. Falling back to OCR.")
-                use_ai = False
-
-        if not data:
-            # Fallback to Tesseract
-            import numpy as np
-            import cv2
-            from image_preprocessing import preprocess_image
-            gray_preprocessed = preprocess_image(img)
-            text = pytesseract.image_to_string(gray_preprocessed)
-            if not text.strip():
-                st.error("No readable text detected from the image.")
-                return
-            data, items = parse_receipt(text)
-            extraction_method = "ocr"
-
+    # Cheap local OCR first; AI backends only when confidence / validation fails
+    router = ExtractionRouter.default(api_key=st.session_state.get("GEMINI_API_KEY"))
+
+    with st.spinner("Extracting receipt data..."), timer("upload", step="extract"):
+        try:
+            extraction = router.extract(img, extraction_context)
+        except ValueError as e:
+            st.error(f"Extraction failed: {e}")
+            return
+
+    data = extraction["data"]
+    items = extraction["items"]
     st.session_state["LAST_EXTRACTED_RECEIPT"] = data
 
     # ===== EXTRACTION METHOD INDICATOR =====
-    if extraction_method == "ai":
-        st.markdown('<span class="method-badge method-ai">AI Extraction</span>', unsafe_allow_html=True)
-    else:
-        st.markdown('<span class="method-badge method-ocr">OCR Extraction</span>', unsafe_allow_html=True)
+    badge_class = "method-ocr" if extraction["backend"] in ("tesseract", "text_layer") else "method-ai"
+    st.markdown(f'<span class="method-badge {badge_class}">{extraction["label"]}</span>', unsafe_allow_html=True)
+
+    path = " \u2192 ".join(a["backend"] for a in extraction["attempts"])
+    st.caption(
+        f"Confidence {extraction['confidence']:.0%} via {path} "
+        f"in {extraction['elapsed_ms']:.0f} ms"
+        + (f" \u00b7 weak fields: {', '.join(extraction['failed'])}" if extraction["failed"] else "")
+    )
+    ocr = extraction["ocr"]
+    if pdf_note:
+        st.caption(pdf_note)
+    if ocr:
+        st.caption(
+            f"OCR quality {ocr['quality']:.0f}/100 \u00b7 "
+            + ("clean scan, single pass" if ocr["early_exit"] else f"{ocr['reocr_lines']} low-confidence line(s) re-read")
+        )
+
+    with st.expander("Extraction backend stats"):
+        stats = backend_stats()
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    "Backend": name,
+                    "Calls": s["calls"],
+                    "Success rate": f"{s['success_rate']:.0%}",
+                    "Accepted": f"{s['accept_rate']:.0%}",
+                    "Avg latency (ms)": round(s["avg_ms"]),
+                }
+                for name, s in stats.items()
+            ]),
+            use_container_width=True,
+            hide_index=True,
+        )
 
     st.markdown("<div style='height:0.75rem'></div>", unsafe_allow_html=True)
 
@@ -335,13 +405,20 @@ def render_upload_ui():
     else:
         _status_badge("No duplicate found", "success")
 
-    # ================= VALIDATION =================
-    validation = validate_receipt(data)
+    # ================= VALIDATE + SAVE (EVEN IF VALIDATION FAILS) =================
+    # Same save path as cli.py and the workers: validation, receipt row, source file
+    saved = save_extraction(
+        {"name": uploaded.name, "status": "extracted", "data": data,
+         "backend": extraction["backend"], "confidence": extraction["confidence"]},
+        uploaded.getvalue(),
+    )
+    if saved["status"] == "duplicate":
+        # Saved by another session since the check above
+        _status_badge("Duplicate Detected -- Receipt NOT saved to database", "error")
+        return
+    validation = saved["validation"]
     st.session_state["LAST_VALIDATION_REPORT"] = validation
 
-    # ================= SAVE (EVEN IF VALIDATION FAILS) =================
-    save_receipt(data)
-
     st.markdown("<div style='height:0.5rem'></div>", unsafe_allow_html=True)
 
     if validation["passed"]:
@@ -1,9 +1,9 @@
 import streamlit as st
-from datetime import datetime
-from queries import fetch_all_receipts, receipt_exists
+from queries import fetch_all_receipts
+from money import to_cents
 
-EXPECTED_TAX_RATE = 0.08   # 8%
-TOLERANCE = 0.05           # 5% tolerance
+# Core validation logic lives in validator.py (no Streamlit dependency)
+from validator import validate_receipt
 
 
 # ===================================================================
@@ -224,138 +224,6 @@ def _empty_state(icon: str, title: str, message: str) -> str:
     )
 
 
-# ===================================================================
-#  CORE VALIDATION LOGIC  --  unchanged
-# ===================================================================
-
-def validate_receipt(data, skip_duplicate=False):
-    results = []
-    passed = True
-
-    # ---------- Required Fields ----------
-    required = ["bill_id", "vendor", "date", "amount", "tax"]
-    missing = [f for f in required if data.get(f) is None]
-
-    if missing:
-        results.append({
-            "title": "Required Fields",
-            "status": "error",
-            "message": f"Missing fields: {', '.join(missing)}"
-        })
-        passed = False
-        return {"passed": passed, "results": results}
-    else:
-        results.append({
-            "title": "Required Fields",
-            "status": "success",
-            "message": "All required fields present"
-        })
-
-    # ---------- Date Format ----------
-    try:
-        datetime.strptime(str(data["date"]), "%Y-%m-%d")
-        results.append({
-            "title": "Date Format",
-            "status": "success",
-            "message": f"Valid date: {data['date']}"
-        })
-    except Exception:
-        results.append({
-            "title": "Date Format",
-            "status": "error",
-            "message": f"Invalid date format: {data['date']}"
-        })
-        passed = False
-
-    try:
-        amount = float(data["amount"])
-    except (ValueError, TypeError):
-        amount = 0.0
-
-    try:
-        tax = float(data["tax"])
-    except (ValueError, TypeError):
-        tax = 0.0
-
-    # ---------- Total Validation ----------
-    if amount > 0:
-        results.append({
-            "title": "Total Validation",
-            "status": "success",
-            "message": f"Amount detected: \u20b9{amount:.2f}"
-        })
-    else:
-        results.append({
-            "title": "Total Validation",
-            "status": "error",
-            "message": "Invalid amount value"
-        })
-        passed = False
-
-    # ---------- Tax Rate Validation ----------
-    if tax == 0:
-        results.append({
-            "title": "Tax Rate Validation",
-            "status": "success",
-            "message": "No tax applied (valid)"
-        })
-    else:
-        subtotal_option_1 = amount - tax
-        subtotal_option_2 = amount
-
-        valid = False
-        used_subtotal = 0.0
-        actual_rate = 0.0
-
-        for subtotal in [subtotal_option_1, subtotal_option_2]:
-            if subtotal <= 0:
-                continue
-            rate = tax / subtotal
-            if abs(rate - EXPECTED_TAX_RATE) <= TOLERANCE:
-                valid = True
-                used_subtotal = subtotal
-                actual_rate = rate
-                break
-
-        if valid:
-            results.append({
-                "title": "Tax Rate Validation",
-                "status": "success",
-                "message": (
-                    f"Tax rate OK "
-                    f"({actual_rate*100:.2f}%, Subtotal \u20b9{used_subtotal:.2f})"
-                )
-            })
-        else:
-            results.append({
-                "title": "Tax Rate Validation",
-                "status": "error",
-                "message": (
-                    f"Tax mismatch. Expected ~{EXPECTED_TAX_RATE*100:.1f}% "
-                    f"but got \u20b9{tax:.2f} on amount \u20b9{amount:.2f}"
-                )
-            })
-            passed = False
-
-    # ---------- Duplicate Detection ----------
-    if not skip_duplicate:
-        if receipt_exists(data["bill_id"]):
-            results.append({
-                "title": "Duplicate Detection",
-                "status": "error",
-                "message": "Duplicate receipt found"
-            })
-            passed = False
-        else:
-            results.append({
-                "title": "Duplicate Detection",
-                "status": "success",
-                "message": "No duplicate found"
-            })
-
-    return {"passed": passed, "results": results}
-
-
 # ===================================================================
 #  RENDER VALIDATION RESULTS  --  reusable
 # ===================================================================
@@ -430,17 +298,13 @@ def validation_ui():
             if vendor and vendor.lower() not in r["vendor"].lower():
                 continue
             if amount:
-                try:
-                    if float(amount) != r["amount"]:
-                        continue
-                except ValueError:
-                    pass
+                amount_cents = to_cents(amount, default=None)
+                if amount_cents is not None and amount_cents != to_cents(r["amount"]):
+                    continue
             if tax:
-                try:
-                    if float(tax) != r["tax"]:
-                        continue
-                except ValueError:
-                    pass
+                tax_cents = to_cents(tax, default=None)
+                if tax_cents is not None and tax_cents != to_cents(r["tax"]):
+                    continue
             match = r
             break
 
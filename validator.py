@@ -1,3 +1,14 @@
+from datetime import datetime
+
+from money import to_cents, format_cents
+from queries import receipt_exists
+from metrics import timed
+
+# Rates in basis points so the tax check stays in integer arithmetic
+EXPECTED_TAX_RATE_BP = 800   # 8%
+TOLERANCE_BP = 500           # 5% tolerance
+
+
 def build_validation_results(data: dict, filename: str) -> dict:
     """
     Builds validation banners for extracted receipt data.
@@ -14,18 +25,15 @@ def build_validation_results(data: dict, filename: str) -> dict:
     )
 
     # ---------------- TOTAL VALIDATION ----------------
-    try:
-        subtotal = float(data.get("subtotal", 0))
-        tax = float(data.get("tax", 0))
-        total = float(data.get("total", 0))
-    except Exception:
-        subtotal = tax = total = 0.0
+    # Integer paise: the sum is exact, so no rounding tolerance is needed
+    subtotal = to_cents(data.get("subtotal", 0))
+    tax = to_cents(data.get("tax", 0))
+    total = to_cents(data.get("total", 0))
 
-    # Allow small rounding tolerance (real receipts vary)
-    if abs((subtotal + tax) - total) <= 0.15:
+    if subtotal + tax == total:
         results["Total Validation"] = (
             True,
-            f"{subtotal:.2f} + {tax:.2f} = {total:.2f}"
+            f"{format_cents(subtotal, '')} + {format_cents(tax, '')} = {format_cents(total, '')}"
         )
     else:
         results["Total Validation"] = (
@@ -54,4 +62,129 @@ def build_validation_results(data: dict, filename: str) -> dict:
         f"No duplicate found for {filename}"
     )
 
-    return results
\ No newline at end of file
+    return results
+
+
+@timed("validate")
+def validate_receipt(data, skip_duplicate=False):
+    """
+    Field, date, amount, tax-rate and duplicate checks for an extracted
+    receipt. Returns {"passed": bool, "results": [{title, status, message}]}.
+    """
+    results = []
+    passed = True
+
+    # ---------- Required Fields ----------
+    required = ["bill_id", "vendor", "date", "amount", "tax"]
+    missing = [f for f in required if data.get(f) is None]
+
+    if missing:
+        results.append({
+            "title": "Required Fields",
+            "status": "error",
+            "message": f"Missing fields: {', '.join(missing)}"
+        })
+        passed = False
+        return {"passed": passed, "results": results}
+    else:
+        results.append({
+            "title": "Required Fields",
+            "status": "success",
+            "message": "All required fields present"
+        })
+
+    # ---------- Date Format ----------
+    try:
+        datetime.strptime(str(data["date"]), "%Y-%m-%d")
+        results.append({
+            "title": "Date Format",
+            "status": "success",
+            "message": f"Valid date: {data['date']}"
+        })
+    except Exception:
+        results.append({
+            "title": "Date Format",
+            "status": "error",
+            "message": f"Invalid date format: {data['date']}"
+        })
+        passed = False
+
+    # Amounts as integer paise
+    amount = to_cents(data["amount"])
+    tax = to_cents(data["tax"])
+
+    # ---------- Total Validation ----------
+    if amount > 0:
+        results.append({
+            "title": "Total Validation",
+            "status": "success",
+            "message": f"Amount detected: {format_cents(amount)}"
+        })
+    else:
+        results.append({
+            "title": "Total Validation",
+            "status": "error",
+            "message": "Invalid amount value"
+        })
+        passed = False
+
+    # ---------- Tax Rate Validation ----------
+    if tax == 0:
+        results.append({
+            "title": "Tax Rate Validation",
+            "status": "success",
+            "message": "No tax applied (valid)"
+        })
+    else:
+        subtotal_option_1 = amount - tax
+        subtotal_option_2 = amount
+
+        valid = False
+        used_subtotal = 0
+
+        for subtotal in [subtotal_option_1, subtotal_option_2]:
+            if subtotal <= 0:
+                continue
+            # |tax / subtotal - expected| <= tolerance, cross-multiplied to stay in integers
+            if abs(tax * 10000 - EXPECTED_TAX_RATE_BP * subtotal) <= TOLERANCE_BP * subtotal:
+                valid = True
+                used_subtotal = subtotal
+                break
+
+        if valid:
+            results.append({
+                "title": "Tax Rate Validation",
+                "status": "success",
+                "message": (
+                    f"Tax rate OK "
+                    f"({tax * 100 / used_subtotal:.2f}%, Subtotal {format_cents(used_subtotal)})"
+                )
+            })
+        else:
+            results.append({
+                "title": "Tax Rate Validation",
+                "status": "error",
+                "message": (
+                    f"Tax mismatch. Expected ~{EXPECTED_TAX_RATE_BP / 100:.1f}% "
+                    f"but got {format_cents(tax)} on amount {format_cents(amount)}"
+                )
+            })
+            passed = False
+
+    # ---------- Duplicate Detection ----------
+    if not skip_duplicate:
+        if receipt_exists(data["bill_id"]):
+            results.append({
+                "title": "Duplicate Detection",
+                "status": "error",
+                "message": "Duplicate receipt found"
+            })
+            passed = False
+        else:
+            results.append({
+                "title": "Duplicate Detection",
+                "status": "success",
+                "message": "No duplicate found"
+            })
+
+    return {"passed": passed, "results": results}
@@ -0,0 +1,216 @@
+"""
+Watch-folder ingestion: receipts dropped into a directory (e.g. by a
+shared scanner) are queued for the background workers.
+
+    python watch_folder.py /srv/scans --workers 2 --max-pending 8
+
+Uses watchdog for filesystem events when it is installed; otherwise
+falls back to a slow directory scan every --poll seconds.
+"""
+import argparse
+import os
+import threading
+import time
+
+from database.db import init_db
+from logger import setup_logging, log_info, log_error
+from pipeline import is_supported
+from job_queue import enqueue, ensure_workers, job_counts
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # optional dependency
+    Observer = None
+    FileSystemEventHandler = object
+
+SETTLE_SECONDS = 2.0       # size and mtime must stay unchanged this long
+POLL_SECONDS = 10.0        # directory scan interval without watchdog
+MAX_PENDING = 8            # queued + running jobs before we hold files back
+
+
+class FolderWatcher:
+    """
+    Tracks candidate files until they stop changing (scanners write in
+    chunks), then enqueues them while the queue has room.
+    Content dedupe is done by job_queue.enqueue (sha256).
+    """
+
+    def __init__(self, folder, workers=2, max_pending=MAX_PENDING,
+                 settle_seconds=SETTLE_SECONDS, poll_seconds=POLL_SECONDS, api_key=None):
+        self.folder = os.path.abspath(folder)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.api_key = api_key
+
+        self._candidates = {}      # path -> (size, mtime, unchanged since)
+        self._handled = {}         # path -> (size, mtime) already enqueued / skipped
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.stats = {"queued": 0, "duplicates": 0, "errors": 0}
+
+    # ---------- discovery ----------
+
+    def notice(self, path):
+        if not is_supported(path) or os.path.basename(path).startswith("."):
+            return
+        with self._lock:
+            self._candidates.setdefault(path, (None, None, time.monotonic()))
+
+    def scan(self):
+        for root, _, files in os.walk(self.folder):
+            for f in files:
+                self.notice(os.path.join(root, f))
+
+    # ---------- debounce ----------
+
+    def _ready_files(self):
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for path, (size, mtime, since) in list(self._candidates.items()):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del self._candidates[path]
+                    continue
+
+                current = (st.st_size, st.st_mtime)
+                if self._handled.get(path) == current:
+                    del self._candidates[path]
+                elif (size, mtime) != current:
+                    self._candidates[path] = (*current, now)
+                elif st.st_size > 0 and now - since >= self.settle_seconds:
+                    ready.append((path, current))
+        return ready
+
+    # ---------- enqueue ----------
+
+    def _room(self):
+        counts = job_counts()
+        return self.max_pending - counts.get("queued", 0) - counts.get("running", 0)
+
+    def process_ready(self):
+        """
+        Queues settled files while the queue has room, then makes sure
+        workers are running for whatever is queued. Returns the number of
+        files queued.
+        """
+        ready = self._ready_files()
+        queued = self._enqueue(ready) if ready else 0
+
+        # Checked on every poll, not only after queueing: workers that died,
+        # or jobs queued by another session, get workers too. ensure_workers
+        # tops up to self.workers and never starts more.
+        if job_counts().get("queued", 0):
+            ensure_workers(self.workers, self.api_key)
+        return queued
+
+    def _enqueue(self, ready):
+        room = self._room()
+        queued = 0
+        for path, signature in ready[:max(room, 0)]:
+            name = os.path.relpath(path, self.folder)
+            try:
+                with open(path, "rb") as f:
+                    content = f.read()
+                job_id = enqueue(name, content)
+            except Exception as e:
+                self.stats["errors"] += 1
+                log_error(f"watch_folder: could not queue {name}: {e}")
+                continue
+
+            with self._lock:
+                self._handled[path] = signature
+                self._candidates.pop(path, None)
+            if job_id is None:
+                self.stats["duplicates"] += 1
+                log_info(f"watch_folder: {name} already ingested, skipped")
+            else:
+                self.stats["queued"] += 1
+                queued += 1
+                log_info(f"watch_folder: queued {name} as job {job_id}")
+        return queued
+
+    # ---------- main loop ----------
+
+    def run(self):
+        init_db()
+        self.scan()
+        observer = None
+        if Observer is not None:
+            observer = Observer()
+            observer.schedule(_EventHandler(self), self.folder, recursive=True)
+            observer.start()
+            log_info(f"watch_folder: watching {self.folder} (watchdog)")
+        else:
+            log_info(f"watch_folder: scanning {self.folder} every {self.poll_seconds:.0f}s (watchdog not installed)")
+
+        last_scan = time.monotonic()
+        try:
+            while not self._stop.is_set():
+                if observer is None and time.monotonic() - last_scan >= self.poll_seconds:
+                    self.scan()
+                    last_scan = time.monotonic()
+                self.process_ready()
+                self._stop.wait(self.settle_seconds / 2)
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def stop(self):
+        self._stop.set()
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notice(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notice(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.notice(event.dest_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="watch_folder.py", description="Queue receipts dropped into a folder")
+    parser.add_argument("folder")
+    parser.add_argument("--workers", type=int, default=2, help="background worker processes to keep running")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING,
+                        help="queued + running jobs before new files are held back")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                        help="seconds a file must stay unchanged before it is queued")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS,
+                        help="scan interval when watchdog is not installed")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.folder):
+        raise SystemExit(f"Not a directory: {args.folder}")
+    if args.workers < 1 or args.max_pending < 1:
+        raise SystemExit("--workers and --max-pending must be at least 1")
+
+    setup_logging("watch_folder.log")
+    watcher = FolderWatcher(
+        args.folder, args.workers, args.max_pending, args.settle, args.poll,
+        api_key=os.environ.get("GEMINI_API_KEY"),
+    )
+    print(f"Watching {watcher.folder} -- Ctrl+C to stop")
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    print(f"Stopped. {watcher.stats}")
+
+
+if __name__ == "__main__":
+    main()
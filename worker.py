@@ -0,0 +1,149 @@
+"""
+Background extraction workers for the job queue.
+
+    python worker.py --workers 2          # run until stopped
+    python worker.py --once               # drain the queue and exit
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import threading
+import time
+
+from database.db import init_db
+from logger import setup_logging, log_context, log_info, log_error
+from job_queue import (
+    HEARTBEAT_SECONDS, claim_job, finish_job, fail_job, heartbeat, requeue_stale,
+    worker_checkin, worker_checkout,
+)
+
+POLL_MIN_SECONDS = 0.5
+POLL_MAX_SECONDS = 5.0         # idle workers back off to this poll interval
+
+
+def process_job(job, api_key=None):
+    """
+    Extract, validate and save one queued file via the shared pipeline.
+    """
+    from pipeline import extract_document, save_extraction
+
+    with open(job["path"], "rb") as f:
+        content = f.read()
+
+    result = save_extraction(extract_document(job["filename"], content, api_key), content)
+    summary = {
+        "bill_id": (result.get("data") or {}).get("bill_id"),
+        "vendor": (result.get("data") or {}).get("vendor"),
+        "amount": (result.get("data") or {}).get("amount"),
+        "backend": result.get("backend"),
+        "confidence": result.get("confidence"),
+        "validation_passed": (result.get("validation") or {}).get("passed"),
+        "elapsed_ms": result.get("elapsed_ms"),
+    }
+    return result["status"], summary, result.get("error")
+
+
+class JobHeartbeat:
+    """
+    Background thread that keeps the worker's check-in and the running
+    job's heartbeat fresh, however long the extraction takes.
+    """
+
+    def __init__(self, worker_id, job_id, interval=HEARTBEAT_SECONDS):
+        self.worker_id = worker_id
+        self.job_id = job_id
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="job-heartbeat", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                heartbeat(self.worker_id, self.job_id)
+            except Exception as e:
+                # A busy database only delays this beat; the next one retries
+                log_error(f"worker: heartbeat failed: {e}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(index=0, once=False, id_prefix=None):
+    # ensure_workers reserves job_workers rows under id_prefix; checking in
+    # under the same id takes the reservation over
+    worker_id = f"{id_prefix}-{index}" if id_prefix else f"{socket.gethostname()}-{os.getpid()}-{index}"
+    setup_logging(f"worker-{index}.log", force=True)
+    api_key = os.environ.get("GEMINI_API_KEY")
+    delay = POLL_MIN_SECONDS
+
+    try:
+        while True:
+            worker_checkin(worker_id)
+            requeue_stale()
+            job = claim_job(worker_id)
+            if job is None:
+                if once:
+                    return
+                time.sleep(delay)
+                delay = min(delay * 2, POLL_MAX_SECONDS)
+                continue
+
+            delay = POLL_MIN_SECONDS
+            started = time.perf_counter()
+            with log_context(job_id=job["id"]):
+                try:
+                    with JobHeartbeat(worker_id, job["id"]):
+                        status, summary, error = process_job(job, api_key)
+                except Exception as e:
+                    log_error(f"worker: job crashed: {e}", file=job["filename"], attempt=job["attempts"],
+                              duration_ms=round((time.perf_counter() - started) * 1000, 1))
+                    fail_job(job, str(e))
+                    continue
+
+                duration_ms = round((time.perf_counter() - started) * 1000, 1)
+                if status == "failed":
+                    log_error(f"worker: extraction failed: {error}", file=job["filename"],
+                              attempt=job["attempts"], duration_ms=duration_ms)
+                    fail_job(job, error or "extraction failed")
+                else:
+                    log_info(f"worker: job {status}", file=job["filename"], backend=summary["backend"],
+                             bill_id=summary["bill_id"], duration_ms=duration_ms)
+                    finish_job(job["id"], status, result=summary)
+    finally:
+        worker_checkout(worker_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="worker.py", description="Receipt extraction workers")
+    parser.add_argument("--workers", type=int, default=2, help="worker processes")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    parser.add_argument("--id-prefix", help=argparse.SUPPRESS)    # set by job_queue.ensure_workers
+    args = parser.parse_args(argv)
+
+    init_db()
+    if args.workers <= 1:
+        run_worker(0, args.once, args.id_prefix)
+        return
+
+    procs = [
+        multiprocessing.Process(target=run_worker, args=(i, args.once, args.id_prefix), daemon=False)
+        for i in range(args.workers)
+    ]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+
+
+if __name__ == "__main__":
+    main()